@@ -1,9 +1,11 @@
 from pathlib import Path
 
+import pandas as pd
 import streamlit as st
 import streamlit.components.v1 as components
 
 import database as db
+import export_jobs
 from style import NIVEAU_ORDER, build_css, build_sticky_js, get_colors, get_sidebar_style
 from ui_helper import (
     render_candidat_card,
@@ -21,6 +23,7 @@ from ui_helper import (
 st.set_page_config(page_title="CNaBAU - Bourse de Russie", layout="wide")
 
 PAGE_SIZE = 15
+RESET_SNAPSHOTS_KEPT = 5  # instantanés automatiques « Avant réinitialisation » conservés
 ID_RUSSE_PREFIX = "BEN-"
 ID_RUSSE_SUFFIX = "/26"
 
@@ -69,37 +72,76 @@ if not db.is_db_loaded():
         Path("_temp_upload.xlsx").unlink(missing_ok=True)
         st.success(f"{n} candidatures chargées.")
         st.rerun()
+
+    snapshots = {s["id"]: s for s in db.list_snapshots()}
+    if snapshots:
+        st.markdown("Ou reprenez une session enregistrée :")
+        snapshot_id = st.selectbox(
+            "Instantané", list(snapshots),
+            format_func=lambda i: f"{snapshots[i]['nom']} — {snapshots[i]['heure']}",
+        )
+        if st.button("Restaurer l'instantané", icon=":material/restore:"):
+            result = db.restore_snapshot(snapshot_id)
+            if result["success"]:
+                st.rerun()
+            st.error(f"Échec de la restauration : {result['error']}")
     st.stop()
 
 # ---------------------------------------------------------------------------
-# ✅ OPTIMISATION : fonctions de chargement cachées (TTL 2s)
-# Les données sont rechargées au maximum toutes les 2 secondes, pas à chaque
-# rerun. Après un update_avis(), on vide le cache manuellement.
+# ✅ OPTIMISATION : fonctions de chargement cachées par version des données
+# Chaque écriture (quelle que soit la session) incrémente la version stockée
+# en base ; elle fait partie de la clé de cache. Tant qu'elle ne bouge pas,
+# les lectures sont servies depuis le cache, sans expiration.
 # ---------------------------------------------------------------------------
 
-@st.cache_data(ttl=2)
-def cached_get_all_candidatures():
-    return db.get_all_candidatures()
+CACHE_MAX_ENTRIES = 4
 
-@st.cache_data(ttl=2)
-def cached_get_quotas():
-    return db.get_quotas()
 
-@st.cache_data(ttl=2)
-def cached_get_stats():
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def cached_get_niveaux_filieres(data_version: int):
+    return db.get_niveaux_filieres()
+
+@st.cache_data(max_entries=8 * CACHE_MAX_ENTRIES)
+def cached_get_candidatures_page(data_version: int, niveaux: tuple, filieres: tuple, avis: tuple,
+                                 after: tuple | None):
+    return db.get_candidatures_page(niveaux, filieres, avis, after, PAGE_SIZE)
+
+@st.cache_data(max_entries=8 * CACHE_MAX_ENTRIES)
+def cached_count_candidatures(data_version: int, niveaux: tuple, filieres: tuple, avis: tuple):
+    return db.count_candidatures(niveaux, filieres, avis)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def cached_get_stats(data_version: int):
     return db.get_stats()
 
-@st.cache_data(ttl=2)
-def cached_get_favorables_count():
-    return db.get_favorables_count()
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def cached_get_duplicates(data_version: int):
+    return db.get_duplicates()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def cached_get_filiere_aliases(data_version: int):
+    return db.get_filiere_aliases()
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def cached_propose_allocation(data_version: int, n_suppleants: int):
+    return db.propose_allocation(n_suppleants)
+
+@st.cache_data(max_entries=8 * CACHE_MAX_ENTRIES)
+def cached_get_journal(data_version: int, types: tuple = (), id_demande: str | None = None):
+    return db.get_journal(types=types, id_demande=id_demande)
 
 
 def invalidate_cache():
-    """Vide le cache après toute modification BDD pour forcer un rechargement."""
-    cached_get_all_candidatures.clear()
-    cached_get_quotas.clear()
+    """Vide tout le cache (réinitialisation de la session)."""
+    cached_get_niveaux_filieres.clear()
+    cached_get_candidatures_page.clear()
+    cached_count_candidatures.clear()
     cached_get_stats.clear()
-    cached_get_favorables_count.clear()
+    cached_get_duplicates.clear()
+    cached_get_filiere_aliases.clear()
+    cached_propose_allocation.clear()
+    cached_get_journal.clear()
+    export_jobs.clear_cache()
 
 
 # ---------------------------------------------------------------------------
@@ -112,25 +154,113 @@ if "processing" not in st.session_state:
 
 
 def do_update_avis(id_demande: str, avis: str):
-    """Met à jour l'avis avec verrou et invalidation du cache."""
+    """Met à jour l'avis avec verrou anti-double-clic."""
     if st.session_state["processing"]:
         return
     st.session_state["processing"] = True
     try:
         db.update_avis(id_demande, avis)
-        invalidate_cache()
     finally:
         st.session_state["processing"] = False
     st.rerun()
 
 
+def do_bulk_update_avis(decisions: list[tuple[str, str]]):
+    """Applique plusieurs décisions en une transaction ; un seul rerun."""
+    if st.session_state["processing"]:
+        return
+    st.session_state["processing"] = True
+    try:
+        result = db.bulk_update_avis(decisions)
+    finally:
+        st.session_state["processing"] = False
+    if not result["success"]:
+        st.error(f"Décisions non appliquées : {result['error']}")
+        return
+    st.session_state["selection_liste"] = set()
+    st.rerun()
+
+
+def do_apply_allocation(n_suppleants: int):
+    """Applique la proposition de pré-remplissage avec verrou anti-double-clic."""
+    if st.session_state["processing"]:
+        return
+    st.session_state["processing"] = True
+    try:
+        result = db.apply_allocation(n_suppleants)
+    finally:
+        st.session_state["processing"] = False
+    if not result["success"]:
+        st.error(f"Proposition non appliquée : {result['error']}")
+        return
+    st.session_state.pop("allocation_preview", None)
+    st.rerun()
+
+
+def toggle_selection(id_demande: str):
+    selection = st.session_state["selection_liste"]
+    if st.session_state[f"sel_{id_demande}"]:
+        selection.add(id_demande)
+    else:
+        selection.discard(id_demande)
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : exports en arrière-plan
+# La génération tourne dans un pool de threads (export_jobs) ; la session ne
+# bloque plus et un fragment interroge l'état du job chaque seconde tant
+# qu'il n'est pas terminé. Un document déjà généré pour la version courante
+# des données est resservi sans nouvelle génération.
+# ---------------------------------------------------------------------------
+
+def render_export_controls(kind: str, icon: str):
+    """Bouton « Générer » et zone d'état / téléchargement d'un export."""
+    state_key = f"export_job_{kind}"
+    col_gen, col_dl, _ = st.columns([1, 1, 2])
+
+    with col_gen:
+        if st.button("Générer", key=f"gen_{kind}", type="primary", use_container_width=True, icon=icon):
+            st.session_state[state_key] = export_jobs.submit(kind)
+
+    job = export_jobs.get(st.session_state.get(state_key))
+    polling = job is not None and not job.finished
+
+    @st.fragment(run_every=1 if polling else None)
+    def job_status():
+        job = export_jobs.get(st.session_state.get(state_key))
+        if job is None:
+            return
+        if polling and job.finished:
+            # Rerun complet pour arrêter le sondage du fragment
+            st.rerun()
+        if job.status == export_jobs.DONE:
+            st.download_button(
+                label=f"Télécharger ({Path(job.file_name).suffix})", key=f"dl_{kind}",
+                data=job.data, file_name=job.file_name, mime=job.mime,
+                use_container_width=True, icon=":material/download:",
+            )
+            if job.data_version != db.get_data_version():
+                st.caption("Données modifiées depuis la génération.")
+        elif job.status == export_jobs.FAILED:
+            st.error(f"Échec de la génération : {job.error}")
+        else:
+            st.progress(job.progress, text=f"{job.status}…")
+
+    with col_dl:
+        job_status()
+
+
 # ---------------------------------------------------------------------------
 # Données globales (cachées)
 # ---------------------------------------------------------------------------
 
-all_df = cached_get_all_candidatures()
-quotas = cached_get_quotas()
-stats  = cached_get_stats()
+data_version = db.get_data_version()
+
+stats  = cached_get_stats(data_version)
+
+# ✅ Registre des quotas en mémoire : places restantes en O(1), sans GROUP BY
+ledger = db.get_quota_ledger()
+quotas = ledger.quotas()
 
 # ---------------------------------------------------------------------------
 # KPIs
@@ -162,17 +292,14 @@ with tab_liste:
     st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
 
     col_f1, col_f2, col_f3 = st.columns(3)
+    niveaux_filieres = cached_get_niveaux_filieres(data_version)
 
     with col_f1:
-        niveaux_dispo = sorted(
-            all_df["niveau_etudes"].unique(),
-            key=lambda x: NIVEAU_ORDER.index(x) if x in NIVEAU_ORDER else 99,
-        )
+        niveaux_dispo = list(dict.fromkeys(niv for niv, _ in niveaux_filieres))
         filtre_niveau = st.multiselect("Niveau d'études", niveaux_dispo, placeholder="Tous les niveaux…")
 
     with col_f2:
-        base_df = all_df[all_df["niveau_etudes"].isin(filtre_niveau)] if filtre_niveau else all_df
-        filieres_dispo = sorted(base_df["filiere"].unique())
+        filieres_dispo = sorted({fil for niv, fil in niveaux_filieres if not filtre_niveau or niv in filtre_niveau})
         filtre_filiere = st.multiselect("Filière", filieres_dispo, placeholder="Toutes les filières…")
 
     with col_f3:
@@ -184,38 +311,50 @@ with tab_liste:
 
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
 
-    filtered_df = all_df.copy()
-    if filtre_niveau:
-        filtered_df = filtered_df[filtered_df["niveau_etudes"].isin(filtre_niveau)]
-    if filtre_filiere:
-        filtered_df = filtered_df[filtered_df["filiere"].isin(filtre_filiere)]
-    if filtre_avis:
-        filtered_df = filtered_df[filtered_df["avis"].isin(filtre_avis)]
-
-    filtered_df["_niv_order"] = filtered_df["niveau_etudes"].map(
-        {v: i for i, v in enumerate(NIVEAU_ORDER)}
-    )
-    sort_cols       = ["_niv_order", "filiere"]
-    ascending_flags = [True, True]
-    if "moyenne" in filtered_df.columns:
-        sort_cols.append("moyenne")
-        ascending_flags.append(False)
-
-    filtered_df = (
-        filtered_df
-        .sort_values(by=sort_cols, ascending=ascending_flags)
-        .drop(columns=["_niv_order"])
-    )
-
-    if "page_liste" not in st.session_state:
-        st.session_state["page_liste"] = 1
-
-    total_rows  = len(filtered_df)
-    total_pages = max(1, -(-total_rows // PAGE_SIZE))
-    st.session_state["page_liste"] = min(st.session_state["page_liste"], total_pages)
-
-    page    = st.session_state["page_liste"]
-    page_df = filtered_df.iloc[(page - 1) * PAGE_SIZE : page * PAGE_SIZE]
+    # ✅ OPTIMISATION : filtres, tri et pagination exécutés par SQLite ;
+    # seules les PAGE_SIZE lignes affichées sont chargées. Pagination par clé :
+    # la pile des clés de début de page (None : première page) est gardée
+    # pour les filtres courants, et remise à zéro quand ils changent.
+    filtres = (tuple(filtre_niveau), tuple(filtre_filiere), tuple(filtre_avis))
+    if st.session_state.get("page_liste_filtres") != filtres:
+        st.session_state["page_liste_filtres"] = filtres
+        st.session_state["page_liste"] = [None]
+    page_keys  = st.session_state["page_liste"]
+    total_rows = cached_count_candidatures(data_version, *filtres)
+    page_df, next_key = cached_get_candidatures_page(data_version, *filtres, page_keys[-1])
+    while page_df.empty and len(page_keys) > 1:
+        # Lignes des dernières pages sorties du filtre depuis : on recule.
+        page_keys.pop()
+        page_df, next_key = cached_get_candidatures_page(data_version, *filtres, page_keys[-1])
+    page        = len(page_keys)
+    total_pages = max(page, -(-total_rows // PAGE_SIZE))
+
+    # Mode sélection : cocher des candidats (sur une ou plusieurs pages) puis
+    # leur appliquer un avis en une seule transaction (db.bulk_update_avis).
+    if "selection_liste" not in st.session_state:
+        st.session_state["selection_liste"] = set()
+    selection = st.session_state["selection_liste"]
+    mode_selection = st.toggle("Mode sélection", key="mode_selection",
+                               help="Cocher plusieurs candidats puis leur appliquer un avis en une fois.")
+    if mode_selection:
+        s_cols = st.columns([1.6, 1.4, 2, 1.4, 1.4])
+        s_cols[0].markdown(
+            f"<div style='line-height:2.6rem;font-weight:600'>{len(selection)} sélectionné(s)</div>",
+            unsafe_allow_html=True,
+        )
+        if s_cols[1].button("Toute la page", icon=":material/select_all:", use_container_width=True):
+            selection.update(page_df["id_demande"])
+            st.rerun()
+        avis_groupe = s_cols[2].selectbox(
+            "Avis", ["Favorable", "Défavorable", "Suppléant", "En attente"],
+            key="avis_groupe", label_visibility="collapsed",
+        )
+        if s_cols[3].button("Appliquer", type="primary", icon=":material/done_all:", use_container_width=True,
+                            disabled=not selection or st.session_state["processing"]):
+            do_bulk_update_avis([(i, avis_groupe) for i in sorted(selection)])
+        if s_cols[4].button("Vider", icon=":material/deselect:", use_container_width=True, disabled=not selection):
+            selection.clear()
+            st.rerun()
 
     h_cols = st.columns([0.6, 2.5, 1, 2.0, 3.0, 1.8, 2.2])
     for col, label in zip(h_cols, ["N°", "Candidat", "Niveau", "Filière", "Moy.", "Statut", "Actions"]):
@@ -227,23 +366,12 @@ with tab_liste:
     st.markdown("<div style='height:0.3rem'></div>", unsafe_allow_html=True)
     st.divider()
 
-    # ✅ Chargé une seule fois pour toute la page (pas dans la boucle)
-    fav_counts_local = cached_get_favorables_count()
-
     for _, row in page_df.iterrows():
         id_demande = row["id_demande"]
         avis       = row["avis"]
-        try:
-            raw_moy = str(row.get("moyenne") or 0).replace(",", ".")
-            moyenne = float(raw_moy)
-        except (ValueError, TypeError):
-            moyenne = 0.0
-
-        key_quota  = (row["niveau_etudes"], row["filiere"])
-        quota_full = (
-            quotas.get(key_quota) is not None
-            and fav_counts_local.get(key_quota, 0) >= quotas.get(key_quota)
-        )
+        moyenne    = row["moyenne_num"] if pd.notna(row["moyenne_num"]) else 0.0
+
+        quota_full = ledger.is_full((row["niveau_etudes"], row["filiere"]))
         _num = row.get("numero", id_demande)
 
         with st.container():
@@ -278,26 +406,33 @@ with tab_liste:
                 unsafe_allow_html=True,
             )
 
-            with cols[6]:
-                b_cols = st.columns(4)
-
-                # ✅ Verrou anti-double-clic : disabled si processing=True
-                def btn_action(col, icon, key_suffix, target_avis, current_avis, disabled_cond, help_text):
-                    is_disabled = (
-                        (current_avis == target_avis)
-                        or disabled_cond
-                        or st.session_state["processing"]
-                    )
-                    if col.button(
-                        "", key=f"{key_suffix}_{id_demande}", icon=icon,
-                        disabled=is_disabled, help=help_text,
-                    ):
-                        do_update_avis(id_demande, target_avis)
+            if mode_selection:
+                st.session_state[f"sel_{id_demande}"] = id_demande in selection
+                cols[6].checkbox(
+                    "Sélectionner", key=f"sel_{id_demande}", label_visibility="collapsed",
+                    on_change=toggle_selection, args=(id_demande,),
+                )
+            else:
+                with cols[6]:
+                    b_cols = st.columns(4)
+
+                    # ✅ Verrou anti-double-clic : disabled si processing=True
+                    def btn_action(col, icon, key_suffix, target_avis, current_avis, disabled_cond, help_text):
+                        is_disabled = (
+                            (current_avis == target_avis)
+                            or disabled_cond
+                            or st.session_state["processing"]
+                        )
+                        if col.button(
+                            "", key=f"{key_suffix}_{id_demande}", icon=icon,
+                            disabled=is_disabled, help=help_text,
+                        ):
+                            do_update_avis(id_demande, target_avis)
 
-                btn_action(b_cols[0], ":material/check_circle:", "fav",  "Favorable",   avis, (quota_full and avis != "Favorable"), "Favorable")
-                btn_action(b_cols[1], ":material/cancel:",       "def",  "Défavorable", avis, False, "Défavorable")
-                btn_action(b_cols[2], ":material/group_add:",    "sup",  "Suppléant",   avis, False, "Suppléant")
-                btn_action(b_cols[3], ":material/schedule:",     "att",  "En attente",  avis, False, "En attente")
+                    btn_action(b_cols[0], ":material/check_circle:", "fav",  "Favorable",   avis, (quota_full and avis != "Favorable"), "Favorable")
+                    btn_action(b_cols[1], ":material/cancel:",       "def",  "Défavorable", avis, False, "Défavorable")
+                    btn_action(b_cols[2], ":material/group_add:",    "sup",  "Suppléant",   avis, False, "Suppléant")
+                    btn_action(b_cols[3], ":material/schedule:",     "att",  "En attente",  avis, False, "En attente")
 
         st.markdown("<div style='margin-bottom:4px;'></div>", unsafe_allow_html=True)
         st.divider()
@@ -308,12 +443,12 @@ with tab_liste:
 
     with col_prev:
         if st.button("← Précédent", disabled=(page <= 1), use_container_width=True):
-            st.session_state["page_liste"] = page - 1
+            page_keys.pop()
             st.rerun()
 
     with col_info:
         start_row = (page - 1) * PAGE_SIZE + 1
-        end_row   = min(page * PAGE_SIZE, total_rows)
+        end_row   = start_row + len(page_df) - 1
         st.markdown(
             f"<div style='text-align:center;color:{COLORS['text_muted']};line-height:2.6rem;"
             f"font-size:1.05rem;font-weight:600'>"
@@ -322,16 +457,52 @@ with tab_liste:
         )
 
     with col_next:
-        if st.button("Suivant →", disabled=(page >= total_pages), use_container_width=True):
-            st.session_state["page_liste"] = page + 1
+        if st.button("Suivant →", disabled=next_key is None, use_container_width=True):
+            page_keys.append(next_key)
             st.rerun()
 
+    # Doublons détectés au chargement (table doublons, cf. duplicates.py)
+    doublons = cached_get_duplicates(data_version)
+    if not doublons.empty:
+        st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
+        n_groupes = doublons["cluster"].nunique()
+        with st.expander(f"Doublons détectés ({n_groupes} groupe{'s' if n_groupes > 1 else ''})", icon=":material/content_copy:"):
+            categories = {
+                "identical": "Identiques",
+                "same_person_diff_filiere": "Même personne, autre filière",
+                "different_people": "Personnes différentes, même ID",
+            }
+            filtre_cat = st.multiselect(
+                "Catégorie", list(categories), format_func=categories.get,
+                placeholder="Toutes les catégories…", key="filtre_doublons",
+            )
+            vue = doublons[doublons["categorie"].isin(filtre_cat)] if filtre_cat else doublons
+            st.dataframe(
+                vue.assign(categorie=vue["categorie"].map(categories)),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "cluster": st.column_config.NumberColumn("Groupe"),
+                    "categorie": "Catégorie",
+                    "score": st.column_config.ProgressColumn("Similarité", min_value=0.0, max_value=1.0, format="%.2f"),
+                    "garde": st.column_config.CheckboxColumn("Gardé"),
+                    "id_demande": None,
+                    "numero": "N°",
+                    "id_russe": "ID russe",
+                    "name": "Nom",
+                    "date_lieu_naissance": "Naissance",
+                    "niveau_etudes": "Niveau",
+                    "filiere": "Filière",
+                    "avis": "Avis",
+                },
+            )
+
 # ===========================================================================
 # ONGLET 2 — SUIVI DES QUOTAS
 # ===========================================================================
 
 with tab_quotas:
-    fav = cached_get_favorables_count()
+    fav = ledger.favorables_counts()
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
     st.markdown(section_header("monitoring", "État d'avancement des quotas"), unsafe_allow_html=True)
     st.caption("Aperçu en temps réel des places disponibles par filière et par niveau.")
@@ -346,6 +517,82 @@ with tab_quotas:
         st.markdown(render_quota_grid(niveau, niveau_quotas, fav), unsafe_allow_html=True)
         st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
 
+    # Pré-remplissage : Favorable aux meilleures moyennes jusqu'au quota, puis
+    # Suppléant (db.propose_allocation / db.apply_allocation).
+    st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
+    st.markdown(section_header("auto_awesome", "Pré-remplissage automatique"), unsafe_allow_html=True)
+    st.caption(
+        "Classe les candidats en attente de chaque filière par moyenne : Favorable jusqu'au quota, "
+        "puis Suppléant pour les suivants. Rien n'est écrit avant « Appliquer »."
+    )
+    a_cols = st.columns([1.2, 1, 1.4])
+    n_suppleants = a_cols[0].number_input(
+        "Suppléants par filière", min_value=0, max_value=50, value=db.N_SUPPLEANTS, key="n_suppleants",
+    )
+    if a_cols[1].button("Prévisualiser", icon=":material/preview:", use_container_width=True):
+        st.session_state["allocation_preview"] = (data_version, n_suppleants)
+
+    # L'aperçu n'est valable que pour l'état des données qui l'a produit.
+    if st.session_state.get("allocation_preview") == (data_version, n_suppleants):
+        proposition = cached_propose_allocation(data_version, n_suppleants)
+        if proposition.empty:
+            st.info("Aucun candidat en attente à proposer.")
+        else:
+            counts = proposition["avis_propose"].value_counts()
+            st.markdown(
+                f"**{counts.get('Favorable', 0)}** favorable(s) et "
+                f"**{counts.get('Suppléant', 0)}** suppléant(s) proposés."
+            )
+            if a_cols[2].button("Appliquer la proposition", type="primary", icon=":material/done_all:",
+                                use_container_width=True, disabled=st.session_state["processing"]):
+                do_apply_allocation(n_suppleants)
+            st.dataframe(
+                proposition,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "id_demande": None,
+                    "numero": "N°",
+                    "name": "Candidat",
+                    "niveau_etudes": "Niveau",
+                    "filiere": "Filière",
+                    "moyenne_num": st.column_config.NumberColumn("Moyenne", format="%.2f"),
+                    "rang": "Rang",
+                    "avis_propose": "Avis proposé",
+                },
+            )
+
+    # Noms de filières rapprochés de leur nom de référence (cf. filiere_resolver.py)
+    aliases = cached_get_filiere_aliases(data_version)
+    if not aliases.empty:
+        a_verifier = int(aliases["methode"].isin(["inconnu", "approx"]).sum())
+        with st.expander(f"Correspondances de filières ({a_verifier} à vérifier)", icon=":material/rule:"):
+            st.caption(
+                "Noms rencontrés dans les fichiers et filière retenue. "
+                "Une correction est enregistrée comme manuelle et s'applique aux prochains chargements."
+            )
+            options = sorted({fil for _, fil in quotas} | set(aliases["filiere"]))
+            edited = st.data_editor(
+                aliases,
+                key="aliases_editor",
+                hide_index=True,
+                use_container_width=True,
+                disabled=["niveau_etudes", "alias", "methode", "distance"],
+                column_config={
+                    "niveau_etudes": "Niveau",
+                    "alias": "Nom rencontré",
+                    "filiere": st.column_config.SelectboxColumn("Filière retenue", options=options, required=True),
+                    "methode": "Méthode",
+                    "distance": st.column_config.NumberColumn("Écart", help="Distance d'édition (rapprochement approché)"),
+                },
+            )
+            changes = edited[edited["filiere"] != aliases["filiere"]]
+            if st.button("Enregistrer les corrections", icon=":material/save:",
+                         disabled=changes.empty or st.session_state["processing"]):
+                for row in changes.itertuples():
+                    db.set_filiere_alias(row.niveau_etudes, row.alias, row.filiere)
+                st.rerun()
+
 # ===========================================================================
 # ONGLET 3 — EXAMEN INDIVIDUEL
 # ===========================================================================
@@ -391,10 +638,24 @@ with tab_eval:
         st.info(f"Saisissez un **{critere}** pour afficher et évaluer un candidat.")
     else:
         field    = CRITERES[critere]
-        candidat = db.search_by_field(field, search_query)
+        candidat = None
+
+        # ✅ OPTIMISATION : recherche à la frappe servie par l'index en mémoire
+        # (aucune requête tant que les données n'ont pas changé). Seule la
+        # fiche du candidat retenu est relue en base, pour un avis à jour.
+        matches = db.get_prefix_index(data_version).search(field, search_query)
+        if matches.exact == 1 or len(matches.entries) == 1:
+            candidat = db.search_by_field("id_demande", matches.entries[0].id_demande)
+            results  = []
+        elif matches.entries:
+            results = [e._asdict() for e in matches.entries]
+        else:
+            # Recherche exacte en base, puis tolérante : sous-chaîne (N°, ID
+            # russe), fautes de frappe (nom)
+            candidat = db.search_by_field(field, search_query)
+            results  = [] if candidat else db.search_by_field_fuzzy(field, search_query)
 
         if not candidat:
-            results = db.search_by_field_fuzzy(field, search_query)
             if not results:
                 st.warning(f"Aucune candidature trouvée pour **{critere}** = « {search_query} ».")
             elif len(results) == 1:
@@ -406,23 +667,33 @@ with tab_eval:
                     for r in results
                 }
                 selected = st.selectbox("Candidat", list(options.keys()), label_visibility="collapsed")
-                candidat = db.search_by_field("numero", options[selected])
+                candidat = db.search_by_field("id_demande", options[selected])
 
         if candidat:
             st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
 
-            fav_counts    = cached_get_favorables_count()
             niveau        = candidat["niveau_etudes"]
             filiere       = candidat["filiere"]
-            places        = quotas.get((niveau, filiere))
-            selectionnes  = fav_counts.get((niveau, filiere), 0)
-            quota_atteint = places is not None and selectionnes >= places
+            places        = ledger.places((niveau, filiere))
+            selectionnes  = ledger.favorables((niveau, filiere))
+            quota_atteint = ledger.is_full((niveau, filiere))
 
             col_info_panel, col_actions = st.columns([2, 1], gap="large")
 
             with col_info_panel:
                 st.markdown(render_candidat_card(candidat), unsafe_allow_html=True)
 
+                historique = cached_get_journal(data_version, (db.JOURNAL_AVIS,), candidat["id_demande"])
+                if not historique.empty:
+                    with st.expander(f"Historique des avis ({len(historique)})", icon=":material/history:"):
+                        st.dataframe(
+                            historique[["heure", "avant", "apres"]].rename(
+                                columns={"heure": "Heure", "avant": "Avis précédent", "apres": "Nouvel avis"}
+                            ),
+                            use_container_width=True,
+                            hide_index=True,
+                        )
+
             with col_actions:
                 st.markdown(render_quota_mini(filiere, niveau, selectionnes, places, COLORS), unsafe_allow_html=True)
 
@@ -478,8 +749,6 @@ with tab_eval:
 # ===========================================================================
 
 with tab_realloc:
-    from datetime import datetime
-
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
     st.markdown(section_header("swap_horiz", "Réallocation des quotas"), unsafe_allow_html=True)
     st.caption(
@@ -488,7 +757,7 @@ with tab_realloc:
     )
     st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
 
-    total_quota = sum(cached_get_quotas().values())
+    total_quota = ledger.total_places()
     st.markdown(
         f'<div class="transfer-summary">'
         f'<div class="transfer-summary-title">Total des bourses : {total_quota} / 150</div>'
@@ -497,8 +766,8 @@ with tab_realloc:
     )
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
 
-    realloc_quotas = cached_get_quotas()
-    realloc_fav    = cached_get_favorables_count()
+    realloc_quotas = quotas
+    realloc_fav    = ledger.favorables_counts()
 
     niveaux_with_quotas = sorted(
         {k[0] for k in realloc_quotas},
@@ -577,15 +846,6 @@ with tab_realloc:
         else:
             result = db.transfer_quota(src_niveau, src_filiere, dest_niveau, dest_filiere, nb_transfer)
             if result["success"]:
-                invalidate_cache()
-                if "transfer_log" not in st.session_state:
-                    st.session_state["transfer_log"] = []
-                st.session_state["transfer_log"].append({
-                    "source":      f"{src_filiere} ({src_niveau})",
-                    "destination": f"{dest_filiere} ({dest_niveau})",
-                    "places":      nb_transfer,
-                    "horodatage":  datetime.now().strftime("%H:%M:%S"),
-                })
                 st.success(
                     f"Transfert effectué : **{nb_transfer}** place(s) de "
                     f"*{src_filiere}* → *{dest_filiere}*. "
@@ -596,12 +856,59 @@ with tab_realloc:
             else:
                 st.error(f"Échec du transfert : {result['error']}")
 
-    if st.session_state.get("transfer_log"):
+    # Optimisation : places jamais pourvues (quota > favorables + candidats en
+    # lice) redistribuées aux filières en demande (cf. quota_optimizer.py).
+    st.markdown("<div style='height:1.5rem'></div>", unsafe_allow_html=True)
+    st.markdown(section_header("auto_fix_high", "Optimisation automatique"), unsafe_allow_html=True)
+    st.caption(
+        "Repère les places qui ne pourront pas être pourvues faute de candidats et les "
+        "redistribue aux filières en demande, en priorité aux meilleures moyennes."
+    )
+    o_cols = st.columns([1.2, 1.2, 1, 1.4])
+    opt_same_niveau = o_cols[0].toggle("Même niveau uniquement", value=True, key="opt_same_niveau")
+    opt_cap = o_cols[1].number_input("Quota maximal par filière (0 = aucun)", min_value=0, value=0, key="opt_cap")
+    if o_cols[2].button("Calculer", icon=":material/calculate:", use_container_width=True):
+        st.session_state["realloc_plan"] = (data_version, opt_same_niveau, opt_cap)
+
+    # Le plan n'est affiché que pour l'état des données et les règles qui l'ont produit.
+    if st.session_state.get("realloc_plan") == (data_version, opt_same_niveau, opt_cap):
+        plan = db.propose_reallocation(opt_same_niveau, opt_cap or None)
+        if not plan.transfers:
+            st.info("Aucune place à redistribuer avec ces règles.")
+        else:
+            st.markdown(
+                f"**{plan.filled}** place(s) récupérée(s) en **{len(plan.transfers)}** transfert(s)"
+                f" — demande encore sans place : {plan.unmet}."
+            )
+            st.dataframe(
+                pd.DataFrame(
+                    [(f"{s_fil} ({s_niv})", f"{d_fil} ({d_niv})", n)
+                     for (s_niv, s_fil), (d_niv, d_fil), n in plan.transfers],
+                    columns=["Source", "Destination", "Places"],
+                ),
+                use_container_width=True,
+                hide_index=True,
+            )
+            if o_cols[3].button("Appliquer le lot", type="primary", icon=":material/done_all:",
+                                use_container_width=True, disabled=st.session_state["processing"]):
+                result = db.transfer_quotas(plan.transfers)
+                if result["success"]:
+                    st.session_state.pop("realloc_plan", None)
+                    st.rerun()
+                else:
+                    st.error(f"Échec du lot de transferts : {result['error']}")
+
+    # Historique lu dans le journal de la base : conservé d'une session à l'autre.
+    transfer_log = cached_get_journal(data_version, (db.JOURNAL_TRANSFERT,))
+    if not transfer_log.empty:
         st.markdown("<div style='height:1.5rem'></div>", unsafe_allow_html=True)
-        st.markdown(section_header("history", "Historique des transferts (session)"), unsafe_allow_html=True)
-        import pandas as _pd
-        log_df = _pd.DataFrame(st.session_state["transfer_log"])
-        log_df.columns = ["Source", "Destination", "Places", "Heure"]
+        st.markdown(section_header("history", "Historique des transferts"), unsafe_allow_html=True)
+        log_df = pd.DataFrame({
+            "Source":      transfer_log["filiere"] + " (" + transfer_log["niveau_etudes"] + ")",
+            "Destination": transfer_log["dest_filiere"] + " (" + transfer_log["dest_niveau"] + ")",
+            "Places":      transfer_log["nb_places"],
+            "Heure":       transfer_log["heure"],
+        })
         st.dataframe(log_df, use_container_width=True, hide_index=True)
 
 # ===========================================================================
@@ -612,6 +919,10 @@ with tab_export:
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
     st.markdown(section_header("download", "Génération des documents officiels"), unsafe_allow_html=True)
     st.caption("Générez et téléchargez les documents de décisions finales pour transmission officielle.")
+    # Les quatre documents à partir d'une seule lecture de la base
+    if st.button("Tout générer", key="gen_all", icon=":material/library_books:"):
+        for kind, job_id in export_jobs.submit_all().items():
+            st.session_state[f"export_job_{kind}"] = job_id
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
 
     # Export 1 : Word — Titulaires & Suppléants
@@ -626,24 +937,7 @@ with tab_export:
         </div>
     </div>
     """, unsafe_allow_html=True)
-    col_g1, col_d1, _ = st.columns([1, 1, 2])
-    with col_g1:
-        if st.button("Générer", key="gen_word", type="primary", use_container_width=True, icon=":material/description:"):
-            with st.spinner("Génération en cours…"):
-                output = "export_decisions_cnbau.docx"
-                db.export_to_docx(output)
-                with open(output, "rb") as f:
-                    st.session_state["export_word_data"] = f.read()
-                st.session_state["export_word_ready"] = True
-    with col_d1:
-        if st.session_state.get("export_word_ready"):
-            st.download_button(
-                label="Télécharger (.docx)", key="dl_word",
-                data=st.session_state["export_word_data"],
-                file_name="export_decisions_cnbau.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                use_container_width=True, icon=":material/download:",
-            )
+    render_export_controls("word", ":material/description:")
 
     st.divider()
 
@@ -659,24 +953,7 @@ with tab_export:
         </div>
     </div>
     """, unsafe_allow_html=True)
-    col_g2, col_d2, _ = st.columns([1, 1, 2])
-    with col_g2:
-        if st.button("Générer", key="gen_word_all", type="primary", use_container_width=True, icon=":material/fact_check:"):
-            with st.spinner("Génération en cours…"):
-                output = "export_toutes_decisions_cnbau.docx"
-                db.export_all_avis_to_docx(output)
-                with open(output, "rb") as f:
-                    st.session_state["export_word_all_data"] = f.read()
-                st.session_state["export_word_all_ready"] = True
-    with col_d2:
-        if st.session_state.get("export_word_all_ready"):
-            st.download_button(
-                label="Télécharger (.docx)", key="dl_word_all",
-                data=st.session_state["export_word_all_data"],
-                file_name="export_toutes_decisions_cnbau.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                use_container_width=True, icon=":material/download:",
-            )
+    render_export_controls("word_all", ":material/fact_check:")
 
     st.divider()
 
@@ -692,24 +969,7 @@ with tab_export:
         </div>
     </div>
     """, unsafe_allow_html=True)
-    col_g3, col_d3, _ = st.columns([1, 1, 2])
-    with col_g3:
-        if st.button("Générer", key="gen_excel_avis", type="primary", use_container_width=True, icon=":material/table_chart:"):
-            with st.spinner("Génération en cours…"):
-                output = "export_decisions_cnbau.xlsx"
-                db.export_avis_to_xlsx(output)
-                with open(output, "rb") as f:
-                    st.session_state["export_excel_avis_data"] = f.read()
-                st.session_state["export_excel_avis_ready"] = True
-    with col_d3:
-        if st.session_state.get("export_excel_avis_ready"):
-            st.download_button(
-                label="Télécharger (.xlsx)", key="dl_excel_avis",
-                data=st.session_state["export_excel_avis_data"],
-                file_name="export_decisions_cnbau.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True, icon=":material/download:",
-            )
+    render_export_controls("excel_avis", ":material/table_chart:")
 
     st.divider()
 
@@ -725,24 +985,23 @@ with tab_export:
         </div>
     </div>
     """, unsafe_allow_html=True)
-    col_g4, col_d4, _ = st.columns([1, 1, 2])
-    with col_g4:
-        if st.button("Générer", key="gen_excel_quotas", type="primary", use_container_width=True, icon=":material/grid_view:"):
-            with st.spinner("Génération en cours…"):
-                output = "export_quotas_cnbau.xlsx"
-                db.export_quotas_to_xlsx(output)
-                with open(output, "rb") as f:
-                    st.session_state["export_excel_quotas_data"] = f.read()
-                st.session_state["export_excel_quotas_ready"] = True
-    with col_d4:
-        if st.session_state.get("export_excel_quotas_ready"):
-            st.download_button(
-                label="Télécharger (.xlsx)", key="dl_excel_quotas",
-                data=st.session_state["export_excel_quotas_data"],
-                file_name="export_quotas_cnbau.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True, icon=":material/download:",
-            )
+    render_export_controls("excel_quotas", ":material/grid_view:")
+
+    st.divider()
+
+    # Export 5 : Archive ZIP — les quatre documents
+    st.markdown(f"""
+    <div class="export-card">
+        <div class="export-card-header">
+            <span class="ms" style="font-size:28px;color:{COLORS['accent']};">folder_zip</span>
+            <div>
+                <div class="export-card-title">Archive complète — ZIP</div>
+                <div class="export-card-desc">Les quatre documents ci-dessus générés en parallèle dans une seule archive, avec un manifeste (effectifs par avis, empreintes SHA-256) pour la clôture de la commission.</div>
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    render_export_controls(export_jobs.BUNDLE, ":material/folder_zip:")
 
 # ---------------------------------------------------------------------------
 # Header sticky (JS)
@@ -779,7 +1038,48 @@ with st.sidebar:
     st.markdown('<div style="height:1rem"></div>', unsafe_allow_html=True)
     st.divider()
 
+    # Instantanés : point de retour avant une action risquée, restauré en
+    # une seule étape au lieu de recharger le classeur et refaire les décisions.
+    st.markdown("**Instantanés**")
+    snapshot_name = st.text_input("Nom de l'instantané", key="snapshot_name",
+                                  placeholder="ex. Avant pré-remplissage")
+    if st.button("Créer un instantané", icon=":material/photo_camera:", use_container_width=True,
+                 disabled=st.session_state["processing"]):
+        result = db.take_snapshot(snapshot_name)
+        if result["success"]:
+            st.toast(f"Instantané « {result['snapshot']['nom']} » créé.")
+        else:
+            st.error(result["error"])
+
+    snapshots = {s["id"]: s for s in db.list_snapshots()}
+    if snapshots:
+        snapshot_id = st.selectbox(
+            "Instantanés enregistrés",
+            list(snapshots),
+            format_func=lambda i: f"{snapshots[i]['nom']} — {snapshots[i]['heure']} "
+                                  f"({snapshots[i]['favorables']} favorables)",
+            key="snapshot_choice",
+        )
+        snap_cols = st.columns(2)
+        if snap_cols[0].button("Restaurer", icon=":material/restore:", use_container_width=True,
+                               disabled=st.session_state["processing"]):
+            result = db.restore_snapshot(snapshot_id)
+            if result["success"]:
+                invalidate_cache()
+                st.toast(f"Instantané « {result['snapshot']['nom']} » restauré.")
+                st.rerun()
+            else:
+                st.error(f"Échec de la restauration : {result['error']}")
+        if snap_cols[1].button("Supprimer", icon=":material/delete:", use_container_width=True,
+                               disabled=st.session_state["processing"]):
+            db.delete_snapshot(snapshot_id)
+            st.rerun()
+    st.divider()
+
     if st.button("Réinitialiser la session", type="secondary", use_container_width=True):
+        # Instantané automatique : une réinitialisation reste réversible.
+        if db.is_db_loaded():
+            db.take_snapshot("Avant réinitialisation", keep=RESET_SNAPSHOTS_KEPT)
         db.reset_db()
         invalidate_cache()
         for key in list(st.session_state.keys()):
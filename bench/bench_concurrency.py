@@ -0,0 +1,69 @@
+"""Écritures concurrentes : décisions par seconde de update_avis avec les
+réglages du pool (WAL, synchronous=NORMAL, busy_timeout) comparées au
+journal de rollback d'origine (journal_mode=DELETE, synchronous=FULL, délai
+par défaut de sqlite3.connect), avec des lecteurs de la liste en parallèle.
+
+    python bench/bench_concurrency.py [écrivains, 8 par défaut] [écritures par écrivain, 200 par défaut]
+"""
+
+import sys
+import threading
+import time
+
+from common import database, make_cnabau_workbook, temp_database
+
+READERS = 3
+ROLLBACK_JOURNAL = {"journal_mode": "DELETE", "synchronous": "FULL", "busy_timeout": 5000}
+
+
+def bench(label: str, pragmas: dict, writers: int, writes: int):
+    previous = database.SQLITE_PRAGMAS
+    database.SQLITE_PRAGMAS = pragmas
+    try:
+        with temp_database() as tmp:
+            database.load_excel_to_db(str(make_cnabau_workbook(tmp / "bench.xlsx", 2000)))
+            with database.connection() as conn:
+                ids = [r[0] for r in conn.execute("SELECT id_demande FROM candidatures")]
+            errors, reads = [], []
+            done = threading.Event()
+
+            def writer(i):
+                for k in range(writes):
+                    try:
+                        database.update_avis(ids[(i * 37 + k) % len(ids)], ("Suppléant", "Défavorable")[k % 2])
+                    except Exception as e:
+                        errors.append(e)
+
+            def reader():
+                while not done.is_set():
+                    try:
+                        database.get_candidatures_page(page_size=50)
+                        reads.append(None)
+                    except Exception as e:
+                        errors.append(e)
+
+            threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+            observers = [threading.Thread(target=reader) for _ in range(READERS)]
+            for t in observers:
+                t.start()
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            done.set()
+            for t in observers:
+                t.join()
+    finally:
+        database.SQLITE_PRAGMAS = previous
+    n = writers * writes
+    print(f"{label:10} {n} écritures  {elapsed:6.2f} s  {n / elapsed:>7.0f} écritures/s  "
+          f"{len(reads) / elapsed:>7.0f} pages lues/s  {len(errors)} erreurs")
+
+
+if __name__ == "__main__":
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    bench("rollback", ROLLBACK_JOURNAL, writers, writes)
+    bench("wal", database.SQLITE_PRAGMAS, writers, writes)
@@ -0,0 +1,105 @@
+"""Tableaux Word : temps de construction du tableau des candidats par
+docx_table (XML écrit d'un bloc) et par l'ancienne construction cellule par
+cellule avec python-docx, et vérification que les deux donnent le même texte.
+
+    python bench/bench_docx.py [nombre de candidats, 1000 par défaut]
+"""
+
+import random
+import sys
+import time
+from itertools import groupby
+
+from common import NAME_WORDS, quota_keys
+from docx import Document
+from docx.enum.table import WD_ALIGN_VERTICAL
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt, Twips
+
+from docx_table import build_candidates_table
+
+
+def make_candidates(n: int, seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    keys = quota_keys()
+    candidates = [
+        {"niveau_etudes": niveau, "filiere": filiere, "name": " ".join(rnd.sample(NAME_WORDS, 3)),
+         "observation": rnd.choice(("", "", "Suppléant", "Dossier incomplet"))}
+        for niveau, filiere in (keys[rnd.randrange(len(keys))] for _ in range(n))
+    ]
+    order = {niveau: i for i, (niveau, _) in reversed(list(enumerate(keys)))}
+    return sorted(candidates, key=lambda c: (order[c["niveau_etudes"]], c["filiere"]))
+
+
+def _run(cell, text, bold=False, center=False):
+    cell.text = ""
+    p = cell.paragraphs[0]
+    if center:
+        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    run = p.add_run(text)
+    run.font.name = "Trebuchet MS"
+    run.font.size = Pt(11)
+    run.bold = bold
+    run.underline = False
+
+
+def _shade(cell, color):
+    shd = OxmlElement("w:shd")
+    shd.set(qn("w:val"), "clear")
+    shd.set(qn("w:color"), "auto")
+    shd.set(qn("w:fill"), color)
+    cell._tc.get_or_add_tcPr().append(shd)
+
+
+def python_docx_table(doc, candidates_list):
+    """Ancienne construction : add_row, un run par cellule, fusion par merge."""
+    table = doc.add_table(rows=1, cols=4, style="Table Grid")
+    for i, width in enumerate((567, 4254, 4223, 2127)):
+        table.columns[i].width = Twips(width)
+    for cell, text in zip(table.rows[0].cells, ("N° ", "FILIERE", "NOM ET PRENOMS", "OBSERVATIONS")):
+        _run(cell, text, center=True)
+        _shade(cell, "BFBFBF")
+        cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+
+    num = 1
+    for niveau, niveau_group in groupby(candidates_list, key=lambda c: c["niveau_etudes"]):
+        row = table.add_row()
+        _run(row.cells[0], niveau.upper(), bold=True, center=True)
+        _shade(row.cells[0], "E7E6E6")
+        row.cells[0].merge(row.cells[-1])
+        for filiere, fil_group in groupby(niveau_group, key=lambda c: c["filiere"]):
+            first = len(table.rows)
+            for i, c in enumerate(fil_group):
+                cells = table.add_row().cells
+                _run(cells[0], str(num), center=True)
+                _run(cells[1], filiere if i == 0 else "")
+                _run(cells[2], c["name"])
+                _run(cells[3], c["observation"] or "")
+                num += 1
+            last = len(table.rows) - 1
+            if last > first:
+                table.cell(first, 1).merge(table.cell(last, 1))
+    return table
+
+
+def _texts(table) -> list[str]:
+    return [" | ".join(dict.fromkeys(c.text.strip() for c in row.cells)) for row in table.rows]
+
+
+def bench(label: str, build, candidates) -> list[str]:
+    doc = Document()
+    start = time.perf_counter()
+    table = build(doc, candidates)
+    elapsed = time.perf_counter() - start
+    print(f"{label:12} {len(table.rows):>6} lignes  {elapsed:7.3f} s")
+    return _texts(table)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    candidates = make_candidates(n)
+    old = bench("python-docx", python_docx_table, candidates)
+    new = bench("docx_table", build_candidates_table, candidates)
+    print("contenu identique :", old == new)
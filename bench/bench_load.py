@@ -0,0 +1,25 @@
+"""Chargement en masse : lignes par seconde de load_excel_to_db, sur un
+classeur CNaBAU et un classeur à plat synthétiques.
+
+    python bench/bench_load.py [nombre de lignes, 100000 par défaut]
+"""
+
+import sys
+import time
+
+from common import database, make_cnabau_workbook, make_flat_workbook, temp_database
+
+
+def bench(label: str, make, n: int):
+    with temp_database() as tmp:
+        path = make(tmp / f"{label}.xlsx", n)
+        start = time.perf_counter()
+        loaded = database.load_excel_to_db(str(path))
+        elapsed = time.perf_counter() - start
+    print(f"{label:8} {loaded:>7} lignes  {elapsed:6.2f} s  {loaded / elapsed:>8.0f} lignes/s")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bench("cnabau", make_cnabau_workbook, n)
+    bench("plat", make_flat_workbook, n)
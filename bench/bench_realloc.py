@@ -0,0 +1,119 @@
+"""Réallocation des places (quota_optimizer.plan_transfers) sur des demandes
+synthétiques : temps de calcul, nombre d'étapes, et vérification du plan —
+total conservé, aucun quota sous ses favorables, plafond respecté, places
+pourvues égales à la borne min(offre, demande) par groupe, meilleures
+moyennes servies d'abord.
+
+    python bench/bench_realloc.py [nombre de tirages par cas, 50 par défaut]
+"""
+
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+import common  # noqa: F401  (dépôt sur sys.path)
+import quota_optimizer
+
+NIVEAUX = ("Licence", "Master", "Doctorat", "Spécialisation")
+N_FILIERES = 53
+TOTAL_PLACES = 150
+N_CANDIDATS = 300  # deux candidats par place
+
+# Poids de la demande par filière (rang i)
+DEMANDES = {
+    "uniforme": lambda i: 1,
+    "zipf": lambda i: 1 / (i + 1) ** 1.2,
+    "filieres_vides": lambda i: 0 if i % 6 == 0 else 1,
+}
+
+
+def synthetic(kind: str, seed: int, n_filieres=N_FILIERES, total=TOTAL_PLACES, n_candidats=N_CANDIDATS):
+    """(quotas, favorables, en lice) ; « penurie » : demande uniforme très inférieure à l'offre."""
+    rnd = random.Random(seed)
+    keys = [(NIVEAUX[i % len(NIVEAUX)], f"Filière {i}") for i in range(n_filieres)]
+    quotas = dict.fromkeys(keys, 1)
+    for key in rnd.choices(keys, k=total - n_filieres):
+        quotas[key] += 1
+    if kind == "penurie":
+        kind, n_candidats = "uniforme", total * 4 // 5
+    weights = [DEMANDES[kind](i) for i in range(n_filieres)]
+    demand = defaultdict(int)
+    for key in rnd.choices(keys, weights=weights, k=n_candidats):
+        demand[key] += 1
+    favorables, pending = {}, {}
+    for key in keys:
+        favorables[key] = min(demand[key], rnd.randint(0, quotas[key]))
+        pending[key] = sorted((round(rnd.uniform(10, 18), 2) for _ in range(demand[key] - favorables[key])),
+                              reverse=True)
+    return quotas, favorables, pending
+
+
+def _room(quota: int, cap) -> int:
+    return max(cap - quota, 0) if cap is not None else float("inf")
+
+
+def check(plan, quotas, favorables, pending, same_niveau, cap) -> list[str]:
+    """Écarts du plan avec ses garanties (liste vide si conforme)."""
+    problems = []
+    new = dict(quotas)
+    for t in plan.transfers:
+        new[t.source] -= t.nb_places
+        new[t.dest] += t.nb_places
+        if same_niveau and t.source[0] != t.dest[0]:
+            problems.append(f"transfert entre niveaux {t}")
+    if sum(new.values()) != sum(quotas.values()):
+        problems.append("total modifié")
+    problems += [f"{k} sous ses favorables" for k in quotas if new[k] < favorables[k]]
+    if cap is not None:
+        problems += [f"{k} au-dessus du plafond" for k in quotas if new[k] > max(cap, quotas[k])]
+
+    offer, demand = defaultdict(int), defaultdict(int)
+    served, unserved = defaultdict(list), defaultdict(list)
+    for k, quota in quotas.items():
+        group = k[0] if same_niveau else ""
+        free = quota - favorables[k]
+        if free > len(pending[k]):
+            offer[group] += free - len(pending[k])
+        else:
+            demand[group] += min(len(pending[k]) - max(free, 0), _room(quota, cap))
+        start = max(free, 0)
+        cut = start + plan.gained.get(k, 0)
+        served[group] += pending[k][start:cut]
+        unserved[group] += pending[k][cut:start + min(len(pending[k]) - start, _room(quota, cap))]
+    bound = sum(min(offer[g], demand[g]) for g in offer.keys() | demand.keys())
+    if plan.filled != bound:
+        problems.append(f"{plan.filled} places pourvues, borne {bound}")
+    problems += [f"mérite non respecté ({g})" for g in served
+                 if served[g] and unserved[g] and min(served[g]) < max(unserved[g])]
+    return problems
+
+
+def bench(kind: str, same_niveau: bool, cap, runs: int):
+    times, legs, filled, problems = [], [], [], []
+    for seed in range(runs):
+        quotas, favorables, pending = synthetic(kind, seed)
+        start = time.perf_counter()
+        plan = quota_optimizer.plan_transfers(quotas, favorables, pending, same_niveau=same_niveau, cap=cap)
+        times.append(time.perf_counter() - start)
+        legs.append(len(plan.transfers))
+        filled.append(plan.filled)
+        problems += check(plan, quotas, favorables, pending, same_niveau, cap)
+    print(f"{kind:15} même niveau={same_niveau!s:5} plafond={cap!s:4} "
+          f"pourvues≈{statistics.mean(filled):5.1f} étapes≈{statistics.mean(legs):4.1f} "
+          f"médiane {statistics.median(times) * 1e3:6.2f} ms  max {max(times) * 1e3:6.2f} ms  "
+          f"{'conforme' if not problems else problems[:3]}")
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    for kind in (*DEMANDES, "penurie"):
+        for same_niveau, cap in ((True, None), (False, None), (True, 6)):
+            bench(kind, same_niveau, cap, runs)
+
+    quotas, favorables, pending = synthetic("zipf", seed=1, n_filieres=2000, total=20_000, n_candidats=300_000)
+    start = time.perf_counter()
+    plan = quota_optimizer.plan_transfers(quotas, favorables, pending, same_niveau=False)
+    print(f"2000 filières / 300 000 candidats : {plan.filled} places pourvues, "
+          f"{len(plan.transfers)} étapes, {(time.perf_counter() - start) * 1e3:.1f} ms")
@@ -0,0 +1,88 @@
+"""Classeurs synthétiques et base temporaire pour les benchmarks.
+
+Lancer depuis la racine du dépôt : python bench/bench_load.py
+"""
+
+import json
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import database  # noqa: E402
+
+QUOTAS_PATH = ROOT / "quotas.json"
+NIVEAU_HEADERS = {"Licence": "LICENCE", "Master": "MASTER", "Doctorat": "DOCTORAT", "Spécialisation": "SPECIALITE"}
+NAME_WORDS = ["KOFFI", "AGOSSOU", "HOUNKPATIN", "DOSSOU", "ADJOVI", "Élodie", "Jean", "Marie",
+              "Sèna", "Paul", "ZINSOU", "AHOUANDJINOU", "Aïcha", "GBAGUIDI", "Rachidatou", "TOSSOU"]
+AVIS = ("En attente", "Favorable", "Suppléant", "Défavorable")
+
+
+def quota_keys() -> list[tuple[str, str]]:
+    quotas = json.loads(QUOTAS_PATH.read_text(encoding="utf-8"))
+    return [(niveau, filiere) for niveau, filieres in quotas.items() for filiere in filieres]
+
+
+def make_cnabau_workbook(path: Path, n: int, seed: int = 1) -> Path:
+    """Tableau au format CNaBAU (titres NIVEAU / Filière, puis une ligne par candidat)."""
+    from openpyxl import Workbook
+
+    rnd = random.Random(seed)
+    keys = quota_keys()
+    per = max(1, n // len(keys))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["TABLEAU CNaBAU BOURSE RUSSIE"])
+    numero = 1
+    current = None
+    for niveau, filiere in keys:
+        if niveau != current:
+            ws.append([f"NIVEAU : {NIVEAU_HEADERS[niveau]}"])
+            current = niveau
+        ws.append([f"Filière : {filiere}"])
+        for _ in range(per):
+            ws.append([
+                numero, rnd.choice("MF"), f"BEN-{10000 + numero}/26", " ".join(rnd.sample(NAME_WORDS, 3)),
+                f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(1995, 2005)} à Cotonou",
+                "BAC D 2019", f"{rnd.uniform(10, 18):.2f}".replace(".", ","), "", None,
+            ])
+            numero += 1
+    wb.save(path)
+    return path
+
+
+def make_flat_workbook(path: Path, n: int, seed: int = 1) -> Path:
+    """Tableau à plat : une ligne d'en-têtes (id_demande, name, …) puis les candidats."""
+    import pandas as pd
+
+    rnd = random.Random(seed)
+    keys = quota_keys()
+    rows = []
+    for i in range(n):
+        niveau, filiere = keys[i % len(keys)]
+        rows.append({
+            "id_demande": f"D{i:06d}", "name": " ".join(rnd.sample(NAME_WORDS, 3)),
+            "filiere": filiere, "niveau_etudes": niveau, "avis": rnd.choice(AVIS),
+            "moyenne": f"{rnd.uniform(10, 18):.2f}",
+        })
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return path
+
+
+@contextmanager
+def temp_database():
+    """Module database sur une base neuve, dans un répertoire temporaire."""
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_PATH
+        database.DB_PATH = str(Path(tmp) / "bench.db")
+        database.reset_db()
+        database.init_db()
+        try:
+            yield Path(tmp)
+        finally:
+            database.reset_db()
+            database.DB_PATH = previous
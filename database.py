@@ -1,19 +1,45 @@
 """Module de gestion SQLite pour les candidatures CNBAU.
 OPTIMISATIONS :
   - get_stats() → une seule requête SQL au lieu de 5
-  - get_all_candidatures(), get_quotas(), get_favorables_count(), get_stats()
-    sont désormais cachées via st.cache_data(ttl=2) — appelées depuis app.py
-    (les fonctions ici restent pures, le cache est posé dans app.py)
+  - get_stats(), get_candidatures_page(), count_candidatures() sont cachées
+    dans app.py, avec get_data_version() comme clé de cache (les fonctions
+    ici restent pures, le cache est posé dans app.py) ; quotas et avis
+    favorables sont lus dans le QuotaLedger en mémoire
+  - connexions SQLite réutilisées via un petit pool (PRAGMA posés une seule
+    fois à l'ouverture) au lieu d'un connect()/close() par appel
+  - base en mode WAL : les lectures (exports, listes) ne bloquent plus les
+    écritures d'avis ; les écritures prennent le verrou d'entrée
+    (BEGIN IMMEDIATE) et sont rejouées si la base reste occupée
 """
 
+import functools
+import gzip
 import io
 import json
+import os
+import random
 import re
+import shutil
 import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import chain, islice
 from pathlib import Path
 
 import pandas as pd
 
+import duplicates
+import filiere_resolver
+import quota_optimizer
+from prefix_index import PrefixIndex
+from quota_ledger import QuotaLedger
+from text_norm import fold, similarity, token_trigrams
+
 DB_PATH = "cnbau_session.db"
 
 NIVEAU_MAP = {
@@ -27,6 +53,28 @@ NIVEAU_MAP = {
     "SPÉCIALITÉ MÉDICALE": "Spécialisation",
 }
 
+NIVEAU_ORDER = ["Licence", "Master", "Doctorat", "Spécialisation"]
+
+# Rang SQL d'un niveau selon NIVEAU_ORDER (niveaux inconnus en dernier).
+NIVEAU_RANK_SQL = (
+    "CASE niveau_etudes "
+    + " ".join(f"WHEN '{niv}' THEN {i}" for i, niv in enumerate(NIVEAU_ORDER))
+    + " ELSE 99 END"
+)
+
+# Ordre de la liste des candidatures : niveau, filière, moyenne décroissante
+# (sans moyenne en dernier), N° (sans N° en tête), id. Les clés calculées
+# sont des colonnes générées (virtuelles), toutes non nulles et croissantes :
+# la page suivante se lit par comparaison de valeurs de ligne sur l'index
+# idx_candidatures_liste (pagination par clé).
+LIST_SORT_COLUMNS = {
+    "tri_niveau":  NIVEAU_RANK_SQL,
+    "tri_moyenne": "COALESCE(-moyenne_num, 1e308)",
+    "tri_numero":  "COALESCE(numero, -1)",
+}
+LIST_ORDER = ("tri_niveau", "filiere", "tri_moyenne", "tri_numero", "id_demande")
+LIST_ORDER_SQL = ", ".join(LIST_ORDER)
+
 DUPLICATE_POLICY = {
     "identical": "keep",
     "same_person_diff_filiere": "keep",
@@ -34,40 +82,955 @@ DUPLICATE_POLICY = {
 }
 
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : pool de connexions
+# Chaque fonction empruntait une connexion neuve (connect + close) : 5 à 10
+# ouvertures par rerun Streamlit. Les connexions sont désormais conservées dans
+# un petit pool et prêtées au thread appelant ; les appels imbriqués d'un même
+# thread réutilisent la connexion déjà prêtée.
+# ---------------------------------------------------------------------------
+
+POOL_SIZE = 4
+
+# Réglages posés à l'ouverture de chaque connexion du pool.
+# WAL : lecteurs et écrivain ne se bloquent plus mutuellement ;
+# synchronous=NORMAL est sûr en WAL (seul le dernier commit peut être perdu
+# en cas de coupure de courant) ; cache_size négatif = taille en Kio.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "temp_store": "MEMORY",
+}
+
+WRITE_RETRIES = 5
+WRITE_RETRY_DELAY = 0.05
+
+
+class _PooledConnection(sqlite3.Connection):
+    """Connexion SQLite qui mémorise le fichier et la génération du pool,
+    et l'horodatage de sa transaction d'écriture en cours (journal)."""
+
+    db_path: str = ""
+    generation: int = 0
+    lot_time: str = ""
+
+
+class _ConnectionPool:
+    def __init__(self, size: int):
+        self._size = size
+        self._idle: list[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+
+    def _open(self) -> _PooledConnection:
+        # isolation_level=None : pas de transaction implicite, les écritures
+        # passent explicitement par transaction().
+        conn = sqlite3.connect(
+            DB_PATH,
+            isolation_level=None,
+            check_same_thread=False,
+            factory=_PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        # Pliage accents/casse des noms, pour l'index de recherche
+        conn.create_function("cnbau_fold", 1, fold, deterministic=True)
+        for pragma, value in SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        conn.db_path = DB_PATH
+        conn.generation = self._generation
+        return conn
+
+    def _is_current(self, conn: _PooledConnection) -> bool:
+        return conn.db_path == DB_PATH and conn.generation == self._generation
+
+    def _acquire(self) -> _PooledConnection:
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if self._is_current(conn):
+                    return conn
+                conn.close()
+            return self._open()
+
+    def _release(self, conn: _PooledConnection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if self._is_current(conn) and len(self._idle) < self._size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def lease(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def in_transaction(self) -> bool:
+        held = getattr(self._local, "conn", None)
+        return held is not None and held.in_transaction
+
+    def close_all(self):
+        """Ferme les connexions inactives ; celles en prêt seront fermées à leur retour."""
+        with self._lock:
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_pool = _ConnectionPool(POOL_SIZE)
+
+
+@contextmanager
+def connection():
+    """Prête une connexion du pool au thread courant (lecture)."""
+    with _pool.lease() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction():
+    """Connexion du pool dans une transaction d'écriture : COMMIT en sortie,
+    ROLLBACK sur exception.
+
+    BEGIN IMMEDIATE prend le verrou d'écriture dès l'entrée : deux écrivains
+    ne peuvent plus s'interbloquer en promouvant une lecture en écriture.
+    Un appel imbriqué rejoint la transaction déjà ouverte par le thread.
+    """
+    with _pool.lease() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        conn.lot_time = _journal_time(datetime.now(timezone.utc))
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+@contextmanager
+def read_snapshot():
+    """Connexion du pool dans une transaction de lecture : toutes les requêtes
+    du bloc voient le même état de la base."""
+    with _pool.lease() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+
+def _is_busy_error(exc: sqlite3.OperationalError) -> bool:
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+def _retry_on_busy(func):
+    """Rejoue une écriture si la base reste verrouillée au-delà de busy_timeout.
+
+    Attente exponentielle avec gigue ; pas de rejeu à l'intérieur d'une
+    transaction englobante (c'est elle qui sera rejouée).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = WRITE_RETRY_DELAY
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                last_attempt = attempt == WRITE_RETRIES - 1
+                if last_attempt or not _is_busy_error(e) or _pool.in_transaction():
+                    raise
+                time.sleep(delay * (1 + random.random()))
+                delay *= 2
+    return wrapper
+
+
+def _schema_ready(conn: sqlite3.Connection) -> bool:
+    if conn.execute("PRAGMA user_version").fetchone()[0] < len(SCHEMA_MIGRATIONS):
+        return False
+    tables = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ('candidatures', 'quotas')"
+    ).fetchone()[0]
+    return tables == 2
 
 
+@_retry_on_busy
 def init_db():
-    conn = get_connection()
+    """Crée les tables et applique les migrations en attente.
+
+    Appelée à chaque rerun de app.py : une base déjà à jour n'est que lue,
+    sans transaction d'écriture — un chargement ou un transfert en cours
+    ne bloque donc pas l'affichage.
+    """
+    with connection() as conn:
+        if _schema_ready(conn):
+            return
+    with transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS candidatures (
+                id_demande TEXT PRIMARY KEY,
+                id_russe TEXT,
+                numero INTEGER,
+                sexe TEXT,
+                name TEXT NOT NULL,
+                date_lieu_naissance TEXT,
+                diplome_filiere_annee TEXT,
+                moyenne TEXT,
+                moyenne_num REAL,
+                observation TEXT,
+                filiere TEXT NOT NULL,
+                niveau_etudes TEXT NOT NULL,
+                avis TEXT DEFAULT 'En attente'
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS quotas (
+                niveau_etudes TEXT NOT NULL,
+                filiere TEXT NOT NULL,
+                nb_places INTEGER NOT NULL,
+                PRIMARY KEY (niveau_etudes, filiere)
+            )
+        """)
+        _migrate_schema(conn)
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : index secondaires
+# Sans eux, search_by_field() (numero, id_russe, nom) et les comptages de
+# favorables par (niveau, filière) parcouraient toute la table. L'index sur
+# (avis, niveau_etudes, filiere) est couvrant pour ces comptages.
+# ---------------------------------------------------------------------------
+
+CANDIDATURE_INDEXES = {
+    "idx_candidatures_numero":   "candidatures (numero)",
+    "idx_candidatures_id_russe": "candidatures (id_russe)",
+    "idx_candidatures_name":     "candidatures (name COLLATE NOCASE)",
+    "idx_candidatures_avis":     "candidatures (avis, niveau_etudes, filiere)",
+    "idx_candidatures_filiere":  "candidatures (niveau_etudes, filiere)",
+    "idx_candidatures_rang":     "candidatures (niveau_etudes, filiere, moyenne_num DESC)",
+    "idx_candidatures_liste":    f"candidatures ({LIST_ORDER_SQL})",
+    "idx_candidatures_liste_avis": f"candidatures (avis, {LIST_ORDER_SQL})",
+}
+
+
+def _create_indexes(conn: sqlite3.Connection, names=None):
+    for name in names or CANDIDATURE_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {CANDIDATURE_INDEXES[name]}")
+
+
+def _create_meta_table(conn: sqlite3.Connection):
     conn.execute("""
-        CREATE TABLE IF NOT EXISTS candidatures (
-            id_demande TEXT PRIMARY KEY,
-            id_russe TEXT,
-            numero INTEGER,
-            sexe TEXT,
-            name TEXT NOT NULL,
-            date_lieu_naissance TEXT,
-            diplome_filiere_annee TEXT,
-            moyenne TEXT,
-            observation TEXT,
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    # Départ horodaté (ms) : une base recréée après reset_db() ne réutilise
+    # jamais une version déjà présente dans le cache de app.py.
+    _seed_meta_counter(conn, "data_version")
+
+
+def _seed_meta_counter(conn: sqlite3.Connection, key: str):
+    conn.execute(
+        """INSERT OR IGNORE INTO app_meta (key, value)
+           VALUES (?, CAST(strftime('%s', 'now') AS INTEGER) * 1000)""",
+        (key,),
+    )
+
+
+def _parse_moyenne(raw) -> float | None:
+    try:
+        return float(str(raw).replace(",", "."))
+    except (ValueError, TypeError):
+        return None
+
+
+def _add_moyenne_num(conn: sqlite3.Connection):
+    """Colonne numérique de la moyenne (tri et classement), remplie depuis le texte."""
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(candidatures)")}
+    if "moyenne_num" not in columns:
+        conn.execute("ALTER TABLE candidatures ADD COLUMN moyenne_num REAL")
+    rows = conn.execute("SELECT id_demande, moyenne FROM candidatures WHERE moyenne IS NOT NULL").fetchall()
+    conn.executemany(
+        "UPDATE candidatures SET moyenne_num = ? WHERE id_demande = ?",
+        [(_parse_moyenne(r["moyenne"]), r["id_demande"]) for r in rows],
+    )
+    _create_indexes(conn, ["idx_candidatures_rang"])
+
+
+def _add_list_sort_columns(conn: sqlite3.Connection):
+    columns = {r["name"] for r in conn.execute("PRAGMA table_xinfo(candidatures)")}
+    for name, expr in LIST_SORT_COLUMNS.items():
+        if name not in columns:
+            conn.execute(f"ALTER TABLE candidatures ADD COLUMN {name} GENERATED ALWAYS AS ({expr}) VIRTUAL")
+    _create_indexes(conn, ["idx_candidatures_liste", "idx_candidatures_liste_avis"])
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : index plein texte des noms (FTS5 trigrammes)
+# `name LIKE '%…%'` ne peut utiliser aucun index et ignorait accents et ordre
+# des mots. candidatures_fts indexe en trigrammes le nom plié (minuscules,
+# sans accents) ; rowid = rowid de la candidature. Reconstruit par les
+# chargements (seuls à modifier les noms). Sans FTS5, repli sur un parcours.
+# ---------------------------------------------------------------------------
+
+NAME_INDEX = "candidatures_fts"
+NAME_VOCAB = "candidatures_fts_vocab"  # nombre de noms par trigramme
+
+
+def _create_name_index(conn: sqlite3.Connection):
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {NAME_INDEX} USING fts5(nom, tokenize='trigram')")
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {NAME_VOCAB} USING fts5vocab({NAME_INDEX}, 'row')")
+    except sqlite3.OperationalError:
+        return  # SQLite sans FTS5 / trigram : search_names parcourt la table
+    _rebuild_name_index(conn)
+
+
+def _has_name_index(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (NAME_INDEX,)
+    ).fetchone() is not None
+
+
+def _rebuild_name_index(conn: sqlite3.Connection):
+    if not _has_name_index(conn):
+        return
+    conn.execute(f"DELETE FROM {NAME_INDEX}")
+    conn.execute(f"INSERT INTO {NAME_INDEX} (rowid, nom) SELECT rowid, cnbau_fold(name) FROM candidatures")
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : détection des doublons
+# L'ancienne politique ne regardait que les ID russes identiques, et seulement
+# les deux premiers candidats de chaque ID. duplicates.py compare par blocs
+# (mots du nom, date de naissance, ID) toutes les paires plausibles ; les
+# groupes trouvés sont rangés dans la table doublons, recalculée à chaque
+# chargement dans la même transaction, et consultables depuis l'onglet Liste.
+# ---------------------------------------------------------------------------
+
+def _create_duplicates_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS doublons (
+            cluster INTEGER NOT NULL,
+            id_demande TEXT NOT NULL,
+            categorie TEXT NOT NULL,
+            score REAL NOT NULL,
+            garde INTEGER NOT NULL,
+            PRIMARY KEY (cluster, id_demande)
+        )
+    """)
+    _refresh_duplicates(conn)
+
+
+def _detect_duplicates(conn: sqlite3.Connection) -> list[duplicates.Member]:
+    rows = conn.execute(
+        """SELECT id_demande, id_russe, name, date_lieu_naissance, filiere, niveau_etudes
+           FROM candidatures ORDER BY COALESCE(numero, 0), id_demande"""
+    ).fetchall()
+    return duplicates.find_duplicates(rows)
+
+
+def _refresh_duplicates(conn: sqlite3.Connection) -> int:
+    """Recalcule la table doublons et applique DUPLICATE_POLICY ;
+    retourne le nombre de candidatures retirées."""
+    dropped = 0
+    while True:
+        # Un retrait peut faire d'un autre membre le premier de son groupe :
+        # on recalcule jusqu'à ce que la politique ne retire plus rien.
+        members = _detect_duplicates(conn)
+        drop = [(m.id_demande,) for m in members
+                if not m.garde and DUPLICATE_POLICY.get(m.categorie) == "drop"]
+        if not drop:
+            break
+        conn.executemany("DELETE FROM candidatures WHERE id_demande = ?", drop)
+        dropped += len(drop)
+    conn.execute("DELETE FROM doublons")
+    conn.executemany("INSERT INTO doublons VALUES (?, ?, ?, ?, ?)", members)
+    return dropped
+
+
+def get_duplicates() -> pd.DataFrame:
+    """Groupes de doublons détectés, avec l'identité de chaque candidature."""
+    with read_snapshot() as conn:
+        return pd.read_sql_query(
+            """SELECT d.cluster, d.categorie, d.score, d.garde, c.id_demande, c.numero,
+                      c.id_russe, c.name, c.date_lieu_naissance, c.niveau_etudes, c.filiere, c.avis
+               FROM doublons d JOIN candidatures c ON c.id_demande = d.id_demande
+               ORDER BY d.cluster, d.garde DESC, c.numero""",
+            conn,
+        )
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : rapprochement des noms de filières
+# _build_filiere_lookup relisait quotas.json à chaque import et ne
+# reconnaissait que les noms identiques en minuscules : accents, pluriels et
+# fautes de frappe privaient des filières de leur quota. filiere_resolver.py
+# rapproche les noms (clé normalisée, puis distance d'édition) ; le résolveur
+# est construit une fois par jeu de références, et chaque correspondance non
+# exacte est conservée dans la table filiere_aliases, corrigeable à la main.
+# ---------------------------------------------------------------------------
+
+QUOTAS_PATH = Path(__file__).resolve().parent / "quotas.json"
+
+
+@functools.lru_cache(maxsize=4)
+def _quota_file_filieres(path: str, mtime_ns: int) -> tuple[tuple[str, str], ...]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return tuple((niveau, fil) for niveau, filieres in data.items() for fil in filieres)
+
+
+@functools.lru_cache(maxsize=4)
+def _filiere_resolver(references: tuple, aliases: tuple,
+                      across_niveaux: bool = True) -> filiere_resolver.FiliereResolver:
+    return filiere_resolver.FiliereResolver(references, aliases, across_niveaux)
+
+
+def _create_filiere_aliases_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS filiere_aliases (
+            alias TEXT PRIMARY KEY,
             filiere TEXT NOT NULL,
-            niveau_etudes TEXT NOT NULL,
-            avis TEXT DEFAULT 'En attente'
+            methode TEXT NOT NULL,
+            distance INTEGER NOT NULL DEFAULT 0
         )
     """)
+
+
+def _key_filiere_aliases_by_niveau(conn: sqlite3.Connection):
+    """Correspondances propres à un niveau : un même nom peut désigner deux
+    filières différentes selon le niveau. Les corrections manuelles
+    existantes valent pour chaque niveau ; les autres, pour les niveaux où
+    leur filière existe (elles sont de toute façon recalculées au chargement)."""
+    conn.execute("ALTER TABLE filiere_aliases RENAME TO filiere_aliases_v1")
     conn.execute("""
-        CREATE TABLE IF NOT EXISTS quotas (
+        CREATE TABLE filiere_aliases (
             niveau_etudes TEXT NOT NULL,
+            alias TEXT NOT NULL,
             filiere TEXT NOT NULL,
-            nb_places INTEGER NOT NULL,
-            PRIMARY KEY (niveau_etudes, filiere)
+            methode TEXT NOT NULL,
+            distance INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (niveau_etudes, alias)
         )
     """)
-    conn.commit()
-    conn.close()
+    known = ", ".join(["(?)"] * len(NIVEAU_ORDER))
+    conn.execute(
+        f"""WITH places AS (SELECT niveau_etudes, filiere FROM candidatures
+                            UNION SELECT niveau_etudes, filiere FROM quotas),
+                 niveaux AS (SELECT column1 AS niveau_etudes FROM (VALUES {known})
+                             UNION SELECT niveau_etudes FROM places)
+            INSERT OR IGNORE INTO filiere_aliases
+            SELECT n.niveau_etudes, a.alias, a.filiere, a.methode, a.distance
+            FROM filiere_aliases_v1 a, niveaux n
+            WHERE a.methode = ? OR (n.niveau_etudes, a.filiere) IN (SELECT * FROM places)""",
+        (*NIVEAU_ORDER, filiere_resolver.MANUAL),
+    )
+    conn.execute("DROP TABLE filiere_aliases_v1")
+
+
+def _manual_aliases(conn: sqlite3.Connection) -> tuple[tuple[str, str, str], ...]:
+    rows = conn.execute(
+        """SELECT niveau_etudes, alias, filiere FROM filiere_aliases
+           WHERE methode = ? ORDER BY niveau_etudes, alias""",
+        (filiere_resolver.MANUAL,),
+    ).fetchall()
+    return tuple((r["niveau_etudes"], r["alias"], r["filiere"]) for r in rows)
+
+
+def _candidature_filiere_resolver(conn: sqlite3.Connection) -> filiere_resolver.FiliereResolver:
+    """Noms des tableaux de candidatures → noms de quotas.json."""
+    references = ()
+    if QUOTAS_PATH.exists():
+        references = _quota_file_filieres(str(QUOTAS_PATH), QUOTAS_PATH.stat().st_mtime_ns)
+    return _filiere_resolver(references, _manual_aliases(conn))
+
+
+def _quota_filiere_resolver(conn: sqlite3.Connection) -> filiere_resolver.FiliereResolver:
+    """Noms d'un fichier de quotas → filières des candidatures chargées du
+    même niveau. Jamais vers l'orthographe d'un autre niveau : le quota
+    serait renommé à chaque rechargement selon les candidatures présentes."""
+    references = tuple(
+        (r["niveau_etudes"], r["filiere"])
+        for r in conn.execute("SELECT DISTINCT niveau_etudes, filiere FROM candidatures ORDER BY 1, 2")
+    )
+    return _filiere_resolver(references, _manual_aliases(conn), across_niveaux=False)
+
+
+class _AliasRecorder:
+    """Résout les noms via `resolver` en retenant les correspondances non exactes."""
+
+    def __init__(self, resolver: filiere_resolver.FiliereResolver):
+        self._resolver = resolver
+        self.seen = {}
+        self.exact = set()
+
+    def __call__(self, raw, niveau: str) -> str:
+        found = self._resolver.resolve(raw, niveau)
+        key = (niveau, filiere_resolver.clean_name(raw))
+        if found.methode == filiere_resolver.EXACT:
+            self.exact.add(key)
+        else:
+            self.seen[key] = found
+        return found.filiere
+
+    def save(self, conn: sqlite3.Connection):
+        # Un nom désormais reconnu tel quel n'a plus de correspondance à revoir.
+        conn.executemany(
+            "DELETE FROM filiere_aliases WHERE niveau_etudes = ? AND alias = ? AND methode != ?",
+            [(*key, filiere_resolver.MANUAL) for key in self.exact - self.seen.keys()],
+        )
+        conn.executemany(
+            """INSERT INTO filiere_aliases (niveau_etudes, alias, filiere, methode, distance)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (niveau_etudes, alias) DO UPDATE SET
+                   filiere = excluded.filiere, methode = excluded.methode, distance = excluded.distance
+               WHERE filiere_aliases.methode != ?""",
+            [(*key, *found, filiere_resolver.MANUAL) for key, found in self.seen.items()],
+        )
+
+
+def get_filiere_aliases() -> pd.DataFrame:
+    """Correspondances de noms de filières rencontrées, les plus douteuses d'abord."""
+    with connection() as conn:
+        return pd.read_sql_query(
+            f"""SELECT niveau_etudes, alias, filiere, methode, distance FROM filiere_aliases
+                ORDER BY CASE methode WHEN 'inconnu' THEN 0 WHEN 'approx' THEN 1
+                                      WHEN 'manuel' THEN 2 ELSE 3 END, {NIVEAU_RANK_SQL}, alias""",
+            conn,
+        )
+
+
+@_retry_on_busy
+def set_filiere_alias(niveau: str, alias: str, filiere: str):
+    """Correspondance saisie à la main pour le niveau `niveau` ; appliquée
+    aux prochains chargements."""
+    with transaction() as conn:
+        conn.execute(
+            """INSERT INTO filiere_aliases (niveau_etudes, alias, filiere, methode, distance)
+               VALUES (?, ?, ?, ?, 0)
+               ON CONFLICT (niveau_etudes, alias) DO UPDATE SET filiere = excluded.filiere,
+                   methode = excluded.methode, distance = 0""",
+            (niveau, filiere_resolver.clean_name(alias), filiere, filiere_resolver.MANUAL),
+        )
+        _bump_data_version(conn)
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : journal des décisions
+# update_avis écrasait l'avis précédent et l'historique des transferts ne
+# vivait que dans la session Streamlit. Chaque changement d'avis et chaque
+# étape de transfert ajoute une ligne à la table journal, dans la
+# transaction même de l'écriture (une insertion, sans relecture). Les
+# lignes ne sont jamais modifiées (triggers) ; l'index par type et par
+# candidat sert les « N derniers événements » sans parcours de table.
+# ---------------------------------------------------------------------------
+
+JOURNAL_AVIS = "avis"
+JOURNAL_TRANSFERT = "transfert"
+JOURNAL_CHARGEMENT = "chargement"  # candidatures rechargées : avis remis à ceux du fichier
+JOURNAL_QUOTAS = "quotas"          # quotas rechargés depuis le fichier
+JOURNAL_RESTAURATION = "restauration"  # instantané restauré (avant : sa date, apres : son nom,
+                                       # nb_places : id de son dernier événement)
+JOURNAL_PAGE_SIZE = 50
+
+# Horodatage UTC à la milliseconde, pris une fois par transaction (à son
+# BEGIN IMMEDIATE, cf. transaction()) et posé sur toutes les lignes du lot :
+# state_at inclut ou exclut toujours un lot entier.
+JOURNAL_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+_JOURNAL_SQL = """
+    INSERT INTO journal (horodatage, lot, type, id_demande, niveau_etudes, filiere, avant, apres,
+                         dest_niveau, dest_filiere, nb_places)
+    VALUES (?, (SELECT value FROM app_meta WHERE key = 'data_version'), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _create_journal_table(conn: sqlite3.Connection):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            horodatage TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+            lot INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            id_demande TEXT,
+            niveau_etudes TEXT,
+            filiere TEXT,
+            avant TEXT,
+            apres TEXT,
+            dest_niveau TEXT,
+            dest_filiere TEXT,
+            nb_places INTEGER
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_type ON journal (type, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_candidat ON journal (id_demande, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_horodatage ON journal (horodatage)")
+    for action in ("UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS journal_no_{action.lower()} BEFORE {action} ON journal
+            BEGIN SELECT RAISE(ABORT, 'journal en ajout seul'); END
+        """)
+
+
+# Événements encore valides : hors de la période qu'une restauration a
+# annulée (après le dernier événement de l'instantané, avant la restauration).
+_JOURNAL_KEPT_SQL = f"""NOT EXISTS (
+    SELECT 1 FROM journal r WHERE r.type = '{JOURNAL_RESTAURATION}'
+      AND journal.id > r.nb_places AND journal.id < r.id
+)"""
+
+
+def _journal_avis(conn: sqlite3.Connection, changes):
+    """`changes` : (id_demande, niveau, filière, ancien avis, nouvel avis).
+    À appeler après _bump_data_version : le lot est la version de l'écriture."""
+    conn.executemany(
+        _JOURNAL_SQL,
+        ((conn.lot_time, JOURNAL_AVIS, id_demande, niveau, filiere, avant, apres, None, None, None)
+         for id_demande, niveau, filiere, avant, apres in changes),
+    )
+
+
+def _journal_transfers(conn: sqlite3.Connection, legs):
+    conn.executemany(
+        _JOURNAL_SQL,
+        ((conn.lot_time, JOURNAL_TRANSFERT, None, *source, None, None, *dest, nb_places)
+         for source, dest, nb_places in legs),
+    )
+
+
+def _journal_load(conn: sqlite3.Connection, kind: str, count: int):
+    conn.execute(_JOURNAL_SQL, (conn.lot_time, kind, None, None, None, None, None, None, None, count))
+
+
+def get_journal(limit: int = JOURNAL_PAGE_SIZE, types=(), id_demande: str | None = None) -> pd.DataFrame:
+    """Derniers événements du journal, du plus récent au plus ancien ;
+    `heure` : horodatage en heure locale."""
+    clauses, params = [], []
+    if types:
+        clauses.append(f"type IN ({', '.join('?' * len(types))})")
+        params.extend(types)
+    if id_demande is not None:
+        clauses.append("id_demande = ?")
+        params.append(id_demande)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with connection() as conn:
+        return pd.read_sql_query(
+            f"""SELECT *, strftime('%d/%m/%Y %H:%M:%S', horodatage, 'localtime') AS heure
+                FROM journal {where} ORDER BY id DESC LIMIT ?""",
+            conn,
+            params=[*params, limit],
+        )
+
+
+def _journal_time(moment) -> str:
+    """Instant (datetime, naïf = heure locale, ou chaîne au format du journal)."""
+    if isinstance(moment, str):
+        return moment
+    return moment.astimezone(timezone.utc).strftime(JOURNAL_TIME_FORMAT)[:-4] + "Z"
+
+
+def state_at(moment) -> dict:
+    """Avis et quotas tels qu'ils étaient à `moment` : l'état actuel, dont on
+    défait les événements postérieurs, du plus récent au plus ancien.
+
+    Retourne {"avis": {id_demande: avis}, "quotas": {clé: places}} ; lève
+    ValueError si un chargement a eu lieu depuis (état antérieur perdu).
+    """
+    ts = _journal_time(moment)
+    with read_snapshot() as conn:
+        reload = conn.execute(
+            f"SELECT 1 FROM journal WHERE horodatage > ? AND type IN (?, ?) AND {_JOURNAL_KEPT_SQL} LIMIT 1",
+            (ts, JOURNAL_CHARGEMENT, JOURNAL_QUOTAS),
+        ).fetchone()
+        if reload:
+            raise ValueError("Un chargement a eu lieu depuis cet instant : état non reconstituable.")
+        # Entre un instantané et sa restauration : état annulé, non reconstituable.
+        discarded = conn.execute(
+            "SELECT 1 FROM journal WHERE horodatage > ? AND type = ? AND avant < ? LIMIT 1",
+            (ts, JOURNAL_RESTAURATION, ts),
+        ).fetchone()
+        if discarded:
+            raise ValueError("Cet instant appartient à une période annulée par une restauration.")
+        events = conn.execute(
+            f"""SELECT type, id_demande, niveau_etudes, filiere, avant, dest_niveau, dest_filiere, nb_places
+                FROM journal WHERE horodatage > ? AND {_JOURNAL_KEPT_SQL}
+                ORDER BY horodatage DESC, id DESC""",
+            (ts,),
+        ).fetchall()
+        avis = dict(conn.execute("SELECT id_demande, avis FROM candidatures").fetchall())
+        quotas, _ = _read_quota_counts(conn)
+    for e in events:
+        if e["type"] == JOURNAL_AVIS:
+            avis[e["id_demande"]] = e["avant"]
+        elif e["type"] == JOURNAL_TRANSFERT:
+            quotas[(e["niveau_etudes"], e["filiere"])] += e["nb_places"]
+            quotas[(e["dest_niveau"], e["dest_filiere"])] -= e["nb_places"]
+    return {"avis": avis, "quotas": quotas}
+
+
+def read_journal(db_path, until=None) -> list[dict]:
+    """Événements d'une autre base (ouverte en lecture seule) à rejouer :
+    avis depuis son dernier chargement des candidatures, transferts depuis
+    son dernier chargement des quotas, jusqu'à `until` inclus."""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        last = dict(conn.execute(
+            f"SELECT type, MAX(id) FROM journal WHERE type IN (?, ?) AND {_JOURNAL_KEPT_SQL} GROUP BY type",
+            (JOURNAL_CHARGEMENT, JOURNAL_QUOTAS),
+        ).fetchall())
+        rows = conn.execute(
+            f"""SELECT * FROM journal
+                WHERE ((type = :avis AND id > :chargement) OR (type = :transfert AND id > :quotas))
+                  AND (:until IS NULL OR horodatage <= :until) AND {_JOURNAL_KEPT_SQL}
+                ORDER BY id""",
+            {"avis": JOURNAL_AVIS, "transfert": JOURNAL_TRANSFERT,
+             "chargement": last.get(JOURNAL_CHARGEMENT, 0), "quotas": last.get(JOURNAL_QUOTAS, 0),
+             "until": None if until is None else _journal_time(until)},
+        ).fetchall()
+    finally:
+        conn.close()
+    return [dict(r) for r in rows]
+
+
+def replay_journal(events) -> dict:
+    """Rejoue des événements (read_journal) sur cette base, chargée avec les
+    mêmes fichiers : avis reposés et transferts refaits tels quels, dans
+    l'ordre, en une transaction, et inscrits à son propre journal.
+
+    Retourne {"success": True, "avis": n, "transferts": n, "ignores": n}
+    (ignorés : candidature ou quota absent) ou {"success": False, "error": message}.
+    """
+    try:
+        return _replay_events(list(events))
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@_retry_on_busy
+def _replay_events(events: list[dict]) -> dict:
+    counts = {JOURNAL_AVIS: 0, JOURNAL_TRANSFERT: 0, "ignores": 0}
+    with transaction() as conn:
+        _bump_data_version(conn)
+        for e in events:
+            if e["type"] == JOURNAL_AVIS:
+                row = conn.execute(
+                    "SELECT avis, niveau_etudes, filiere FROM candidatures WHERE id_demande = ?",
+                    (e["id_demande"],),
+                ).fetchone()
+                if row is None:
+                    counts["ignores"] += 1
+                    continue
+                conn.execute(
+                    "UPDATE candidatures SET avis = ? WHERE id_demande = ?", (e["apres"], e["id_demande"])
+                )
+                key = (row["niveau_etudes"], row["filiere"])
+                _journal_avis(conn, [(e["id_demande"], *key, row["avis"], e["apres"])])
+            elif e["type"] == JOURNAL_TRANSFERT:
+                leg = ((e["niveau_etudes"], e["filiere"]), (e["dest_niveau"], e["dest_filiere"]), e["nb_places"])
+                found = [
+                    conn.execute(
+                        "SELECT 1 FROM quotas WHERE niveau_etudes = ? AND filiere = ?", key
+                    ).fetchone()
+                    for key in leg[:2]
+                ]
+                if not all(found):
+                    counts["ignores"] += 1
+                    continue
+                for (niveau, filiere), delta in ((leg[0], -leg[2]), (leg[1], leg[2])):
+                    conn.execute(
+                        "UPDATE quotas SET nb_places = nb_places + ? WHERE niveau_etudes = ? AND filiere = ?",
+                        (delta, niveau, filiere),
+                    )
+                _journal_transfers(conn, [leg])
+            else:
+                continue
+            counts[e["type"]] += 1
+    # Pas de _sync_ledger : la version a changé, le registre sera rechargé.
+    return {"success": True, "avis": counts[JOURNAL_AVIS], "transferts": counts[JOURNAL_TRANSFERT],
+            "ignores": counts["ignores"]}
+
+
+# Étapes de migration, appliquées dans l'ordre ; PRAGMA user_version retient
+# la dernière étape appliquée sur la base.
+SCHEMA_MIGRATIONS = [
+    functools.partial(_create_indexes, names=[
+        "idx_candidatures_numero", "idx_candidatures_id_russe",
+        "idx_candidatures_name", "idx_candidatures_avis",
+    ]),
+    _create_meta_table,
+    functools.partial(_create_indexes, names=["idx_candidatures_filiere"]),
+    _add_moyenne_num,
+    _create_name_index,
+    functools.partial(_seed_meta_counter, key="roster_version"),
+    _create_duplicates_table,
+    _create_filiere_aliases_table,
+    _create_journal_table,
+    _add_list_sort_columns,
+    _key_filiere_aliases_by_niveau,
+]
+
+
+def _migrate_schema(conn: sqlite3.Connection):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        step(conn)
+        conn.execute(f"PRAGMA user_version = {target}")
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : version des données
+# Compteur incrémenté par chaque écriture, dans la même transaction. app.py
+# l'utilise comme clé de cache : les lectures restent en cache tant qu'aucune
+# session n'a modifié la base.
+# ---------------------------------------------------------------------------
+
+def _read_data_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM app_meta WHERE key = 'data_version'").fetchone()
+    return row["value"] if row else 0
+
+
+def _bump_data_version(conn: sqlite3.Connection) -> int:
+    """Incrémente la version (dans la transaction de conn) et retourne la nouvelle valeur."""
+    conn.execute("UPDATE app_meta SET value = value + 1 WHERE key = 'data_version'")
+    return _read_data_version(conn)
+
+
+def get_data_version() -> int:
+    with connection() as conn:
+        return _read_data_version(conn)
+
+
+# Version de la liste des candidats (identités : N°, ID russe, nom…),
+# incrémentée par les seuls chargements — un changement d'avis ne la touche pas.
+
+def _read_roster_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM app_meta WHERE key = 'roster_version'").fetchone()
+    return row["value"] if row else 0
+
+
+def _bump_roster_version(conn: sqlite3.Connection):
+    conn.execute("UPDATE app_meta SET value = value + 1 WHERE key = 'roster_version'")
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : recherche à la frappe en mémoire
+# Chaque frappe dans l'onglet Examen individuel relançait deux requêtes. Le
+# PrefixIndex (prefix_index.py) est construit une fois par version de la
+# liste des candidats ; tant que la version des données transmise par
+# l'appelant est celle déjà validée, il est servi sans aucune requête.
+# ---------------------------------------------------------------------------
+
+_prefix_index: PrefixIndex | None = None
+_prefix_lock = threading.Lock()
+
+
+def get_prefix_index(data_version: int | None = None) -> PrefixIndex:
+    global _prefix_index
+    index = _prefix_index
+    if index is not None and data_version is not None and index.data_version == data_version:
+        return index
+    with _prefix_lock, read_snapshot() as conn:
+        version = _read_data_version(conn)
+        roster  = _read_roster_version(conn)
+        index = _prefix_index
+        if index is None or index.roster_version != roster:
+            index = PrefixIndex(
+                conn.execute(
+                    "SELECT id_demande, numero, id_russe, name, filiere, niveau_etudes FROM candidatures"
+                ),
+                roster,
+            )
+        index.data_version = version
+        _prefix_index = index
+    return index
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : registre des quotas en mémoire
+# Les places restantes étaient recalculées par un GROUP BY dans chaque onglet
+# et par un COUNT(*) dans transfer_quota(). Le registre est chargé une fois
+# pour une version des données, puis mis à jour incrémentalement par
+# update_avis() et transfer_quota() ; toute autre écriture (ou une écriture
+# d'un autre processus) provoque un rechargement au prochain accès.
+# ---------------------------------------------------------------------------
+
+_ledger: QuotaLedger | None = None
+_ledger_lock = threading.Lock()
+
+
+def _read_quota_counts(conn: sqlite3.Connection) -> tuple[dict, dict]:
+    quotas = {
+        (r["niveau_etudes"], r["filiere"]): r["nb_places"]
+        for r in conn.execute("SELECT niveau_etudes, filiere, nb_places FROM quotas")
+    }
+    favorables = {
+        (r["niveau_etudes"], r["filiere"]): r["n"]
+        for r in conn.execute(
+            """SELECT niveau_etudes, filiere, COUNT(*) as n
+               FROM candidatures WHERE avis = 'Favorable'
+               GROUP BY niveau_etudes, filiere"""
+        )
+    }
+    return quotas, favorables
+
+
+def _ledger_for(conn: sqlite3.Connection) -> QuotaLedger:
+    """Registre synchronisé sur l'état vu par conn (rechargé si la version a changé)."""
+    global _ledger
+    version = _read_data_version(conn)
+    with _ledger_lock:
+        if _ledger is None or _ledger.version != version:
+            quotas, favorables = _read_quota_counts(conn)
+            _ledger = QuotaLedger(quotas, favorables, version)
+        return _ledger
+
+
+def _sync_ledger(new_version: int, apply):
+    """Applique une écriture validée au registre s'il était à jour juste avant elle."""
+    if _pool.in_transaction():
+        # Écriture imbriquée : la transaction englobante peut encore échouer.
+        return
+    with _ledger_lock:
+        if _ledger is not None and _ledger.version == new_version - 1:
+            with _ledger.lock:
+                apply(_ledger)
+                _ledger.version = new_version
+
+
+def get_quota_ledger() -> QuotaLedger:
+    with read_snapshot() as conn:
+        return _ledger_for(conn)
+
+
+def check_quota_ledger() -> dict:
+    """Compare le registre à un recomptage SQL ; retourne les écarts (vide si cohérent)."""
+    with read_snapshot() as conn:
+        ledger = _ledger_for(conn)
+        quotas, favorables = _read_quota_counts(conn)
+        return ledger.diff(quotas, favorables)
 
 
 def _normalize_niveau(raw: str) -> str:
@@ -75,37 +1038,52 @@ def _normalize_niveau(raw: str) -> str:
     return NIVEAU_MAP.get(key, raw.strip().title())
 
 
-def _normalize_filiere(name: str) -> str:
-    return re.sub(r'\s+', ' ', name).strip()
-
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : lecture en flux du classeur
+# Le classeur est ouvert une seule fois en mode read_only (pas d'objets cellule
+# en mémoire) ; le format est détecté sur les premières lignes puis les
+# candidats sont produits un par un par un générateur.
+# ---------------------------------------------------------------------------
 
-def _build_filiere_lookup() -> dict:
-    quotas_path = Path(__file__).resolve().parent / "quotas.json"
-    if not quotas_path.exists():
-        return {}
-    with open(quotas_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    lookup = {}
-    for filieres in data.values():
-        for fil in filieres:
-            key = _normalize_filiere(fil).lower()
-            lookup[key] = fil
-    return lookup
+FORMAT_PROBE_ROWS = 10
 
 
-def _parse_real_excel(excel_path: str) -> list[dict]:
+@contextmanager
+def _workbook_rows(excel_path: str):
+    """Itérateur sur les lignes (tuples de valeurs) de la feuille active."""
     from openpyxl import load_workbook
 
-    wb = load_workbook(excel_path, data_only=True)
-    ws = wb.active
+    wb = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        yield wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
 
-    filiere_lookup = _build_filiere_lookup()
+def _looks_like_cnabau(head_rows) -> bool:
+    for row in head_rows:
+        val = str((row[0] if row else None) or "")
+        if "NIVEAU" in val.upper() or "CNaBAU" in val or "BOURSE" in val.upper():
+            return True
+    return False
+
+
+def _cell_str(row: tuple, idx: int) -> str:
+    v = row[idx] if idx < len(row) else None
+    return str(v).strip() if v is not None else ""
+
+
+def _iter_real_excel(rows, resolve_filiere) -> Iterator[dict]:
+    """Génère les candidats d'un tableau CNaBAU à partir de ses lignes (titre inclus).
+    `resolve_filiere(nom, niveau)` donne le nom de référence d'une filière."""
     current_niveau = ""
     current_filiere = ""
-    candidates = []
 
-    for row in ws.iter_rows(min_row=2, values_only=False):
-        cell_a = row[0].value
+    rows = iter(rows)
+    next(rows, None)  # ligne de titre
+
+    for row in rows:
+        cell_a = row[0] if row else None
         if cell_a is None:
             continue
 
@@ -124,116 +1102,82 @@ def _parse_real_excel(excel_path: str) -> list[dict]:
                 raw_fil = val_a
             raw_fil = re.sub(r'\(\s*\d+\s*bourses?\)', '', raw_fil).strip()
             raw_fil = re.sub(r'\s*-\s*[\d.]+\s*$', '', raw_fil).strip()
-            raw_fil = _normalize_filiere(raw_fil)
-            current_filiere = filiere_lookup.get(raw_fil.lower(), raw_fil)
+            current_filiere = resolve_filiere(raw_fil, current_niveau)
             continue
 
         try:
             num = int(cell_a)
         except (ValueError, TypeError):
-            rest_empty = all(c.value is None for c in row[1:9])
+            rest_empty = all(v is None for v in row[1:9])
             if rest_empty and len(val_a) > 3:
-                current_filiere = val_a.strip()
+                current_filiere = resolve_filiere(val_a, current_niveau)
             continue
 
-        def cell_str(idx):
-            v = row[idx].value if idx < len(row) else None
-            return str(v).strip() if v is not None else ""
-
-        id_russe = cell_str(2)
-        candidates.append({
+        yield {
             "id_demande": f"{num:04d}",
-            "id_russe": id_russe,
+            "id_russe": _cell_str(row, 2),
             "numero": num,
-            "sexe": cell_str(1),
-            "name": cell_str(3),
-            "date_lieu_naissance": cell_str(4),
-            "diplome_filiere_annee": cell_str(5),
-            "moyenne": cell_str(6),
-            "observation": cell_str(7),
+            "sexe": _cell_str(row, 1),
+            "name": _cell_str(row, 3),
+            "date_lieu_naissance": _cell_str(row, 4),
+            "diplome_filiere_annee": _cell_str(row, 5),
+            "moyenne": _cell_str(row, 6),
+            "moyenne_num": _parse_moyenne(row[6] if len(row) > 6 else None),
+            "observation": _cell_str(row, 7),
             "filiere": current_filiere,
             "niveau_etudes": current_niveau,
-            "avis": cell_str(8) or "En attente",
-        })
-
-    wb.close()
-    return candidates
-
-
-def _apply_duplicate_policy(candidates: list[dict]) -> list[dict]:
-    from collections import defaultdict
-
-    by_id_russe = defaultdict(list)
-    for c in candidates:
-        id_russe = c.get("id_russe", "")
-        if id_russe:
-            by_id_russe[id_russe].append(c)
-
-    to_drop = set()
-
-    for id_russe, group in by_id_russe.items():
-        if len(group) < 2:
-            continue
-        a, b = group[0], group[1]
+            "avis": _cell_str(row, 8) or "En attente",
+        }
 
-        name_a = set(a["name"].upper().split())
-        name_b = set(b["name"].upper().split())
-        common = name_a & name_b
-        similarity = len(common) / max(len(name_a), len(name_b)) if name_a or name_b else 0
 
-        if similarity < 0.3:
-            category = "different_people"
-        elif a["filiere"] == b["filiere"] and a["niveau_etudes"] == b["niveau_etudes"]:
-            category = "identical"
-        else:
-            category = "same_person_diff_filiere"
+@_retry_on_busy
+def load_excel_to_db(excel_path: str) -> int:
+    with _workbook_rows(excel_path) as rows:
+        head = list(islice(rows, FORMAT_PROBE_ROWS))
+        if _looks_like_cnabau(head):
+            return _load_real_excel(chain(head, rows))
+    return _load_flat_excel(excel_path)
 
-        if DUPLICATE_POLICY.get(category) == "drop":
-            to_drop.add(b["id_demande"])
 
-    if to_drop:
-        candidates = [c for c in candidates if c["id_demande"] not in to_drop]
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : chargement en masse
+# Une seule transaction, un executemany() sur des tuples préparés, et les index
+# secondaires supprimés pendant l'insertion puis reconstruits en une passe.
+# ---------------------------------------------------------------------------
 
-    return candidates
+CANDIDATURE_COLUMNS = (
+    "id_demande", "id_russe", "numero", "sexe", "name", "date_lieu_naissance",
+    "diplome_filiere_annee", "moyenne", "moyenne_num", "observation", "filiere",
+    "niveau_etudes", "avis",
+)
 
+FLAT_COLUMNS = ("id_demande", "name", "filiere", "niveau_etudes", "avis")
 
-def _is_real_cnabau_file(excel_path: str) -> bool:
-    from openpyxl import load_workbook
 
-    wb = load_workbook(excel_path, read_only=True, data_only=True)
-    ws = wb.active
-    for row in ws.iter_rows(min_row=1, max_row=10, max_col=1, values_only=True):
-        val = str(row[0] or "")
-        if "NIVEAU" in val.upper() or "CNaBAU" in val or "BOURSE" in val.upper():
-            wb.close()
-            return True
-    wb.close()
-    return False
-
-
-def load_excel_to_db(excel_path: str) -> int:
-    if _is_real_cnabau_file(excel_path):
-        return _load_real_excel(excel_path)
-    return _load_flat_excel(excel_path)
+def _bulk_insert_candidatures(conn: sqlite3.Connection, columns, rows) -> int:
+    for name in CANDIDATURE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    placeholders = ", ".join("?" * len(columns))
+    cur = conn.executemany(
+        f"INSERT OR REPLACE INTO candidatures ({', '.join(columns)}) VALUES ({placeholders})",
+        rows,
+    )
+    _create_indexes(conn)
+    dropped = _refresh_duplicates(conn)
+    _rebuild_name_index(conn)
+    _bump_roster_version(conn)
+    return cur.rowcount - dropped
 
 
-def _load_real_excel(excel_path: str) -> int:
-    candidates = _parse_real_excel(excel_path)
-    candidates = _apply_duplicate_policy(candidates)
-    conn = get_connection()
-    for c in candidates:
-        conn.execute(
-            """INSERT OR REPLACE INTO candidatures
-               (id_demande, id_russe, numero, sexe, name, date_lieu_naissance,
-                diplome_filiere_annee, moyenne, observation, filiere, niveau_etudes, avis)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (c["id_demande"], c["id_russe"], c["numero"], c["sexe"], c["name"],
-             c["date_lieu_naissance"], c["diplome_filiere_annee"], c["moyenne"],
-             c["observation"], c["filiere"], c["niveau_etudes"], c["avis"]),
-        )
-    conn.commit()
-    conn.close()
-    return len(candidates)
+def _load_real_excel(rows) -> int:
+    with transaction() as conn:
+        recorder = _AliasRecorder(_candidature_filiere_resolver(conn))
+        values = (tuple(c[col] for col in CANDIDATURE_COLUMNS) for c in _iter_real_excel(rows, recorder))
+        count = _bulk_insert_candidatures(conn, CANDIDATURE_COLUMNS, values)
+        recorder.save(conn)
+        _bump_data_version(conn)
+        _journal_load(conn, JOURNAL_CHARGEMENT, count)
+    return count
 
 
 def _load_flat_excel(excel_path: str) -> int:
@@ -244,129 +1188,427 @@ def _load_flat_excel(excel_path: str) -> int:
     else:
         df["avis"] = "En attente"
 
-    conn = get_connection()
-    for _, row in df.iterrows():
-        conn.execute(
-            """INSERT OR REPLACE INTO candidatures
-               (id_demande, name, filiere, niveau_etudes, avis)
-               VALUES (?, ?, ?, ?, ?)""",
-            (row["id_demande"], row["name"], row["filiere"],
-             row["niveau_etudes"], row["avis"]),
+    columns = list(FLAT_COLUMNS)
+    if "moyenne" in df.columns:
+        df["moyenne_num"] = pd.to_numeric(
+            df["moyenne"].astype(str).str.replace(",", ".", regex=False), errors="coerce"
         )
-    conn.commit()
-    conn.close()
-    return len(df)
+        df["moyenne"] = df["moyenne"].where(df["moyenne"].isna(), df["moyenne"].astype(str))
+        columns += ["moyenne", "moyenne_num"]
 
+    # astype(object) : types Python natifs (sqlite3 refuse numpy.int64), NaN → None
+    flat = df[columns].astype(object)
+    flat = flat.where(flat.notna(), None)
+    with transaction() as conn:
+        count = _bulk_insert_candidatures(conn, columns, flat.itertuples(index=False, name=None))
+        _bump_data_version(conn)
+        _journal_load(conn, JOURNAL_CHARGEMENT, count)
+    return count
 
+
+@_retry_on_busy
 def load_quotas(quotas_path: str):
     with open(quotas_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    conn = get_connection()
-    for niveau, filieres in data.items():
-        for filiere, nb_places in filieres.items():
-            conn.execute(
-                """INSERT OR REPLACE INTO quotas (niveau_etudes, filiere, nb_places)
-                   VALUES (?, ?, ?)""",
-                (niveau, filiere, nb_places),
-            )
-    conn.commit()
-    conn.close()
-
+    with transaction() as conn:
+        recorder = _AliasRecorder(_quota_filiere_resolver(conn))
+        total = 0
+        for niveau, filieres in data.items():
+            taken = set()
+            for filiere, nb_places in filieres.items():
+                resolved = recorder(filiere, niveau)
+                # Deux lignes du fichier ne fusionnent jamais sur une même filière.
+                filiere = resolved if resolved not in taken else filiere_resolver.clean_name(filiere)
+                taken.add(filiere)
+                conn.execute(
+                    """INSERT OR REPLACE INTO quotas (niveau_etudes, filiere, nb_places)
+                       VALUES (?, ?, ?)""",
+                    (niveau, filiere, nb_places),
+                )
+                total += nb_places
+        recorder.save(conn)
+        _bump_data_version(conn)
+        _journal_load(conn, JOURNAL_QUOTAS, total)
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : liste paginée côté SQL
+# L'onglet Liste chargeait toute la table puis filtrait / triait en pandas
+# pour n'afficher que 15 lignes. Filtres, tri (niveau, filière, moyenne
+# décroissante) et LIMIT sont désormais appliqués par SQLite.
+# ---------------------------------------------------------------------------
+
+def _candidature_filters(niveaux, filieres, avis) -> tuple[str, list]:
+    clauses, params = [], []
+    for column, values in (("niveau_etudes", niveaux), ("filiere", filieres), ("avis", avis)):
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+
+def count_candidatures(niveaux=(), filieres=(), avis=()) -> int:
+    where, params = _candidature_filters(niveaux, filieres, avis)
+    with connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM candidatures {where}", params).fetchone()[0]
+
+
+def _list_page_query(niveaux, filieres, avis, after, limit: int) -> tuple[str, list]:
+    where, params = _candidature_filters(niveaux, filieres, avis)
+    if niveaux or filieres:
+        # Filtre exprimé aussi sur tri_niveau (tous les rangs si seule la filière
+        # est filtrée) : l'index de la liste est alors parcouru par (rang, filière).
+        ranks = sorted({NIVEAU_ORDER.index(n) if n in NIVEAU_ORDER else 99 for n in niveaux}
+                       or {*range(len(NIVEAU_ORDER)), 99})
+        where += f" AND tri_niveau IN ({', '.join('?' * len(ranks))})"
+        params = [*params, *ranks]
+    if after is not None:
+        where += f"{' AND' if where else 'WHERE'} ({LIST_ORDER_SQL}) > ({', '.join('?' * len(LIST_ORDER))})"
+        params = [*params, *after]
+    return f"SELECT * FROM candidatures {where} ORDER BY {LIST_ORDER_SQL} LIMIT ?", [*params, limit]
+
+
+def get_candidatures_page(niveaux=(), filieres=(), avis=(), after: tuple | None = None,
+                          page_size: int = 15) -> tuple[pd.DataFrame, tuple | None]:
+    """Page de la liste qui suit la clé `after` (None : première page).
+
+    Retourne (lignes, clé de la dernière ligne à passer comme `after` pour
+    la page suivante — None s'il n'y en a pas). Le coût d'une page ne
+    dépend pas de sa position : lecture de l'index à partir de la clé, sans
+    OFFSET ni tri.
+    """
+    sql, params = _list_page_query(niveaux, filieres, avis, after, page_size + 1)
+    with connection() as conn:
+        cur = conn.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    next_key = tuple(rows[page_size - 1][k] for k in LIST_ORDER) if len(rows) > page_size else None
+    df = pd.DataFrame([tuple(r) for r in rows[:page_size]], columns=columns)
+    return df.drop(columns=list(LIST_SORT_COLUMNS)), next_key
+
+
+def get_niveaux_filieres() -> list[tuple[str, str]]:
+    """Couples (niveau, filière) présents dans les candidatures, dans l'ordre d'affichage."""
+    with connection() as conn:
+        rows = conn.execute(
+            f"""SELECT DISTINCT niveau_etudes, filiere FROM candidatures
+                ORDER BY {NIVEAU_RANK_SQL}, filiere"""
+        ).fetchall()
+    return [(r["niveau_etudes"], r["filiere"]) for r in rows]
 
-def get_all_candidatures() -> pd.DataFrame:
-    conn = get_connection()
-    df = pd.read_sql_query("SELECT * FROM candidatures", conn)
-    conn.close()
-    return df
 
+@_retry_on_busy
+def update_avis(id_demande: str, avis: str):
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT avis, niveau_etudes, filiere FROM candidatures WHERE id_demande = ?",
+            (id_demande,),
+        ).fetchone()
+        if not row:
+            return
+        conn.execute(
+            "UPDATE candidatures SET avis = ? WHERE id_demande = ?",
+            (avis, id_demande),
+        )
+        version = _bump_data_version(conn)
+        if row["avis"] != avis:
+            _journal_avis(conn, [(id_demande, row["niveau_etudes"], row["filiere"], row["avis"], avis)])
+
+    key = (row["niveau_etudes"], row["filiere"])
+    _sync_ledger(version, lambda ledger: ledger.apply_avis_change(key, row["avis"], avis))
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : décisions groupées
+# Une décision = une transaction, un commit et un rerun complet de la page.
+# bulk_update_avis applique une liste de décisions dans une seule
+# transaction et vérifie les quotas une fois, sur les filières touchées.
+# ---------------------------------------------------------------------------
+
+def bulk_update_avis(decisions) -> dict:
+    """Applique les décisions `(id_demande, avis)`, tout ou rien.
+
+    Refusé si une filière dont le nombre de favorables augmente dépasse
+    alors son quota. Retourne {"success": True, "updated": n} ou
+    {"success": False, "error": message, "depassements": {clé: (favorables, places)}}.
+    """
+    decisions = dict(decisions)  # une seule décision par candidature : la dernière
+    if not decisions:
+        return {"success": True, "updated": 0}
+    try:
+        return _apply_bulk_avis(decisions)
+    except _QuotaExceeded as e:
+        detail = ", ".join(f"{fil} ({niv}) : {fav}/{places}" for (niv, fil), (fav, places) in e.depassements.items())
+        return {"success": False, "error": f"Quota dépassé — {detail}.", "depassements": e.depassements}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-def get_quotas() -> dict:
-    conn = get_connection()
-    rows = conn.execute("SELECT niveau_etudes, filiere, nb_places FROM quotas").fetchall()
-    conn.close()
-    return {(r["niveau_etudes"], r["filiere"]): r["nb_places"] for r in rows}
 
+class _QuotaExceeded(Exception):
+    """Décisions refusées : annule la transaction."""
 
-def get_favorables_count() -> dict:
-    conn = get_connection()
-    rows = conn.execute(
-        """SELECT niveau_etudes, filiere, COUNT(*) as n
-           FROM candidatures WHERE avis = 'Favorable'
-           GROUP BY niveau_etudes, filiere"""
-    ).fetchall()
-    conn.close()
-    return {(r["niveau_etudes"], r["filiere"]): r["n"] for r in rows}
+    def __init__(self, depassements: dict):
+        super().__init__(depassements)
+        self.depassements = depassements
 
 
-def update_avis(id_demande: str, avis: str):
-    conn = get_connection()
-    conn.execute(
-        "UPDATE candidatures SET avis = ? WHERE id_demande = ?",
-        (avis, id_demande),
+@_retry_on_busy
+def _apply_bulk_avis(decisions: dict) -> dict:
+    with transaction() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS bulk_avis (id_demande TEXT PRIMARY KEY, avis TEXT NOT NULL)")
+        conn.execute("DELETE FROM bulk_avis")
+        conn.executemany("INSERT INTO bulk_avis VALUES (?, ?)", decisions.items())
+        changes = conn.execute(
+            """SELECT c.id_demande, c.niveau_etudes, c.filiere, c.avis AS old_avis, b.avis AS new_avis
+               FROM bulk_avis b JOIN candidatures c ON c.id_demande = b.id_demande
+               WHERE c.avis IS NOT b.avis"""
+        ).fetchall()
+        conn.execute(
+            """UPDATE candidatures SET avis = b.avis FROM bulk_avis b
+               WHERE candidatures.id_demande = b.id_demande AND candidatures.avis IS NOT b.avis"""
+        )
+        conn.execute("DELETE FROM bulk_avis")
+
+        gained = {}
+        for c in changes:
+            delta = (c["new_avis"] == "Favorable") - (c["old_avis"] == "Favorable")
+            key = (c["niveau_etudes"], c["filiere"])
+            gained[key] = gained.get(key, 0) + delta
+        depassements = {}
+        for key in (k for k, d in gained.items() if d > 0):
+            row = conn.execute(
+                """SELECT q.nb_places,
+                          (SELECT COUNT(*) FROM candidatures c WHERE c.avis = 'Favorable'
+                             AND c.niveau_etudes = q.niveau_etudes AND c.filiere = q.filiere) AS fav
+                   FROM quotas q WHERE q.niveau_etudes = ? AND q.filiere = ?""",
+                key,
+            ).fetchone()
+            if row is not None and row["fav"] > row["nb_places"]:
+                depassements[key] = (row["fav"], row["nb_places"])
+        if depassements:
+            raise _QuotaExceeded(depassements)
+        version = _bump_data_version(conn) if changes else None
+        _journal_avis(conn, changes)
+
+    if changes:
+        def apply(ledger):
+            for c in changes:
+                ledger.apply_avis_change((c["niveau_etudes"], c["filiere"]), c["old_avis"], c["new_avis"])
+
+        _sync_ledger(version, apply)
+    return {"success": True, "updated": len(changes)}
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : pré-remplissage des quotas
+# Chaque Favorable était cliqué à la main, filière par filière. Une seule
+# requête (fenêtre ROW_NUMBER par niveau et filière) classe les candidats en
+# attente par moyenne et propose Favorable pour les places libres, puis
+# Suppléant pour les suivants. Aperçu sans écriture, puis application dans
+# une transaction qui recalcule la proposition sous verrou.
+# ---------------------------------------------------------------------------
+
+N_SUPPLEANTS = 2
+
+ALLOCATION_SQL = f"""
+    WITH fav AS (
+        SELECT niveau_etudes, filiere, COUNT(*) AS n FROM candidatures
+        WHERE avis = 'Favorable' GROUP BY niveau_etudes, filiere
+    ), ranked AS (
+        SELECT c.id_demande, c.numero, c.name, c.niveau_etudes, c.filiere, c.moyenne_num,
+               ROW_NUMBER() OVER (
+                   PARTITION BY c.niveau_etudes, c.filiere
+                   ORDER BY c.moyenne_num DESC, c.numero, c.id_demande  -- NULL en dernier
+               ) AS rang,
+               MAX(q.nb_places - COALESCE(f.n, 0), 0) AS libres
+        FROM candidatures c
+        JOIN quotas q ON q.niveau_etudes = c.niveau_etudes AND q.filiere = c.filiere
+        LEFT JOIN fav f ON f.niveau_etudes = c.niveau_etudes AND f.filiere = c.filiere
+        WHERE c.avis = 'En attente'
     )
-    conn.commit()
-    conn.close()
+    SELECT id_demande, numero, name, niveau_etudes, filiere, moyenne_num, rang,
+           CASE WHEN rang <= libres THEN 'Favorable' ELSE 'Suppléant' END AS avis_propose
+    FROM ranked
+    WHERE rang <= libres + :n_suppleants
+    ORDER BY {NIVEAU_RANK_SQL}, filiere, rang
+"""
+
+
+def propose_allocation(n_suppleants: int = N_SUPPLEANTS) -> pd.DataFrame:
+    """Aperçu (sans écriture) : candidats en attente proposés Favorable ou
+    Suppléant, par filière, dans l'ordre des moyennes."""
+    with read_snapshot() as conn:
+        return pd.read_sql_query(ALLOCATION_SQL, conn, params={"n_suppleants": n_suppleants})
+
+
+def apply_allocation(n_suppleants: int = N_SUPPLEANTS) -> dict:
+    """Applique la proposition, recalculée dans la transaction d'écriture.
+    Retourne le résultat de bulk_update_avis, plus les nombres par avis."""
+    try:
+        return _apply_allocation(n_suppleants)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@_retry_on_busy
+def _apply_allocation(n_suppleants: int) -> dict:
+    with transaction() as conn:
+        rows = conn.execute(ALLOCATION_SQL, {"n_suppleants": n_suppleants}).fetchall()
+        result = _apply_bulk_avis({r["id_demande"]: r["avis_propose"] for r in rows})
+    result["favorables"] = sum(r["avis_propose"] == "Favorable" for r in rows)
+    result["suppleants"] = len(rows) - result["favorables"]
+    return result
 
 
 def search_by_field(field: str, query: str) -> dict | None:
-    conn = get_connection()
     row = None
-    if field == "numero":
-        try:
-            num = int(query)
+    with connection() as conn:
+        if field == "numero":
+            try:
+                num = int(query)
+                row = conn.execute(
+                    "SELECT * FROM candidatures WHERE numero = ?", (num,)
+                ).fetchone()
+            except ValueError:
+                pass
+        elif field == "id_russe":
             row = conn.execute(
-                "SELECT * FROM candidatures WHERE numero = ?", (num,)
+                "SELECT * FROM candidatures WHERE id_russe = ?", (query,)
             ).fetchone()
-        except ValueError:
-            pass
-    elif field == "id_russe":
-        row = conn.execute(
-            "SELECT * FROM candidatures WHERE id_russe = ?", (query,)
-        ).fetchone()
-    elif field == "name":
-        row = conn.execute(
-            "SELECT * FROM candidatures WHERE name = ? COLLATE NOCASE", (query,)
-        ).fetchone()
-    conn.close()
+        elif field == "id_demande":
+            row = conn.execute(
+                "SELECT * FROM candidatures WHERE id_demande = ?", (query,)
+            ).fetchone()
+        elif field == "name":
+            row = conn.execute(
+                "SELECT * FROM candidatures WHERE name = ? COLLATE NOCASE", (query,)
+            ).fetchone()
+            if row is None:
+                # Mêmes mots à l'accent ou à l'ordre près (« Aïcha KONE » = « KONÉ AICHA »)
+                words = sorted(fold(query).split())
+                same = [r for r in search_names(query, conn=conn) if sorted(fold(r["name"]).split()) == words]
+                return same[0] if len(same) == 1 else None
     return dict(row) if row else None
 
 
 def search_by_field_fuzzy(field: str, query: str) -> list[dict]:
-    conn = get_connection()
-    if field == "numero":
-        rows = conn.execute(
-            "SELECT * FROM candidatures WHERE CAST(numero AS TEXT) LIKE ? ORDER BY numero LIMIT 20",
-            (f"%{query}%",),
-        ).fetchall()
-    elif field == "id_russe":
-        rows = conn.execute(
-            "SELECT * FROM candidatures WHERE id_russe LIKE ? ORDER BY numero LIMIT 20",
-            (f"%{query}%",),
-        ).fetchall()
-    elif field == "name":
-        rows = conn.execute(
-            "SELECT * FROM candidatures WHERE name LIKE ? COLLATE NOCASE ORDER BY numero LIMIT 20",
-            (f"%{query}%",),
-        ).fetchall()
-    else:
-        rows = []
-    conn.close()
+    with connection() as conn:
+        if field == "numero":
+            rows = conn.execute(
+                "SELECT * FROM candidatures WHERE CAST(numero AS TEXT) LIKE ? ORDER BY numero LIMIT 20",
+                (f"%{query}%",),
+            ).fetchall()
+        elif field == "id_russe":
+            rows = conn.execute(
+                "SELECT * FROM candidatures WHERE id_russe LIKE ? ORDER BY numero LIMIT 20",
+                (f"%{query}%",),
+            ).fetchall()
+        elif field == "name":
+            return search_names(query, conn=conn)
+        else:
+            rows = []
     return [dict(r) for r in rows]
 
 
+NAME_SEARCH_LIMIT = 20
+NAME_CANDIDATES = 200   # candidats lus dans l'index avant classement
+NAME_MIN_COVERAGE = 0.5  # part des trigrammes de la requête retrouvés dans le nom
+NAME_TYPO_BUDGET = 2000  # noms au plus désignés par les trigrammes de la recherche tolérante
+
+
+def search_names(query: str, limit: int = NAME_SEARCH_LIMIT, conn=None) -> list[dict]:
+    """Recherche classée par nom, insensible aux accents, à l'ordre des mots
+    et aux fautes de frappe.
+
+    1. Noms contenant tous les mots de la requête, dans n'importe quel ordre.
+    2. À défaut : noms partageant assez de trigrammes avec la requête
+       (« HOUNKPATN » retrouve « HOUNKPATIN »). Les candidats sont lus via
+       les trigrammes les plus rares de la requête (fts5vocab) : les
+       trigrammes fréquents désignent des milliers de noms sans discriminer.
+    Classement : part des trigrammes de la requête présents dans le nom, puis
+    similarité globale (un nom plus court l'emporte à couverture égale).
+    """
+    folded = fold(query)
+    if not folded:
+        return []
+    if conn is None:
+        with connection() as conn:
+            return search_names(query, limit, conn)
+
+    words = folded.split()
+    long_words = [w for w in words if len(w) >= 3]
+    query_grams = token_trigrams(folded)
+
+    if not _has_name_index(conn):
+        found = {r["rowid"]: fold(r["name"]) for r in conn.execute("SELECT rowid, name FROM candidatures")}
+    elif long_words:
+        found = {r["rowid"]: r["nom"] for r in conn.execute(
+            f"SELECT rowid, nom FROM {NAME_INDEX} WHERE nom MATCH ? LIMIT ?",
+            (" AND ".join(f'"{w}"' for w in long_words), NAME_CANDIDATES),
+        )}
+        found = {rowid: nom for rowid, nom in found.items() if all(w in nom for w in words)}
+        if not found:
+            grams = sorted(g for g in query_grams if len(g) == 3)
+            rare, budget = [], NAME_TYPO_BUDGET
+            for r in conn.execute(
+                f"SELECT term, doc FROM {NAME_VOCAB} WHERE term IN ({', '.join('?' * len(grams))}) ORDER BY doc",
+                grams,
+            ):
+                if rare and r["doc"] > budget:
+                    break
+                rare.append(r["term"])
+                budget -= r["doc"]
+            if rare:
+                found = {r["rowid"]: r["nom"] for r in conn.execute(
+                    f"SELECT rowid, nom FROM {NAME_INDEX} WHERE nom MATCH ? ORDER BY rank LIMIT ?",
+                    (" OR ".join(f'"{g}"' for g in rare), NAME_CANDIDATES),
+                )}
+    else:
+        # Mots de moins de 3 lettres : hors de portée des trigrammes
+        found = {r["rowid"]: fold(r["name"]) for r in conn.execute(
+            "SELECT rowid, name FROM candidatures WHERE cnbau_fold(name) LIKE ? LIMIT ?",
+            (f"%{words[0]}%", NAME_CANDIDATES),
+        )}
+
+    scored = []
+    for rowid, nom in found.items():
+        exact = all(w in nom for w in words)
+        grams = token_trigrams(nom)
+        coverage = len(query_grams & grams) / len(query_grams)
+        if exact or coverage >= NAME_MIN_COVERAGE:
+            scored.append((not exact, -coverage, -similarity(query_grams, grams), rowid))
+    scored.sort()
+    best = [rowid for *_, rowid in scored[:limit]]
+    if not best:
+        return []
+
+    rows = {
+        r["rowid"]: r for r in conn.execute(
+            f"SELECT rowid, * FROM candidatures WHERE rowid IN ({', '.join('?' * len(best))})", best
+        )
+    }
+    return [_without_rowid(rows[rowid]) for rowid in best if rowid in rows]
+
+
+def _without_rowid(row: sqlite3.Row) -> dict:
+    d = dict(row)
+    d.pop("rowid", None)
+    return d
+
+
 # ✅ OPTIMISATION : une seule requête SQL au lieu de 5 COUNT() séparés
 def get_stats() -> dict:
-    conn = get_connection()
-    row = conn.execute("""
-        SELECT
-            COUNT(*) AS total,
-            SUM(CASE WHEN avis = 'Favorable'   THEN 1 ELSE 0 END) AS favorables,
-            SUM(CASE WHEN avis = 'Défavorable' THEN 1 ELSE 0 END) AS defavorables,
-            SUM(CASE WHEN avis = 'Suppléant'   THEN 1 ELSE 0 END) AS suppleants
-        FROM candidatures
-    """).fetchone()
-    conn.close()
+    with connection() as conn:
+        row = conn.execute("""
+            SELECT
+                COUNT(*) AS total,
+                SUM(CASE WHEN avis = 'Favorable'   THEN 1 ELSE 0 END) AS favorables,
+                SUM(CASE WHEN avis = 'Défavorable' THEN 1 ELSE 0 END) AS defavorables,
+                SUM(CASE WHEN avis = 'Suppléant'   THEN 1 ELSE 0 END) AS suppleants
+            FROM candidatures
+        """).fetchone()
     total     = row["total"]        or 0
     fav       = row["favorables"]   or 0
     defav     = row["defavorables"] or 0
@@ -382,19 +1624,15 @@ def get_stats() -> dict:
     }
 
 
-NIVEAU_ORDER = ["Licence", "Master", "Doctorat", "Spécialisation"]
-
-
 def _create_base_docx():
-    from itertools import groupby
-
     from docx import Document
-    from docx.enum.table import WD_ALIGN_VERTICAL
     from docx.enum.text import WD_ALIGN_PARAGRAPH
     from docx.oxml import OxmlElement
     from docx.oxml.ns import qn
     from docx.shared import Pt, Twips
 
+    from docx_table import build_candidates_table
+
     doc = Document()
 
     for section in doc.sections:
@@ -428,104 +1666,13 @@ def _create_base_docx():
         run.bold = bold
         run.underline = underline
 
-    def set_cell_shading(cell, color):
-        tcPr = cell._tc.get_or_add_tcPr()
-        shd = OxmlElement("w:shd")
-        shd.set(qn("w:val"), "clear")
-        shd.set(qn("w:color"), "auto")
-        shd.set(qn("w:fill"), color)
-        tcPr.append(shd)
-
-    def merge_row_cells(row, table):
-        n_cols = len(table.columns)
-        tc = row.cells[0]._tc
-        tcPr = tc.get_or_add_tcPr()
-        gs = OxmlElement("w:gridSpan")
-        gs.set(qn("w:val"), str(n_cols))
-        tcPr.append(gs)
-        tr = row._tr
-        tcs = tr.findall(qn("w:tc"))
-        for extra_tc in tcs[1:]:
-            tr.remove(extra_tc)
-
+    # ------------------------------------------------------------------
+    # ✅ OPTIMISATION : tableau écrit d'un bloc en XML (docx_table)
+    # au lieu d'add_row / cell.text / add_run / merge cellule par cellule.
+    # Les candidats arrivent déjà triés par fetch_export_data.
+    # ------------------------------------------------------------------
     def add_table_for_section(candidates_list):
-        table = doc.add_table(rows=1, cols=4, style="Table Grid")
-
-        col_widths = [Twips(567), Twips(4254), Twips(4223), Twips(2127)]
-        for i, width in enumerate(col_widths):
-            table.columns[i].width = width
-
-        headers = ["N° ", "FILIERE", "NOM ET PRENOMS", "OBSERVATIONS"]
-        for i, text in enumerate(headers):
-            cell = table.rows[0].cells[i]
-            cell.text = ""
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(text)
-            set_run_font(run, size=11)
-            set_cell_shading(cell, "BFBFBF")
-            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
-
-        def sort_key(c):
-            niv = c["niveau_etudes"]
-            idx = NIVEAU_ORDER.index(niv) if niv in NIVEAU_ORDER else 99
-            return (idx, c["filiere"], c.get("numero", 0) or 0)
-
-        candidates_list = sorted(candidates_list, key=sort_key)
-
-        num = 1
-        for niveau, niveau_group in groupby(candidates_list, key=lambda c: c["niveau_etudes"]):
-            niveau_group = list(niveau_group)
-            row = table.add_row()
-            cell = row.cells[0]
-            cell.text = ""
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            run = p.add_run(niveau.upper())
-            set_run_font(run, size=11, bold=True)
-            set_cell_shading(cell, "E7E6E6")
-            merge_row_cells(row, table)
-
-            for filiere, fil_group in groupby(niveau_group, key=lambda c: c["filiere"]):
-                fil_group = list(fil_group)
-                first_row_idx = len(table.rows)
-
-                for i_in_fil, c in enumerate(fil_group):
-                    row = table.add_row()
-                    cell_num = row.cells[0]
-                    cell_num.text = ""
-                    p = cell_num.paragraphs[0]
-                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                    run = p.add_run(str(num))
-                    set_run_font(run, size=11)
-
-                    cell_fil = row.cells[1]
-                    cell_fil.text = ""
-                    if i_in_fil == 0:
-                        p = cell_fil.paragraphs[0]
-                        run = p.add_run(c["filiere"])
-                        set_run_font(run, size=11)
-
-                    cell_name = row.cells[2]
-                    cell_name.text = ""
-                    p = cell_name.paragraphs[0]
-                    run = p.add_run(c["name"])
-                    set_run_font(run, size=11)
-
-                    cell_obs = row.cells[3]
-                    cell_obs.text = ""
-                    p = cell_obs.paragraphs[0]
-                    obs = c.get("observation") or ""
-                    run = p.add_run(obs)
-                    set_run_font(run, size=11)
-
-                    num += 1
-
-                last_row_idx = len(table.rows) - 1
-                if last_row_idx > first_row_idx:
-                    table.cell(first_row_idx, 1).merge(table.cell(last_row_idx, 1))
-
-        return table
+        return build_candidates_table(doc, candidates_list)
 
     logo_path = Path(__file__).parent / "assets" / "logo.png"
     if logo_path.exists():
@@ -553,92 +1700,163 @@ def _create_base_docx():
     return doc, add_table_for_section, set_run_font
 
 
-def export_to_docx(output_path: str) -> str:
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : données d'export communes
+# Une seule lecture (un instantané) alimente tous les exports : les
+# candidatures décidées arrivent triées par SQL dans l'ordre des documents
+# (rang du niveau, filière, numéro) et sont réparties par avis en une passe.
+# Plus de requête par export ni de tri Python avec NIVEAU_ORDER.index.
+# ---------------------------------------------------------------------------
 
-    conn = get_connection()
-    rows = conn.execute(
-        """SELECT * FROM candidatures
-           WHERE avis IN ('Favorable', 'Suppléant')
-           ORDER BY niveau_etudes, filiere, numero"""
-    ).fetchall()
-    conn.close()
-    candidates = [dict(r) for r in rows]
+EXPORT_AVIS = ("Favorable", "Suppléant", "Défavorable")
 
-    favorables = [c for c in candidates if c["avis"] == "Favorable"]
-    suppleants = [c for c in candidates if c["avis"] == "Suppléant"]
+# Même ordre que l'ancien tri Python (rang, filière, numéro or 0), départagé
+# comme la requête d'origine (niveau, filière, numéro).
+EXPORT_ORDER_SQL = f"{NIVEAU_RANK_SQL}, filiere, COALESCE(numero, 0), niveau_etudes, numero"
 
-    doc, add_table_for_section, set_run_font = _create_base_docx()
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run("LISTE DES CANDIDATS TITULAIRES ")
-    set_run_font(run, size=13, underline=True)
+@dataclass
+class ExportData:
+    """Données d'export ; des dict simples, transmissibles à un autre processus."""
+    version: int
+    by_avis: dict[str, list[dict]]
+    quotas: list[dict]
+    favorables: dict[tuple[str, str], int]
 
-    add_table_for_section(favorables)
-    doc.add_paragraph()
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run("LISTE DES CANDIDATS SUPPLÉANTS")
-    set_run_font(run, size=13, underline=True)
+def fetch_export_data() -> ExportData:
+    """Lit en une fois tout ce dont les exports Word et Excel ont besoin."""
+    by_avis = {avis: [] for avis in EXPORT_AVIS}
+    favorables: dict[tuple[str, str], int] = {}
+
+    with read_snapshot() as conn:
+        version = _read_data_version(conn)
+        rows = conn.execute(
+            f"""SELECT numero, name, filiere, niveau_etudes, observation, avis
+                FROM candidatures
+                WHERE avis IN ({", ".join("?" * len(EXPORT_AVIS))})
+                ORDER BY {EXPORT_ORDER_SQL}""",
+            EXPORT_AVIS,
+        )
+        for r in rows:
+            by_avis[r["avis"]].append(dict(r))
+            if r["avis"] == "Favorable":
+                key = (r["niveau_etudes"], r["filiere"])
+                favorables[key] = favorables.get(key, 0) + 1
 
-    add_table_for_section(suppleants)
+        quotas = [dict(r) for r in conn.execute(
+            f"""SELECT niveau_etudes, filiere, nb_places FROM quotas
+                ORDER BY {NIVEAU_RANK_SQL}, filiere, niveau_etudes"""
+        )]
 
-    doc.save(output_path)
-    return output_path
+    return ExportData(version=version, by_avis=by_avis, quotas=quotas, favorables=favorables)
 
 
-def export_all_avis_to_docx(output_path: str) -> str:
+def _export_docx(output, sections: list[tuple[str, list]]):
+    """Document Word : une liste titrée + un tableau par section.
+    `output` est un chemin ou un objet fichier."""
     from docx.enum.text import WD_ALIGN_PARAGRAPH
 
-    conn = get_connection()
-    rows = conn.execute(
-        """SELECT * FROM candidatures
-           WHERE avis IN ('Favorable', 'Suppléant', 'Défavorable')
-           ORDER BY niveau_etudes, filiere, numero"""
-    ).fetchall()
-    conn.close()
-    candidates = [dict(r) for r in rows]
+    doc, add_table_for_section, set_run_font = _create_base_docx()
 
-    favorables  = [c for c in candidates if c["avis"] == "Favorable"]
-    suppleants  = [c for c in candidates if c["avis"] == "Suppléant"]
-    defavorables = [c for c in candidates if c["avis"] == "Défavorable"]
+    for i, (title, candidates) in enumerate(sections):
+        if i:
+            doc.add_paragraph()
+        p = doc.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+        run = p.add_run(title)
+        set_run_font(run, size=13, underline=True)
+        add_table_for_section(candidates)
 
-    doc, add_table_for_section, set_run_font = _create_base_docx()
+    doc.save(output)
+    return output
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run("LISTE DES CANDIDATS TITULAIRES ")
-    set_run_font(run, size=13, underline=True)
-    add_table_for_section(favorables)
-    doc.add_paragraph()
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run("LISTE DES CANDIDATS SUPPLÉANTS")
-    set_run_font(run, size=13, underline=True)
-    add_table_for_section(suppleants)
-    doc.add_paragraph()
+def export_to_docx(output_path, data: ExportData | None = None):
+    data = data or fetch_export_data()
+    return _export_docx(output_path, [
+        ("LISTE DES CANDIDATS TITULAIRES ", data.by_avis["Favorable"]),
+        ("LISTE DES CANDIDATS SUPPLÉANTS",  data.by_avis["Suppléant"]),
+    ])
 
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-    run = p.add_run("LISTE DES CANDIDATS NON RETENUS")
-    set_run_font(run, size=13, underline=True)
-    add_table_for_section(defavorables)
 
-    doc.save(output_path)
-    return output_path
+def export_all_avis_to_docx(output_path, data: ExportData | None = None):
+    data = data or fetch_export_data()
+    return _export_docx(output_path, [
+        ("LISTE DES CANDIDATS TITULAIRES ", data.by_avis["Favorable"]),
+        ("LISTE DES CANDIDATS SUPPLÉANTS",  data.by_avis["Suppléant"]),
+        ("LISTE DES CANDIDATS NON RETENUS", data.by_avis["Défavorable"]),
+    ])
 
 
-def export_avis_to_xlsx(output_path: str) -> str:
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : exports Excel en écriture seule (streaming)
+# Classeur write_only : les lignes partent sur disque au fil de l'eau, la
+# mémoire reste constante. Les mises en forme sont des styles nommés
+# enregistrés une fois par classeur (plus de Font/Alignment par cellule).
+# ---------------------------------------------------------------------------
+
+XLSX_FONT = "Trebuchet MS"
+
+
+def _register_xlsx_styles(wb):
+    from openpyxl.styles import DEFAULT_FONT, Alignment, Font, NamedStyle, PatternFill
+
+    grey  = PatternFill(start_color="BFBFBF", end_color="BFBFBF", fill_type="solid")
+    light = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
+    bold  = Font(name=XLSX_FONT, bold=True, size=11)
+    center = Alignment(horizontal="center")
+
+    for style in (
+        NamedStyle("cnbau_header",       font=bold, fill=grey, alignment=center),
+        NamedStyle("cnbau_niveau",       font=bold, fill=light),
+        NamedStyle("cnbau_niveau_large", font=Font(name=XLSX_FONT, bold=True, size=12), fill=light),
+        NamedStyle("cnbau_center",       font=DEFAULT_FONT, alignment=center),
+        NamedStyle("cnbau_total_fill",   font=DEFAULT_FONT, fill=grey),
+        NamedStyle("cnbau_total",        font=bold, fill=grey),
+        NamedStyle("cnbau_total_center", font=bold, fill=grey, alignment=center),
+    ):
+        wb.add_named_style(style)
+
+
+def _xlsx_row(ws, values, styles=()):
+    """Ligne de WriteOnlyCell ; `styles` donne le style nommé de chaque colonne (None = aucun)."""
+    from openpyxl.cell import WriteOnlyCell
+
+    row = []
+    for value, style in zip(values, chain(styles, [None] * len(values))):
+        cell = WriteOnlyCell(ws, value=value)
+        if style:
+            cell.style = style
+        row.append(cell)
+    return row
+
+
+def _new_xlsx_sheet(wb, title, headers, col_widths):
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(title=title)
+    # En écriture seule, les largeurs doivent être posées avant la 1re ligne
+    for col_idx, width in enumerate(col_widths, 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    ws.append(_xlsx_row(ws, headers, ["cnbau_header"] * len(headers)))
+    return ws
+
+
+def _append_niveau_row(ws, row_idx, niveau, n_cols, style="cnbau_niveau"):
+    """Ligne de niveau grisée, fusionnée sur toute la largeur du tableau."""
+    from openpyxl.utils import get_column_letter
+
+    ws.append(_xlsx_row(ws, [niveau.upper()] + [None] * (n_cols - 1), [style] * n_cols))
+    ws.merged_cells.add(f"A{row_idx}:{get_column_letter(n_cols)}{row_idx}")
+
+
+def export_avis_to_xlsx(output_path, data: ExportData | None = None):
     from itertools import groupby
 
     from openpyxl import Workbook
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from openpyxl.utils import get_column_letter
 
-    conn = get_connection()
+    data = data or fetch_export_data()
 
     avis_config = [
         ("Favorable",  "Favorables (Titulaires)"),
@@ -646,131 +1864,52 @@ def export_avis_to_xlsx(output_path: str) -> str:
         ("Défavorable","Défavorables"),
     ]
 
-    wb = Workbook()
-    wb.remove(wb.active)
+    wb = Workbook(write_only=True)
+    _register_xlsx_styles(wb)
 
-    header_font  = Font(name="Trebuchet MS", bold=True, size=11)
-    header_fill  = PatternFill(start_color="BFBFBF", end_color="BFBFBF", fill_type="solid")
-    niveau_fill  = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
     headers      = ["N°", "Filière", "Nom et Prénoms", "Observation"]
     col_widths   = [8, 45, 35, 25]
 
     for avis_value, sheet_name in avis_config:
-        rows = conn.execute(
-            """SELECT numero, name, filiere, niveau_etudes, observation
-               FROM candidatures
-               WHERE avis = ?
-               ORDER BY niveau_etudes, filiere, numero""",
-            (avis_value,),
-        ).fetchall()
-
-        ws = wb.create_sheet(title=sheet_name)
-
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_idx, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
-
-        for col_idx, width in enumerate(col_widths, 1):
-            ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-        candidates = [dict(r) for r in rows]
-
-        def sort_key(c):
-            niv = c["niveau_etudes"]
-            idx = NIVEAU_ORDER.index(niv) if niv in NIVEAU_ORDER else 99
-            return (idx, c["filiere"], c.get("numero", 0) or 0)
-
-        candidates.sort(key=sort_key)
+        ws = _new_xlsx_sheet(wb, sheet_name, headers, col_widths)
 
         current_row = 2
-        for niveau, niveau_group in groupby(candidates, key=lambda c: c["niveau_etudes"]):
-            cell = ws.cell(row=current_row, column=1, value=niveau.upper())
-            cell.font = Font(name="Trebuchet MS", bold=True, size=11)
-            for col_idx in range(1, len(headers) + 1):
-                ws.cell(row=current_row, column=col_idx).fill = niveau_fill
-            ws.merge_cells(
-                start_row=current_row, start_column=1,
-                end_row=current_row, end_column=len(headers),
-            )
+        for niveau, niveau_group in groupby(data.by_avis[avis_value], key=lambda r: r["niveau_etudes"]):
+            _append_niveau_row(ws, current_row, niveau, len(headers))
             current_row += 1
 
             for c in niveau_group:
-                ws.cell(row=current_row, column=1, value=c.get("numero", ""))
-                ws.cell(row=current_row, column=2, value=c.get("filiere", ""))
-                ws.cell(row=current_row, column=3, value=c.get("name", ""))
-                ws.cell(row=current_row, column=4, value=c.get("observation", ""))
+                ws.append([c["numero"], c["filiere"], c["name"], c["observation"]])
                 current_row += 1
 
-    conn.close()
     wb.save(output_path)
     return output_path
 
 
-def export_quotas_to_xlsx(output_path: str) -> str:
+def export_quotas_to_xlsx(output_path, data: ExportData | None = None):
     from itertools import groupby
 
     from openpyxl import Workbook
-    from openpyxl.styles import Alignment, Font, PatternFill
-    from openpyxl.utils import get_column_letter
-
-    conn = get_connection()
-    quotas_rows = conn.execute(
-        "SELECT niveau_etudes, filiere, nb_places FROM quotas ORDER BY niveau_etudes, filiere"
-    ).fetchall()
 
-    fav_rows = conn.execute(
-        """SELECT niveau_etudes, filiere, COUNT(*) as n
-           FROM candidatures WHERE avis = 'Favorable'
-           GROUP BY niveau_etudes, filiere"""
-    ).fetchall()
-    conn.close()
-
-    fav_counts = {(r["niveau_etudes"], r["filiere"]): r["n"] for r in fav_rows}
+    data = data or fetch_export_data()
+    quotas_rows = data.quotas
+    fav_counts  = data.favorables
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Quotas par Filière"
+    wb = Workbook(write_only=True)
+    _register_xlsx_styles(wb)
 
     headers     = ["Niveau", "Filière", "Places (Quota)", "Favorables", "Restantes"]
-    header_font = Font(name="Trebuchet MS", bold=True, size=11)
-    header_fill = PatternFill(start_color="BFBFBF", end_color="BFBFBF", fill_type="solid")
-    niveau_fill = PatternFill(start_color="E7E6E6", end_color="E7E6E6", fill_type="solid")
     col_widths  = [18, 50, 16, 14, 14]
-
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center")
-
-    for col_idx, width in enumerate(col_widths, 1):
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-    quotas_data = [dict(r) for r in quotas_rows]
-
-    def sort_key(q):
-        niv = q["niveau_etudes"]
-        idx = NIVEAU_ORDER.index(niv) if niv in NIVEAU_ORDER else 99
-        return (idx, q["filiere"])
-
-    quotas_data.sort(key=sort_key)
+    ws = _new_xlsx_sheet(wb, "Quotas par Filière", headers, col_widths)
+    value_styles = [None, None, "cnbau_center", "cnbau_center", "cnbau_center"]
 
     current_row    = 2
     total_places   = 0
     total_fav      = 0
     total_restantes = 0
 
-    for niveau, group in groupby(quotas_data, key=lambda q: q["niveau_etudes"]):
-        cell = ws.cell(row=current_row, column=1, value=niveau.upper())
-        cell.font = Font(name="Trebuchet MS", bold=True, size=12)
-        for col_idx in range(1, len(headers) + 1):
-            ws.cell(row=current_row, column=col_idx).fill = niveau_fill
-        ws.merge_cells(
-            start_row=current_row, start_column=1,
-            end_row=current_row, end_column=len(headers),
-        )
+    for niveau, group in groupby(quotas_rows, key=lambda q: q["niveau_etudes"]):
+        _append_niveau_row(ws, current_row, niveau, len(headers), style="cnbau_niveau_large")
         current_row += 1
 
         for q in group:
@@ -782,113 +1921,355 @@ def export_quotas_to_xlsx(output_path: str) -> str:
             total_fav       += fav
             total_restantes += restantes
 
-            ws.cell(row=current_row, column=1, value=q["niveau_etudes"])
-            ws.cell(row=current_row, column=2, value=q["filiere"])
-            ws.cell(row=current_row, column=3, value=q["nb_places"]).alignment = Alignment(horizontal="center")
-            ws.cell(row=current_row, column=4, value=fav).alignment             = Alignment(horizontal="center")
-            ws.cell(row=current_row, column=5, value=restantes).alignment       = Alignment(horizontal="center")
+            ws.append(_xlsx_row(
+                ws, [q["niveau_etudes"], q["filiere"], q["nb_places"], fav, restantes], value_styles,
+            ))
             current_row += 1
 
-    total_fill = PatternFill(start_color="BFBFBF", end_color="BFBFBF", fill_type="solid")
-    total_font = Font(name="Trebuchet MS", bold=True, size=11)
-    ws.cell(row=current_row, column=2, value="TOTAL").font = total_font
-    for col_idx in range(1, len(headers) + 1):
-        ws.cell(row=current_row, column=col_idx).fill = total_fill
-    ws.cell(row=current_row, column=3, value=total_places).font  = total_font
-    ws.cell(row=current_row, column=3).alignment = Alignment(horizontal="center")
-    ws.cell(row=current_row, column=4, value=total_fav).font     = total_font
-    ws.cell(row=current_row, column=4).alignment = Alignment(horizontal="center")
-    ws.cell(row=current_row, column=5, value=total_restantes).font = total_font
-    ws.cell(row=current_row, column=5).alignment = Alignment(horizontal="center")
+    ws.append(_xlsx_row(
+        ws, [None, "TOTAL", total_places, total_fav, total_restantes],
+        ["cnbau_total_fill", "cnbau_total", "cnbau_total_center", "cnbau_total_center", "cnbau_total_center"],
+    ))
 
     wb.save(output_path)
     return output_path
 
 
 def get_total_quota() -> int:
-    conn = get_connection()
-    total = conn.execute("SELECT COALESCE(SUM(nb_places), 0) FROM quotas").fetchone()[0]
-    conn.close()
-    return total
+    with connection() as conn:
+        return conn.execute("SELECT COALESCE(SUM(nb_places), 0) FROM quotas").fetchone()[0]
 
 
 def transfer_quota(source_niveau: str, source_filiere: str,
                    dest_niveau: str, dest_filiere: str,
                    nb_places: int) -> dict:
-    if nb_places <= 0:
-        return {"success": False, "error": "Le nombre de places doit être supérieur à 0."}
+    source = (source_niveau, source_filiere)
+    dest   = (dest_niveau, dest_filiere)
+    result = transfer_quotas([(source, dest, nb_places)])
+    if result["success"]:
+        result["source_nouveau"] = result["quotas"][source]
+        result["dest_nouveau"]   = result["quotas"][dest]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : transferts conditionnels
+# Le transfert lisait quota et favorables, vérifiait, puis écrivait. Chaque
+# débit est désormais un UPDATE conditionnel (places restantes recomptées
+# dans la même instruction) ; les étapes d'un lot sont appliquées dans une
+# seule transaction BEGIN IMMEDIATE : toutes ou aucune.
+# ---------------------------------------------------------------------------
+
+class _TransferRejected(Exception):
+    """Étape de transfert refusée : annule tout le lot."""
+
+
+_DEBIT_SQL = """
+    UPDATE quotas SET nb_places = nb_places - :n
+    WHERE niveau_etudes = :niveau AND filiere = :filiere
+      AND nb_places - (SELECT COUNT(*) FROM candidatures c
+                       WHERE c.avis = 'Favorable'
+                         AND c.niveau_etudes = quotas.niveau_etudes
+                         AND c.filiere = quotas.filiere) >= :n
+    RETURNING nb_places
+"""
 
-    if source_niveau == dest_niveau and source_filiere == dest_filiere:
-        return {"success": False, "error": "La source et la destination doivent être différentes."}
+_CREDIT_SQL = """
+    UPDATE quotas SET nb_places = nb_places + :n
+    WHERE niveau_etudes = :niveau AND filiere = :filiere
+    RETURNING nb_places
+"""
 
-    conn = get_connection()
-    try:
-        row_src = conn.execute(
-            "SELECT nb_places FROM quotas WHERE niveau_etudes = ? AND filiere = ?",
-            (source_niveau, source_filiere),
-        ).fetchone()
-        if not row_src:
-            return {"success": False, "error": f"Quota source introuvable ({source_niveau}, {source_filiere})."}
 
-        quota_source = row_src["nb_places"]
+def _check_leg(source, dest, nb_places):
+    if nb_places <= 0:
+        raise _TransferRejected("Le nombre de places doit être supérieur à 0.")
+    if source == dest:
+        raise _TransferRejected("La source et la destination doivent être différentes.")
+
+
+def _debit(conn: sqlite3.Connection, key, nb_places: int) -> int:
+    niveau, filiere = key
+    row = conn.execute(_DEBIT_SQL, {"n": nb_places, "niveau": niveau, "filiere": filiere}).fetchone()
+    if row is not None:
+        return row[0]
+    # Refusé : on relit pour expliquer pourquoi.
+    quota = conn.execute(
+        "SELECT nb_places FROM quotas WHERE niveau_etudes = ? AND filiere = ?", key
+    ).fetchone()
+    if quota is None:
+        raise _TransferRejected(f"Quota source introuvable ({niveau}, {filiere}).")
+    fav = conn.execute(
+        """SELECT COUNT(*) FROM candidatures
+           WHERE avis = 'Favorable' AND niveau_etudes = ? AND filiere = ?""", key
+    ).fetchone()[0]
+    raise _TransferRejected(
+        f"Places disponibles insuffisantes ({filiere}). Quota : {quota[0]}, "
+        f"Favorables : {fav}, Disponibles : {quota[0] - fav}."
+    )
 
-        fav_row = conn.execute(
-            "SELECT COUNT(*) as n FROM candidatures WHERE avis = 'Favorable' AND niveau_etudes = ? AND filiere = ?",
-            (source_niveau, source_filiere),
-        ).fetchone()
-        fav_source  = fav_row["n"]
-        disponibles = quota_source - fav_source
-
-        if nb_places > disponibles:
-            return {
-                "success": False,
-                "error": f"Places disponibles insuffisantes. Quota : {quota_source}, Favorables : {fav_source}, Disponibles : {disponibles}.",
-            }
-
-        row_dest = conn.execute(
-            "SELECT nb_places FROM quotas WHERE niveau_etudes = ? AND filiere = ?",
-            (dest_niveau, dest_filiere),
-        ).fetchone()
-        if not row_dest:
-            return {"success": False, "error": f"Quota destination introuvable ({dest_niveau}, {dest_filiere})."}
 
-        quota_dest = row_dest["nb_places"]
+def _credit(conn: sqlite3.Connection, key, nb_places: int) -> int:
+    niveau, filiere = key
+    row = conn.execute(_CREDIT_SQL, {"n": nb_places, "niveau": niveau, "filiere": filiere}).fetchone()
+    if row is None:
+        raise _TransferRejected(f"Quota destination introuvable ({niveau}, {filiere}).")
+    return row[0]
 
-        conn.execute(
-            "UPDATE quotas SET nb_places = nb_places - ? WHERE niveau_etudes = ? AND filiere = ?",
-            (nb_places, source_niveau, source_filiere),
-        )
-        conn.execute(
-            "UPDATE quotas SET nb_places = nb_places + ? WHERE niveau_etudes = ? AND filiere = ?",
-            (nb_places, dest_niveau, dest_filiere),
-        )
-        conn.commit()
 
-        return {
-            "success": True,
-            "source_nouveau": quota_source - nb_places,
-            "dest_nouveau":   quota_dest   + nb_places,
-        }
-    except Exception as e:
-        conn.rollback()
+def transfer_quotas(legs) -> dict:
+    """Applique un lot de transferts `(source, destination, nb_places)`
+    (clés (niveau, filière)), dans l'ordre, tout ou rien.
+
+    Retourne {"success": True, "quotas": {clé: nouveau quota}} ou
+    {"success": False, "error": message}.
+    """
+    legs = [(tuple(source), tuple(dest), nb_places) for source, dest, nb_places in legs]
+    try:
+        for leg in legs:
+            _check_leg(*leg)
+        return _apply_transfers(legs)
+    except Exception as e:  # _TransferRejected compris : la transaction est annulée
         return {"success": False, "error": str(e)}
-    finally:
-        conn.close()
+
+
+@_retry_on_busy
+def _apply_transfers(legs) -> dict:
+    if not legs:
+        return {"success": True, "quotas": {}}
+    new_quotas = {}
+    with transaction() as conn:
+        for source, dest, nb_places in legs:
+            new_quotas[source] = _debit(conn, source, nb_places)
+            new_quotas[dest] = _credit(conn, dest, nb_places)
+        version = _bump_data_version(conn)
+        _journal_transfers(conn, legs)
+
+    def apply(ledger):
+        for source, dest, nb_places in legs:
+            ledger.apply_transfer(source, dest, nb_places)
+
+    _sync_ledger(version, apply)
+    return {"success": True, "quotas": new_quotas}
+
+
+def _read_pending_moyennes(conn: sqlite3.Connection) -> dict:
+    """Moyennes des candidats encore en lice (en attente, suppléants) par
+    (niveau, filière), de la meilleure à la moins bonne (None en dernier)."""
+    pending = {}
+    for r in conn.execute(
+        """SELECT niveau_etudes, filiere, moyenne_num FROM candidatures
+           WHERE avis IN ('En attente', 'Suppléant')
+           ORDER BY niveau_etudes, filiere, moyenne_num DESC"""
+    ):
+        pending.setdefault((r["niveau_etudes"], r["filiere"]), []).append(r["moyenne_num"])
+    return pending
+
+
+def propose_reallocation(same_niveau: bool = True, cap: int | None = None) -> quota_optimizer.Plan:
+    """Transferts qui pourvoient le plus de places (cf. quota_optimizer) ;
+    à appliquer en un lot avec transfer_quotas(plan.transfers)."""
+    with read_snapshot() as conn:
+        quotas, favorables = _read_quota_counts(conn)
+        pending = _read_pending_moyennes(conn)
+    return quota_optimizer.plan_transfers(quotas, favorables, pending, same_niveau=same_niveau, cap=cap)
 
 
 def is_db_loaded() -> bool:
     if not Path(DB_PATH).exists():
         return False
-    conn = get_connection()
-    try:
-        count = conn.execute("SELECT COUNT(*) FROM candidatures").fetchone()[0]
-    except sqlite3.OperationalError:
-        conn.close()
-        return False
-    conn.close()
+    with connection() as conn:
+        try:
+            count = conn.execute("SELECT COUNT(*) FROM candidatures").fetchone()[0]
+        except sqlite3.OperationalError:
+            return False
     return count > 0
 
 
 def reset_db():
-    if Path(DB_PATH).exists():
-        Path(DB_PATH).unlink()
\ No newline at end of file
+    global _ledger, _prefix_index
+    _pool.close_all()
+    with _ledger_lock:
+        _ledger = None
+    with _prefix_lock:
+        _prefix_index = None
+    # En WAL, les fichiers -wal / -shm accompagnent la base : on les supprime aussi.
+    for suffix in ("", "-wal", "-shm"):
+        Path(DB_PATH + suffix).unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# ✅ OPTIMISATION : instantanés de session
+# reset_db() supprimait la base : revenir en arrière imposait de recharger le
+# classeur et de refaire toutes les décisions. take_snapshot copie la base
+# par l'API de sauvegarde en ligne de SQLite (copie cohérente, même pendant
+# des écritures) dans un fichier gzip de snapshots/. restore_snapshot prépare
+# la copie décompressée (migrations, versions, journal de la base remplacée
+# reporté à la suite du sien) puis la recopie dans la base ouverte en une
+# seule étape de sauvegarde : les autres connexions voient l'ancien état ou
+# le nouveau, jamais un mélange.
+# ---------------------------------------------------------------------------
+
+SNAPSHOT_DIR = "snapshots"
+SNAPSHOT_SUFFIX = ".db.gz"
+SNAPSHOT_COMPRESSLEVEL = 1  # 100k candidatures : 0,8 s au lieu de 3,5 s au niveau 6, pour 10 % de plus
+SNAPSHOT_CHUNK = 1 << 20
+
+
+def _snapshot_path(snapshot_id: str, suffix: str = SNAPSHOT_SUFFIX) -> Path:
+    if not snapshot_id or Path(snapshot_id).name != snapshot_id:
+        raise ValueError(f"Instantané invalide : {snapshot_id!r}.")
+    return Path(SNAPSHOT_DIR) / f"{snapshot_id}{suffix}"
+
+
+def _local_time(ts: str) -> str:
+    return datetime.fromisoformat(ts.replace("Z", "+00:00")).astimezone().strftime("%d/%m/%Y %H:%M:%S")
+
+
+def take_snapshot(name: str, keep: int | None = None) -> dict:
+    """Instantané nommé de la base ; avec `keep`, seuls les `keep` plus
+    récents de ce nom sont conservés. Retourne {"success": True, "snapshot":
+    description (cf. list_snapshots)} ou {"success": False, "error": message}."""
+    name = filiere_resolver.clean_name(name)
+    if not name:
+        return {"success": False, "error": "Donnez un nom à l'instantané."}
+    try:
+        snapshot = _take_snapshot(name)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    if keep is not None:
+        for old in [s for s in list_snapshots() if s["nom"] == name][keep:]:
+            delete_snapshot(old["id"])
+    return {"success": True, "snapshot": snapshot}
+
+
+def _take_snapshot(name: str) -> dict:
+    directory = Path(SNAPSHOT_DIR)
+    directory.mkdir(exist_ok=True)
+    created = datetime.now(timezone.utc)
+    snapshot_id = f"{created:%Y%m%d-%H%M%S-%f}-{'-'.join(fold(name).split())[:40]}"
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        copy_path = Path(tmp) / "copie.db"
+        copy = sqlite3.connect(copy_path)
+        try:
+            with connection() as conn:
+                conn.backup(copy)
+            total, favorables = copy.execute(
+                "SELECT COUNT(*), COALESCE(SUM(avis = 'Favorable'), 0) FROM candidatures"
+            ).fetchone()
+        finally:
+            copy.close()
+        packed = Path(tmp) / "copie.db.gz"
+        with open(copy_path, "rb") as src, gzip.open(packed, "wb", compresslevel=SNAPSHOT_COMPRESSLEVEL) as dst:
+            shutil.copyfileobj(src, dst, SNAPSHOT_CHUNK)
+        meta = {
+            "id": snapshot_id, "nom": name, "cree": _journal_time(created),
+            "candidatures": total, "favorables": favorables, "taille": packed.stat().st_size,
+        }
+        sidecar = Path(tmp) / "meta.json"
+        sidecar.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(packed, _snapshot_path(snapshot_id))
+        os.replace(sidecar, _snapshot_path(snapshot_id, ".json"))
+    return {**meta, "heure": _local_time(meta["cree"])}
+
+
+def list_snapshots() -> list[dict]:
+    """Instantanés disponibles, du plus récent au plus ancien : id, nom, cree
+    (UTC, format du journal), heure (locale), candidatures, favorables, taille."""
+    snapshots = []
+    for sidecar in Path(SNAPSHOT_DIR).glob("*.json"):
+        meta = json.loads(sidecar.read_text(encoding="utf-8"))
+        if _snapshot_path(meta["id"]).exists():
+            snapshots.append({**meta, "heure": _local_time(meta["cree"])})
+    return sorted(snapshots, key=lambda m: m["cree"], reverse=True)
+
+
+def delete_snapshot(snapshot_id: str):
+    for suffix in (SNAPSHOT_SUFFIX, ".json"):
+        _snapshot_path(snapshot_id, suffix).unlink(missing_ok=True)
+
+
+def restore_snapshot(snapshot_id: str) -> dict:
+    """Remplace le contenu de la base par l'instantané. Retourne
+    {"success": True, "snapshot": description} ou {"success": False, "error": message}."""
+    try:
+        return {"success": True, "snapshot": _restore_snapshot(snapshot_id)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+_JOURNAL_COLUMNS = ("horodatage", "lot", "type", "id_demande", "niveau_etudes", "filiere", "avant", "apres",
+                    "dest_niveau", "dest_filiere", "nb_places")
+
+
+def _carry_journal(copy: sqlite3.Connection) -> int:
+    """Ajoute au journal de la copie les événements de la base remplacée
+    postérieurs à l'instantané : le journal garde tout l'historique.
+    Retourne l'id du dernier événement de l'instantané."""
+    last = copy.execute("SELECT id, horodatage, type FROM journal ORDER BY id DESC LIMIT 1").fetchone()
+    last_id = last["id"] if last else 0
+    columns = ", ".join(_JOURNAL_COLUMNS)
+    with connection() as conn:
+        # Journal issu de l'instantané (mêmes premiers événements) : ids
+        # conservés. Sinon (base réinitialisée depuis), tout son journal, à la suite.
+        same = last is None or conn.execute(
+            "SELECT 1 FROM journal WHERE id = ? AND horodatage = ? AND type = ?", tuple(last)
+        ).fetchone()
+        rows = conn.execute(
+            f"SELECT id, {columns} FROM journal WHERE id > ? ORDER BY id", (last_id if same else 0,)
+        ).fetchall()
+    if same:
+        columns, rows = f"id, {columns}", [tuple(r) for r in rows]
+    else:
+        rows = [tuple(r)[1:] for r in rows]
+    if rows:
+        copy.executemany(f"INSERT INTO journal ({columns}) VALUES ({', '.join('?' * len(rows[0]))})", rows)
+    return last_id
+
+
+@_retry_on_busy
+def _restore_snapshot(snapshot_id: str) -> dict:
+    global _ledger, _prefix_index
+    path = _snapshot_path(snapshot_id)
+    if not path.exists():
+        raise ValueError(f"Instantané introuvable : {snapshot_id}.")
+    meta = json.loads(_snapshot_path(snapshot_id, ".json").read_text(encoding="utf-8"))
+    init_db()
+    with connection() as conn:
+        live = {"data_version": _read_data_version(conn), "roster_version": _read_roster_version(conn)}
+
+    with tempfile.TemporaryDirectory(dir=Path(DB_PATH).resolve().parent) as tmp:
+        copy_path = Path(tmp) / "restauration.db"
+        with gzip.open(path, "rb") as src, open(copy_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, SNAPSHOT_CHUNK)
+        copy = sqlite3.connect(copy_path, isolation_level=None)
+        copy.row_factory = sqlite3.Row
+        copy.create_function("cnbau_fold", 1, fold, deterministic=True)
+        try:
+            if copy.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise ValueError(f"Instantané endommagé : {snapshot_id}.")
+            copy.execute("BEGIN IMMEDIATE")
+            _migrate_schema(copy)
+            # Versions au-delà de celles de la base remplacée, départ horodaté
+            # comme _seed_meta_counter : le cache de app.py ne sert jamais
+            # une version déjà vue pour un autre contenu.
+            for key, value in live.items():
+                copy.execute(
+                    """UPDATE app_meta SET value = MAX(value, ? + 1, CAST(strftime('%s', 'now') AS INTEGER) * 1000)
+                       WHERE key = ?""",
+                    (value, key),
+                )
+            snapshot_last = _carry_journal(copy)
+            copy.execute(_JOURNAL_SQL, (_journal_time(datetime.now(timezone.utc)), JOURNAL_RESTAURATION,
+                                        None, None, None, meta["cree"], meta["nom"], None, None, snapshot_last))
+            copy.execute("COMMIT")
+            with connection() as conn:
+                copy.backup(conn)
+        finally:
+            copy.close()
+
+    with _ledger_lock:
+        _ledger = None
+    with _prefix_lock:
+        _prefix_index = None
+    return {**meta, "heure": _local_time(meta["cree"])}
@@ -0,0 +1,128 @@
+"""Construction rapide des tableaux de candidats des exports Word.
+
+python-docx crée un objet par ligne et par cellule (`add_row`, `cell.text`,
+`add_run`, fusion verticale via `merge`) : sur quelques centaines de
+candidats, la génération prend plusieurs secondes. Ici tout le `w:tbl` est
+écrit d'un bloc en XML (propriétés de run partagées, fusions calculées à
+l'avance) puis analysé une seule fois par lxml.
+"""
+
+from itertools import groupby
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Length
+from docx.table import Table
+
+COL_WIDTHS = (567, 4254, 4223, 2127)  # en twips
+HEADERS = ("N° ", "FILIERE", "NOM ET PRENOMS", "OBSERVATIONS")
+HEADER_FILL = "BFBFBF"
+NIVEAU_FILL = "E7E6E6"
+
+FONT = "Trebuchet MS"
+FONT_SIZE = 11
+
+
+def _rpr(bold: bool = False) -> str:
+    b = "<w:b/>" if bold else '<w:b w:val="0"/>'
+    return (
+        f'<w:rPr><w:rFonts w:ascii="{FONT}" w:hAnsi="{FONT}"/>{b}'
+        f'<w:sz w:val="{FONT_SIZE * 2}"/><w:u w:val="none"/></w:rPr>'
+    )
+
+
+RPR = _rpr()
+RPR_BOLD = _rpr(bold=True)
+JC_CENTER = '<w:pPr><w:jc w:val="center"/></w:pPr>'
+
+
+def _text_xml(text: str) -> str:
+    """Contenu d'un run, avec les mêmes conversions que `run.text` de python-docx."""
+    parts = []
+    for i, line in enumerate(text.split("\n")):
+        if i:
+            parts.append("<w:br/>")
+        for j, chunk in enumerate(line.split("\t")):
+            if j:
+                parts.append("<w:tab/>")
+            if chunk:
+                space = ' xml:space="preserve"' if chunk != chunk.strip() else ""
+                parts.append(f"<w:t{space}>{escape(chunk)}</w:t>")
+    return "".join(parts)
+
+
+def _cell_xml(width: int, text: str | None, *, center=False, rpr=RPR,
+              extra_pr: str = "", extra_paragraphs: int = 0) -> str:
+    pr = f'<w:tcPr><w:tcW w:type="dxa" w:w="{width}"/>{extra_pr}</w:tcPr>'
+    if text is None:
+        body = "<w:p/>"
+    else:
+        body = f'<w:p>{JC_CENTER if center else ""}<w:r>{rpr}{_text_xml(text)}</w:r></w:p>'
+    return f"<w:tc>{pr}{body}{'<w:p/>' * extra_paragraphs}</w:tc>"
+
+
+def build_candidates_table(doc, candidates_list: list[dict]) -> Table:
+    """Ajoute au document le tableau N° / Filière / Nom / Observations.
+
+    `candidates_list` doit être trié par niveau puis filière : une ligne
+    grisée par niveau, la cellule filière fusionnée verticalement sur ses
+    candidats, numérotation continue sur tout le tableau.
+    """
+    # En-tête : largeur par défaut de python-docx (largeur utile de la
+    # dernière section / nb colonnes)
+    section = doc.sections[-1]
+    block_width = Length(section.page_width - section.left_margin - section.right_margin)
+    header_width = block_width.twips // len(COL_WIDTHS)
+    header_pr = f'<w:shd w:val="clear" w:color="auto" w:fill="{HEADER_FILL}"/><w:vAlign w:val="center"/>'
+    niveau_pr = (f'<w:gridSpan w:val="{len(COL_WIDTHS)}"/>'
+                 f'<w:shd w:val="clear" w:color="auto" w:fill="{NIVEAU_FILL}"/>')
+    w_num, w_fil, w_name, w_obs = COL_WIDTHS
+
+    xml = [
+        f"<w:tbl {nsdecls('w')}>",
+        '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0"'
+        ' w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>',
+        "<w:tblGrid>", *(f'<w:gridCol w:w="{w}"/>' for w in COL_WIDTHS), "</w:tblGrid>",
+        "<w:tr>", *(_cell_xml(header_width, h, center=True, extra_pr=header_pr) for h in HEADERS), "</w:tr>",
+    ]
+
+    num = 1
+    for niveau, niveau_group in groupby(candidates_list, key=lambda c: c["niveau_etudes"]):
+        xml.append(f"<w:tr>{_cell_xml(w_num, niveau.upper(), center=True, rpr=RPR_BOLD, extra_pr=niveau_pr)}</w:tr>")
+
+        for filiere, fil_group in groupby(niveau_group, key=lambda c: c["filiere"]):
+            fil_group = list(fil_group)
+            merged = len(fil_group) > 1
+            for i_in_fil, c in enumerate(fil_group):
+                if i_in_fil == 0:
+                    # Comme `merge` de python-docx : la cellule de tête reçoit
+                    # un paragraphe vide par ligne fusionnée.
+                    fil_cell = _cell_xml(
+                        w_fil, filiere,
+                        extra_pr='<w:vMerge w:val="restart"/>' if merged else "",
+                        extra_paragraphs=len(fil_group) - 1,
+                    )
+                else:
+                    fil_cell = _cell_xml(w_fil, None, extra_pr="<w:vMerge/>")
+                xml.append(
+                    "<w:tr>"
+                    + _cell_xml(w_num, str(num), center=True)
+                    + fil_cell
+                    + _cell_xml(w_name, c["name"])
+                    + _cell_xml(w_obs, c["observation"] or "")
+                    + "</w:tr>"
+                )
+                num += 1
+
+    xml.append("</w:tbl>")
+    tbl = parse_xml("".join(xml))
+    # Comme `add_table` : le tableau se place avant le w:sectPr final du corps
+    body = doc.element.body
+    sect_pr = body.find(qn("w:sectPr"))
+    if sect_pr is not None:
+        sect_pr.addprevious(tbl)
+    else:
+        body.append(tbl)
+    return Table(tbl, doc)
@@ -0,0 +1,235 @@
+"""Détection des doublons de candidatures.
+
+1. Blocage : seules les paires partageant une clé sont comparées — un mot
+   du nom plié (hors mots trop fréquents), la date de naissance ou le
+   numéro d'ID russe. Un ID à un chiffre près compte ensuite comme indice
+   (jamais un ID absent).
+2. Score : similarité des trigrammes du nom, calculée pour toutes les
+   paires à la fois sur des empreintes binaires (numpy), puis confirmée
+   exactement sur les seules paires retenues.
+3. Regroupement : les paires « même personne » forment des groupes
+   (union-find), scindés par filière : copies identiques d'une part, une
+   candidature par filière d'autre part. Un même ID porté par des noms
+   sans rapport donne un groupe « personnes différentes ».
+"""
+
+from collections import defaultdict
+from typing import NamedTuple
+
+import numpy as np
+
+from text_norm import birth_date_key, fold, id_russe_key, similarity, token_trigrams
+
+IDENTICAL = "identical"
+SAME_PERSON_DIFF_FILIERE = "same_person_diff_filiere"
+DIFFERENT_PEOPLE = "different_people"
+CATEGORIES = (IDENTICAL, SAME_PERSON_DIFF_FILIERE, DIFFERENT_PEOPLE)
+
+MAX_BLOCK_SIZE = 200      # au-delà, la clé est trop commune pour discriminer
+DIFFERENT_NAMES = 0.3     # même ID, noms sous ce seuil : personnes différentes
+SAME_PERSON = 0.75        # seuil avec un indice concordant (ID, date de naissance)
+MIN_SIMILARITY = 0.5      # … ou noms inclus l'un dans l'autre (prénom omis)
+SAME_NAME = 0.85          # seuil sur le nom seul (dates absentes)
+FINGERPRINT_BITS = 512
+ESTIMATE_MARGIN = 0.05    # tolérance des empreintes (collisions de hachage)
+PAIR_CHUNK = 500_000
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+class Member(NamedTuple):
+    cluster: int
+    id_demande: str
+    categorie: str
+    score: float
+    garde: bool  # False : candidature en trop, retirée si la politique l'exige
+
+
+def _codes(keys: list[str]) -> np.ndarray:
+    """Code entier par clé distincte, -1 pour une clé vide."""
+    table = {}
+    return np.array([table.setdefault(k, len(table)) if k else -1 for k in keys], dtype=np.int64)
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Deux numéros d'ID présents, égaux à un chiffre près. Un ID absent
+    n'est pas un indice."""
+    if not a or not b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) <= 1
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def _names_match(a: str, b: str, sim: float) -> bool:
+    """Noms pliés compatibles quand un autre indice (date, ID) concorde :
+    proches, ou les mots de l'un tous présents dans l'autre
+    (« koffi jean » / « koffi jean marie »)."""
+    if sim >= SAME_PERSON:
+        return True
+    wa, wb = set(a.split()), set(b.split())
+    return sim >= MIN_SIMILARITY and (wa <= wb or wb <= wa)
+
+
+def _candidate_pairs(blocks, n: int) -> np.ndarray:
+    """Paires (i < j) distinctes partageant au moins un bloc, encodées i * n + j."""
+    triu = {}
+    chunks = []
+    for members in blocks:
+        k = len(members)
+        if k < 2 or k > MAX_BLOCK_SIZE:
+            continue
+        if k not in triu:
+            triu[k] = np.triu_indices(k, 1)
+        left, right = triu[k]
+        idx = np.fromiter(members, dtype=np.int64, count=k)
+        chunks.append(idx[left] * n + idx[right])
+    if not chunks:
+        return np.empty(0, dtype=np.int64)
+    pairs = np.concatenate(chunks)
+    pairs.sort()
+    return pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+
+
+def _fingerprints(grams: list[set[str]]) -> np.ndarray:
+    """Empreinte binaire (FINGERPRINT_BITS bits) des trigrammes de chaque nom :
+    bit = rang du trigramme dans le vocabulaire, modulo FINGERPRINT_BITS."""
+    vocab, rows, bits = {}, [], []
+    for i, g in enumerate(grams):
+        rows.extend([i] * len(g))
+        bits.extend(vocab.setdefault(t, len(vocab)) % FINGERPRINT_BITS for t in g)
+    fp = np.zeros((len(grams), FINGERPRINT_BITS // 8), dtype=np.uint8)
+    bits = np.array(bits, dtype=np.int64)
+    np.bitwise_or.at(fp, (np.array(rows, dtype=np.int64), bits >> 3),
+                     (1 << (bits & 7)).astype(np.uint8))
+    return fp
+
+
+def _estimated_similarity(fp: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Indice de Jaccard approché de chaque paire, par blocs de PAIR_CHUNK."""
+    sizes = _POPCOUNT[fp].sum(axis=1, dtype=np.int32)
+    out = np.empty(len(left), dtype=np.float32)
+    for start in range(0, len(left), PAIR_CHUNK):
+        a, b = left[start:start + PAIR_CHUNK], right[start:start + PAIR_CHUNK]
+        inter = _POPCOUNT[fp[a] & fp[b]].sum(axis=1, dtype=np.int32)
+        union = sizes[a] + sizes[b] - inter
+        out[start:start + PAIR_CHUNK] = np.divide(inter, union, out=np.zeros(len(a), np.float32),
+                                                  where=union > 0)
+    return out
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self) -> list[list]:
+        out = defaultdict(list)
+        for x in self.parent:
+            out[self.find(x)].append(x)
+        return [sorted(g) for g in out.values() if len(g) > 1]
+
+
+def find_duplicates(rows) -> list[Member]:
+    """`rows` : id_demande, id_russe, name, date_lieu_naissance, filiere,
+    niveau_etudes. Le premier de chaque groupe (ordre de `rows`) est gardé."""
+    rows = list(rows)
+    n = len(rows)
+    if n < 2:
+        return []
+
+    names = [fold(r["name"]) for r in rows]
+    grams = [token_trigrams(nm) for nm in names]
+    id_keys = [id_russe_key(r["id_russe"]) for r in rows]
+    births = [birth_date_key(r["date_lieu_naissance"]) for r in rows]
+
+    blocks = defaultdict(list)
+    for i in range(n):
+        for word in set(names[i].split()):
+            if len(word) >= 3:
+                blocks["n", word].append(i)
+        if births[i]:
+            blocks["d", births[i]].append(i)
+        if id_keys[i]:
+            blocks["i", id_keys[i]].append(i)
+    pairs = _candidate_pairs(blocks.values(), n)
+    del blocks
+
+    left, right = pairs // n, pairs % n
+    id_code = _codes(id_keys)
+    same_id = (id_code[left] == id_code[right]) & (id_code[left] >= 0)
+    estimate = _estimated_similarity(_fingerprints(grams), left, right)
+    keep = same_id | (estimate >= MIN_SIMILARITY - ESTIMATE_MARGIN)
+
+    same_person = _UnionFind()
+    scores = defaultdict(float)
+    conflicts = []  # même ID, noms sans rapport
+    for i, j, shared_id in zip(left[keep].tolist(), right[keep].tolist(), same_id[keep].tolist()):
+        sim = similarity(grams[i], grams[j])
+        close_id = _within_one_edit(id_keys[i], id_keys[j])
+        if shared_id:
+            matched = sim >= DIFFERENT_NAMES
+        elif births[i] and births[j] and births[i] != births[j]:
+            # Dates contradictoires : il faut un ID concordant en plus du nom.
+            matched = sim >= SAME_NAME and close_id
+        elif births[i] and births[i] == births[j] or close_id:
+            matched = _names_match(names[i], names[j], sim)
+        else:
+            matched = sim >= SAME_NAME
+        if matched:
+            same_person.union(i, j)
+            scores[i] = max(scores[i], sim)
+            scores[j] = max(scores[j], sim)
+        elif shared_id:
+            conflicts.append((i, j, sim))
+
+    members = []
+    cluster = 0
+    for group in same_person.groups():
+        # Groupe scindé par (filière, niveau) : les copies d'une même
+        # candidature sont « identiques » entre elles, et seul le premier de
+        # chaque filière entre dans le groupe « même personne, autre filière ».
+        by_place = defaultdict(list)
+        for i in group:
+            by_place[rows[i]["filiere"], rows[i]["niveau_etudes"]].append(i)
+        subgroups = [(IDENTICAL, copies) for copies in by_place.values() if len(copies) > 1]
+        if len(by_place) > 1:
+            subgroups.append((SAME_PERSON_DIFF_FILIERE, sorted(copies[0] for copies in by_place.values())))
+        for category, indices in subgroups:
+            cluster += 1
+            members.extend(
+                Member(cluster, rows[i]["id_demande"], category, round(scores[i], 3), k == 0)
+                for k, i in enumerate(indices)
+            )
+
+    # Personnes différentes sous un même ID : une entrée par personne (le
+    # premier de son groupe), score = similarité avec la personne gardée.
+    people = defaultdict(set)
+    for i, j, _ in conflicts:
+        key = id_keys[i]
+        people[key].update((same_person.find(i), same_person.find(j)))
+    for key in sorted(people, key=lambda k: min(people[k])):
+        cluster += 1
+        heads = sorted(people[key])
+        members.extend(
+            Member(cluster, rows[i]["id_demande"], DIFFERENT_PEOPLE,
+                   round(similarity(grams[heads[0]], grams[i]), 3) if k else 1.0, k == 0)
+            for k, i in enumerate(heads)
+        )
+    return members
@@ -0,0 +1,305 @@
+"""Exécution en arrière-plan des exports de l'onglet Export.
+
+Chaque génération est soumise à un pool de threads et écrit le document
+dans un tampon mémoire propre au job (plus de fichier partagé entre deux
+opérateurs qui exportent en même temps) ; la session Streamlit se contente
+d'interroger l'état du job. « Tout générer » produit les quatre documents à
+partir d'une seule lecture de la base (database.fetch_export_data).
+
+L'archive groupée (BUNDLE) rend les quatre documents en parallèle dans un
+pool de processus — la génération est du Python pur, liée au GIL — et les
+écrit au fil de l'eau dans un ZIP en mémoire, avec un manifeste (effectifs,
+tailles, sha256). Durée : celle du document le plus long, non la somme.
+
+Les jobs sont aussi mis en cache par (type d'export, version des données) :
+tant qu'aucune écriture n'a modifié la base, un nouveau clic réutilise le
+document déjà généré (ou en cours de génération) au lieu de le reconstruire.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import database as db
+
+MAX_WORKERS = 2
+MAX_FINISHED_JOBS = 32
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# kind → (fonction d'export, nom du fichier téléchargé, type MIME)
+EXPORTS = {
+    "word":         (db.export_to_docx,          "export_decisions_cnbau.docx",        DOCX_MIME),
+    "word_all":     (db.export_all_avis_to_docx, "export_toutes_decisions_cnbau.docx", DOCX_MIME),
+    "excel_avis":   (db.export_avis_to_xlsx,     "export_decisions_cnbau.xlsx",        XLSX_MIME),
+    "excel_quotas": (db.export_quotas_to_xlsx,   "export_quotas_cnbau.xlsx",           XLSX_MIME),
+}
+
+# Archive groupée des quatre documents
+BUNDLE = "bundle"
+BUNDLE_FILE = ("exports_cnbau.zip", "application/zip")
+
+# Processus de rendu de l'archive : un par document, dans la limite des CPU
+# disponibles. Avec un seul CPU le pool n'apporte que son surcoût.
+_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+BUNDLE_PROCESSES = min(len(EXPORTS), _CPUS)
+
+PENDING = "En file"
+RUNNING = "En cours"
+DONE    = "Terminé"
+FAILED  = "Échec"
+
+
+@dataclass
+class ExportJob:
+    id: str
+    kind: str
+    file_name: str
+    mime: str
+    status: str = PENDING
+    progress: float = 0.0
+    data: bytes | None = None
+    error: str = ""
+    data_version: int = 0
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="export")
+_processes: ProcessPoolExecutor | None = None
+_processes_lock = threading.Lock()
+_jobs: dict[str, ExportJob] = {}
+_jobs_lock = threading.Lock()
+
+# (kind, data_version) → job : au plus une génération par état de la base
+_cache: dict[tuple[str, int], ExportJob] = {}
+
+
+def _finish(job: ExportJob, data_version: int):
+    """Clôt le job ; `data_version` est la version effectivement lue."""
+    job.finished_at = time.time()
+    if job.status != FAILED and data_version == job.data_version:
+        return
+    with _jobs_lock:
+        if _cache.get((job.kind, job.data_version)) is job:
+            del _cache[(job.kind, job.data_version)]
+        # Écriture entre le clic et la lecture : le document correspond à
+        # la version lue, c'est sous celle-ci qu'il peut être resservi.
+        if job.status == DONE:
+            job.data_version = data_version
+            _cache.setdefault((job.kind, data_version), job)
+
+
+def render_document(kind: str, data: db.ExportData) -> bytes:
+    """Contenu du document `kind` (exécutable dans un processus du pool)."""
+    buffer = io.BytesIO()
+    EXPORTS[kind][0](buffer, data)
+    return buffer.getvalue()
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    """Pool de processus créé à la première archive, puis réutilisé.
+    « spawn » : pas de fork d'un processus Streamlit multi-thread."""
+    global _processes
+    with _processes_lock:
+        if _processes is None:
+            _processes = ProcessPoolExecutor(
+                max_workers=BUNDLE_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _processes
+
+
+def _discard_process_pool():
+    global _processes
+    with _processes_lock:
+        if _processes is not None:
+            _processes.shutdown(wait=False, cancel_futures=True)
+        _processes = None
+
+
+def _render_in_processes(data: db.ExportData):
+    """(kind, contenu) de chaque document, dans l'ordre de fin de génération.
+    Rendu séquentiel sur une machine mono-CPU ou si le pool est indisponible."""
+    futures = None
+    if BUNDLE_PROCESSES > 1:
+        try:
+            pool = _process_pool()
+            futures = {pool.submit(render_document, kind, data): kind for kind in EXPORTS}
+        except (BrokenProcessPool, OSError, RuntimeError):
+            _discard_process_pool()
+    if futures is None:
+        for kind in EXPORTS:
+            yield kind, render_document(kind, data)
+        return
+    try:
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    except BrokenProcessPool:
+        _discard_process_pool()
+        raise
+
+
+def _manifest(data: db.ExportData, files: list[dict]) -> dict:
+    return {
+        "genere_le": datetime.now().isoformat(timespec="seconds"),
+        "version_donnees": data.version,
+        "effectifs": {avis: len(rows) for avis, rows in data.by_avis.items()},
+        "quotas": {
+            "filieres": len(data.quotas),
+            "places": sum(q["nb_places"] for q in data.quotas),
+        },
+        "fichiers": files,
+    }
+
+
+def _run_bundle(job: ExportJob):
+    job.status, job.progress = RUNNING, 0.05
+    data_version = job.data_version
+    try:
+        data = db.fetch_export_data()
+        data_version = data.version
+        job.progress = 0.1
+
+        # Chaque document entre dans l'archive dès que son rendu se termine :
+        # la compression du premier recouvre le rendu des suivants.
+        buffer = io.BytesIO()
+        files = {}
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+            for done, (kind, content) in enumerate(_render_in_processes(data), 1):
+                file_name = EXPORTS[kind][1]
+                zf.writestr(file_name, content)
+                files[kind] = {
+                    "fichier": file_name,
+                    "octets": len(content),
+                    "sha256": hashlib.sha256(content).hexdigest(),
+                }
+                job.progress = 0.1 + 0.8 * done / len(EXPORTS)
+            # Manifeste dans l'ordre de EXPORTS, quel que soit l'ordre de fin
+            files = [files[kind] for kind in EXPORTS]
+            zf.writestr("manifest.json", json.dumps(_manifest(data, files), ensure_ascii=False, indent=2))
+
+        job.data = buffer.getvalue()
+        job.status, job.progress = DONE, 1.0
+    except Exception as e:
+        job.status, job.error = FAILED, str(e)
+    finally:
+        _finish(job, data_version)
+
+
+def _run(jobs: list[ExportJob]):
+    """Une lecture de la base, puis chaque document des `jobs` à partir d'elle."""
+    for job in jobs:
+        job.status, job.progress = RUNNING, 0.1
+    try:
+        data = db.fetch_export_data()
+    except Exception as e:
+        for job in jobs:
+            job.status, job.error = FAILED, str(e)
+            _finish(job, job.data_version)
+        return
+
+    for job in jobs:
+        export = EXPORTS[job.kind][0]
+        job.progress = 0.3
+        try:
+            buffer = io.BytesIO()
+            export(buffer, data)
+            job.data = buffer.getvalue()
+            job.status, job.progress = DONE, 1.0
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+        finally:
+            _finish(job, data.version)
+
+
+def _evict_finished():
+    finished = sorted((j for j in _jobs.values() if j.finished), key=lambda j: j.finished_at)
+    for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job.id]
+
+
+def _evict_stale(data_version: int):
+    """Retire du cache les documents générés pour une version antérieure de la base."""
+    for key in [k for k in _cache if k[1] != data_version]:
+        del _cache[key]
+
+
+def _cached_or_new(kind: str, data_version: int) -> tuple[ExportJob, bool]:
+    """Job en cache pour (kind, version), ou nouveau job enregistré. Sous _jobs_lock."""
+    cached = _cache.get((kind, data_version))
+    if cached is not None:
+        _jobs[cached.id] = cached  # a pu être évincé de _jobs entre-temps
+        return cached, False
+    file_name, mime = BUNDLE_FILE if kind == BUNDLE else EXPORTS[kind][1:]
+    job = ExportJob(id=uuid.uuid4().hex, kind=kind, file_name=file_name,
+                    mime=mime, data_version=data_version)
+    _jobs[job.id] = job
+    _cache[(kind, data_version)] = job
+    return job, True
+
+
+def submit(kind: str) -> str:
+    """Lance l'export `kind` en arrière-plan et retourne l'identifiant du job.
+
+    Si le même export a déjà été généré (ou est en cours) pour l'état actuel
+    de la base, le job existant est retourné sans nouvelle génération.
+    """
+    if kind == BUNDLE:
+        return submit_bundle()
+    return submit_all([kind])[kind]
+
+
+def submit_bundle() -> str:
+    """Lance la génération de l'archive ZIP des quatre documents."""
+    data_version = db.get_data_version()
+    with _jobs_lock:
+        _evict_stale(data_version)
+        _evict_finished()
+        job, is_new = _cached_or_new(BUNDLE, data_version)
+    if is_new:
+        _executor.submit(_run_bundle, job)
+    return job.id
+
+
+def submit_all(kinds=None) -> dict[str, str]:
+    """Lance plusieurs exports (tous par défaut) sur une seule lecture de la
+    base. Retourne {kind: identifiant du job} ; les exports déjà en cache
+    pour la version courante ne sont pas régénérés."""
+    kinds = list(kinds or EXPORTS)
+    data_version = db.get_data_version()
+    with _jobs_lock:
+        _evict_stale(data_version)
+        _evict_finished()
+        jobs = {kind: _cached_or_new(kind, data_version) for kind in kinds}
+    to_run = [job for job, is_new in jobs.values() if is_new]
+    if to_run:
+        _executor.submit(_run, to_run)
+    return {kind: job.id for kind, (job, _) in jobs.items()}
+
+
+def clear_cache():
+    """Oublie tous les documents en cache (réinitialisation de la base)."""
+    with _jobs_lock:
+        _cache.clear()
+
+
+def get(job_id: str | None) -> ExportJob | None:
+    if not job_id:
+        return None
+    with _jobs_lock:
+        return _jobs.get(job_id)
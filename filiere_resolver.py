@@ -0,0 +1,118 @@
+"""Rapprochement des noms de filières avec leurs noms de référence.
+
+Les tableaux de candidatures et le fichier des quotas écrivent souvent
+différemment la même filière : casse, accents, pluriels, fautes de frappe
+(« tradionnels », « Electrotecnique »). Chaque nom est ramené à une clé
+(`filiere_key` : pliée, sans mots vides ni marques du pluriel) ; à défaut
+de clé identique, la référence la plus proche en distance d'édition est
+retenue si elle est seule à ce niveau de proximité.
+"""
+
+from collections import defaultdict
+from functools import lru_cache
+from typing import NamedTuple
+
+from text_norm import fold
+
+STOP_WORDS = frozenset({"a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les", "par", "pour"})
+MAX_EDIT_RATIO = 0.1  # distance d'édition tolérée, rapportée à la longueur de la clé
+RESOLVE_CACHE_SIZE = 1024
+
+EXACT = "exact"
+MANUAL = "manuel"
+NORMALIZED = "normalise"
+APPROX = "approx"
+UNKNOWN = "inconnu"
+
+
+class Resolution(NamedTuple):
+    filiere: str
+    methode: str
+    distance: int = 0
+
+
+def clean_name(name) -> str:
+    return " ".join(str(name or "").split())
+
+
+def _singular(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token[-1] in "sx" else token
+
+
+def filiere_key(name) -> str:
+    """« Chimie et pédologie agricoles » → « chimie pedologie agricole »."""
+    return " ".join(_singular(t) for t in fold(name).split() if t not in STOP_WORDS)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distance de Levenshtein, ou limit + 1 dès qu'elle dépasse limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _Index:
+    """Noms de référence d'un niveau (ou de tous), par nom nettoyé et par clé."""
+
+    def __init__(self, filieres):
+        self.exact = {}
+        self.by_key = {}
+        self.by_token = defaultdict(set)  # mot de clé → clés qui le contiennent
+        for filiere in filieres:
+            self.exact.setdefault(clean_name(filiere), filiere)
+            key = filiere_key(filiere)
+            self.by_key.setdefault(key, filiere)
+            for token in key.split():
+                self.by_token[token].add(key)
+
+    def match(self, name: str, key: str) -> Resolution | None:
+        if name in self.exact:
+            return Resolution(self.exact[name], EXACT)
+        if key in self.by_key:
+            return Resolution(self.by_key[key], NORMALIZED)
+        # Seules les clés partageant au moins un mot sont comparées.
+        limit = max(1, int(len(key) * MAX_EDIT_RATIO))
+        others = set().union(*(self.by_token.get(t, ()) for t in key.split()))
+        scored = sorted((edit_distance(key, other, limit), other) for other in others)
+        scored = [(d, other) for d, other in scored if d <= limit]
+        if scored and (len(scored) == 1 or scored[0][0] < scored[1][0]):
+            distance, other = scored[0]
+            return Resolution(self.by_key[other], APPROX, distance)
+        return None
+
+
+class FiliereResolver:
+    def __init__(self, references, aliases=(), across_niveaux: bool = True):
+        """`references` : couples (niveau, filière) de référence ;
+        `aliases` : triplets (niveau, nom rencontré, filière) saisis à la main ;
+        `across_niveaux` : à défaut de correspondance dans le niveau, chercher
+        parmi les filières de tous les niveaux."""
+        references = list(references)
+        by_niveau = defaultdict(list)
+        for niveau, filiere in references:
+            by_niveau[niveau].append(filiere)
+        self._niveaux = {niveau: _Index(filieres) for niveau, filieres in by_niveau.items()}
+        self._all = _Index(f for _, f in references) if across_niveaux else None
+        self._manual = {(niveau, clean_name(alias)): filiere for niveau, alias, filiere in aliases}
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._resolve)
+
+    def _resolve(self, raw, niveau: str = "") -> Resolution:
+        """Filière de référence de `raw` : d'abord parmi celles du niveau,
+        puis parmi toutes (si `across_niveaux`) ; le nom nettoyé (méthode
+        « inconnu ») sinon."""
+        name = clean_name(raw)
+        if (niveau, name) in self._manual:
+            return Resolution(self._manual[niveau, name], MANUAL)
+        key = filiere_key(name)
+        for index in (self._niveaux.get(niveau), self._all):
+            if index is not None and (found := index.match(name, key)):
+                return found
+        return Resolution(name, UNKNOWN)
@@ -0,0 +1,106 @@
+"""Index en mémoire pour la recherche à la frappe de l'onglet Examen individuel.
+
+Tableaux triés (bisect) sur le N°, les chiffres de l'ID russe et chaque mot
+du nom plié (text_norm.fold). Construit une fois par version de la liste
+des candidats ; chaque frappe est servie sans requête SQLite, et les
+réponses sont gardées dans un cache LRU.
+"""
+
+import heapq
+from bisect import bisect_left
+from functools import lru_cache
+from typing import NamedTuple
+
+from text_norm import fold, id_russe_key
+
+MAX_RESULTS = 20
+QUERY_CACHE_SIZE = 512
+
+
+class Entry(NamedTuple):
+    id_demande: str
+    numero: int | None
+    name: str
+    filiere: str
+    niveau_etudes: str
+
+
+class Matches(NamedTuple):
+    entries: tuple[Entry, ...]
+    exact: int  # nombre d'entrées en tête qui correspondent exactement
+
+
+class _SortedKeys:
+    """Clés triées et position de l'entrée correspondante ; recherche par préfixe."""
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.keys = [k for k, _ in pairs]
+        self.ids = [i for _, i in pairs]
+
+    def prefix(self, prefix: str) -> list[int]:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        return self.ids[lo:hi]
+
+
+class PrefixIndex:
+    def __init__(self, rows, roster_version: int):
+        """`rows` : id_demande, numero, id_russe, name, filiere, niveau_etudes."""
+        self.roster_version = roster_version
+        self.data_version = None  # dernière version des données validée (cf. database)
+
+        self._entries: list[Entry] = []
+        self._canon: list[str] = []  # mots du nom plié, triés : indépendant de l'ordre
+        self._id_keys: list[str] = []
+        numeros, id_russes, words = [], [], []
+        for i, r in enumerate(rows):
+            self._entries.append(Entry(r["id_demande"], r["numero"], r["name"] or "",
+                                       r["filiere"], r["niveau_etudes"]))
+            folded = fold(r["name"])
+            self._canon.append(" ".join(sorted(folded.split())))
+            if r["numero"] is not None:
+                numeros.append((str(r["numero"]), i))
+            key = id_russe_key(r["id_russe"])
+            self._id_keys.append(key)
+            if key:
+                id_russes.append((key, i))
+            words.extend((w, i) for w in set(folded.split()))
+
+        self._numero = _SortedKeys(numeros)
+        self._id_russe = _SortedKeys(id_russes)
+        self._words = _SortedKeys(words)
+        self.search = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._search)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _search(self, field: str, query: str) -> Matches:
+        """Au plus MAX_RESULTS entrées dont `field` commence par `query`,
+        correspondances exactes en tête."""
+        if field == "numero":
+            q = query.strip()
+            if q.isdigit():
+                q = str(int(q))  # « 012 » désigne le N° 12, stocké sans zéros en tête
+            ids = self._numero.prefix(q) if q.isdigit() else []
+            is_exact = lambda i: str(self._entries[i].numero) == q
+            order = lambda i: (self._entries[i].numero,)
+        elif field == "id_russe":
+            q = id_russe_key(query)
+            ids = self._id_russe.prefix(q) if q else []
+            is_exact = lambda i: self._id_keys[i] == q
+            order = lambda i: (len(self._id_keys[i]), self._entries[i].numero or 0)
+        elif field == "name":
+            words = fold(query).split()
+            if not words:
+                return Matches((), 0)
+            q = " ".join(sorted(words))
+            # Chaque mot tapé est le début d'un mot du nom, dans n'importe quel ordre
+            sets = sorted((set(self._words.prefix(w)) for w in words), key=len)
+            ids = set.intersection(*sets)
+            is_exact = lambda i: self._canon[i] == q
+            order = lambda i: (len(self._canon[i]), self._entries[i].numero or 0)
+        else:
+            return Matches((), 0)
+        best = heapq.nsmallest(MAX_RESULTS, ids, key=lambda i: (not is_exact(i), *order(i)))
+        return Matches(tuple(self._entries[i] for i in best), sum(1 for i in best if is_exact(i)))
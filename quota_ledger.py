@@ -0,0 +1,85 @@
+"""Registre en mémoire des quotas et des avis favorables par (niveau, filière).
+
+Chargé une fois depuis la base, puis tenu à jour incrémentalement à chaque
+changement d'avis ou transfert de quota : les questions « combien de places
+restantes ? » sont répondues en O(1), sans GROUP BY sur les candidatures.
+
+Le registre est partagé par les sessions : les copies et les mises à jour
+se font sous `lock`, qu'un appelant peut aussi tenir pour un lot de mises à
+jour (les lecteurs voient le lot entier ou rien).
+"""
+
+import threading
+
+Key = tuple[str, str]
+
+
+class QuotaLedger:
+    def __init__(self, quotas: dict[Key, int], favorables: dict[Key, int], version: int):
+        self._quotas = dict(quotas)
+        self._favorables = dict(favorables)
+        self.version = version
+        self.lock = threading.RLock()
+
+    # -- Lecture ------------------------------------------------------------
+
+    def places(self, key: Key) -> int | None:
+        """Quota de la filière, None si aucun quota n'est défini."""
+        return self._quotas.get(key)
+
+    def favorables(self, key: Key) -> int:
+        return self._favorables.get(key, 0)
+
+    def places_left(self, key: Key) -> int | None:
+        places = self._quotas.get(key)
+        if places is None:
+            return None
+        return places - self._favorables.get(key, 0)
+
+    def is_full(self, key: Key) -> bool:
+        left = self.places_left(key)
+        return left is not None and left <= 0
+
+    def quotas(self) -> dict[Key, int]:
+        """Copie des quotas (peut être parcourue pendant une mise à jour)."""
+        with self.lock:
+            return dict(self._quotas)
+
+    def favorables_counts(self) -> dict[Key, int]:
+        """Copie des comptes de favorables par (niveau, filière)."""
+        with self.lock:
+            return {k: n for k, n in self._favorables.items() if n}
+
+    def total_places(self) -> int:
+        with self.lock:
+            return sum(self._quotas.values())
+
+    # -- Mises à jour incrémentales -----------------------------------------
+
+    def apply_avis_change(self, key: Key, old_avis: str, new_avis: str):
+        if old_avis == new_avis:
+            return
+        with self.lock:
+            if old_avis == "Favorable":
+                self._favorables[key] = self._favorables.get(key, 0) - 1
+            if new_avis == "Favorable":
+                self._favorables[key] = self._favorables.get(key, 0) + 1
+
+    def apply_transfer(self, source: Key, dest: Key, nb_places: int):
+        with self.lock:
+            self._quotas[source] -= nb_places
+            self._quotas[dest] += nb_places
+
+    # -- Contrôle -----------------------------------------------------------
+
+    def diff(self, quotas: dict[Key, int], favorables: dict[Key, int]) -> dict[Key, tuple]:
+        """Écarts avec des comptes de référence (SQL) : {clé: ((places, fav) registre, (places, fav) SQL)}."""
+        ecarts = {}
+        with self.lock:
+            quotas_mine, favorables_mine = dict(self._quotas), dict(self._favorables)
+        for key in set(quotas_mine) | set(quotas) | set(favorables_mine) | set(favorables):
+            mine = (quotas_mine.get(key), favorables_mine.get(key, 0))
+            ref  = (quotas.get(key), favorables.get(key, 0))
+            if mine != ref:
+                ecarts[key] = (mine, ref)
+        return ecarts
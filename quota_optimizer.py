@@ -0,0 +1,116 @@
+"""Réallocation automatique des places de quota entre filières.
+
+Une filière a des places en trop quand son quota dépasse ses favorables
+plus ses candidats encore en lice (en attente, suppléants) : ces places ne
+seront jamais pourvues. Elles sont redistribuées aux filières dont la
+demande dépasse le quota, une place à la fois, à la filière dont le
+prochain candidat non servi a la meilleure moyenne. Le nombre de places
+pourvues est ainsi maximal (min(offre, demande) par groupe) et, à offre
+limitée, les places vont aux meilleurs dossiers. Les transferts sont
+ensuite regroupés en le moins d'étapes possible ; le total ne change pas.
+"""
+
+import heapq
+from collections import defaultdict
+from typing import NamedTuple
+
+Key = tuple[str, str]
+
+
+class Transfer(NamedTuple):
+    source: Key
+    dest: Key
+    nb_places: int
+
+
+class Plan(NamedTuple):
+    transfers: list[Transfer]
+    gained: dict[Key, int]   # places reçues par filière
+    given: dict[Key, int]    # places cédées par filière
+    unmet: int               # demande restée sans place après le plan
+
+    @property
+    def filled(self) -> int:
+        return sum(self.gained.values())
+
+
+def _pair(given: dict[Key, int], gained: dict[Key, int]) -> list[Transfer]:
+    """Apparie cessions et réceptions, les plus grosses d'abord."""
+    donors = sorted(given.items(), key=lambda kv: (-kv[1], kv[0]))
+    receivers = sorted(gained.items(), key=lambda kv: (-kv[1], kv[0]))
+    transfers = []
+    d = r = 0
+    left_d = donors[0][1] if donors else 0
+    left_r = receivers[0][1] if receivers else 0
+    while d < len(donors) and r < len(receivers):
+        n = min(left_d, left_r)
+        transfers.append(Transfer(donors[d][0], receivers[r][0], n))
+        left_d -= n
+        left_r -= n
+        if not left_d:
+            d += 1
+            left_d = donors[d][1] if d < len(donors) else 0
+        if not left_r:
+            r += 1
+            left_r = receivers[r][1] if r < len(receivers) else 0
+    return transfers
+
+
+def plan_transfers(quotas: dict[Key, int], favorables: dict[Key, int],
+                   pending: dict[Key, list], *, same_niveau: bool = True,
+                   cap: int | None = None) -> Plan:
+    """`pending` : moyennes des candidats encore en lice par filière, triées
+    de la meilleure à la moins bonne (None = sans moyenne, servi en dernier).
+    `cap` : quota maximal d'une filière après réallocation.
+    Seules les filières présentes dans `quotas` cèdent ou reçoivent."""
+    groups = defaultdict(list)
+    for key in quotas:
+        groups[key[0] if same_niveau else ""].append(key)
+
+    gained, given = defaultdict(int), defaultdict(int)
+    unmet = 0
+    for keys in groups.values():
+        supply = {}
+        heap = []  # (-moyenne du prochain candidat non servi, clé, rang, places encore utiles)
+        for key in keys:
+            places, fav, demand = quotas[key], favorables.get(key, 0), pending.get(key, [])
+            free = places - fav
+            if free > len(demand):
+                supply[key] = free - len(demand)
+                continue
+            need = len(demand) - max(free, 0)
+            if cap is not None:
+                need = min(need, max(cap - places, 0))
+            if need > 0:
+                rank = max(free, 0)
+                heapq.heappush(heap, (_priority(demand[rank]), key, rank, need))
+            unmet += len(demand) - max(free, 0)
+
+        available = sum(supply.values())
+        while available and heap:
+            _, key, rank, need = heapq.heappop(heap)
+            gained[key] += 1
+            available -= 1
+            unmet -= 1
+            if need > 1:
+                heapq.heappush(heap, (_priority(pending[key][rank + 1]), key, rank + 1, need - 1))
+
+        # Cessions : d'abord les filières aux plus gros surplus.
+        to_give = sum(gained[k] for k in keys)
+        for key, surplus in sorted(supply.items(), key=lambda kv: (-kv[1], kv[0])):
+            if not to_give:
+                break
+            n = min(surplus, to_give)
+            given[key] = n
+            to_give -= n
+
+    gained = {k: n for k, n in gained.items() if n}
+    transfers = []
+    for keys in groups.values():
+        transfers += _pair({k: given[k] for k in keys if given.get(k)},
+                           {k: gained[k] for k in keys if gained.get(k)})
+    return Plan(transfers, gained, dict(given), unmet)
+
+
+def _priority(moyenne) -> float:
+    return float("inf") if moyenne is None else -moyenne
@@ -0,0 +1,83 @@
+"""Base SQLite temporaire pour les tests de database.py."""
+
+import json
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import database  # noqa: E402
+
+NIVEAUX = ("Licence", "Master")
+FILIERES = ("Agronomie", "Chimie", "Géologie", "Informatique", "Médecine")
+PLACES = 15            # par filière : 2 × 5 × 15 = 150 places
+PER_FILIERE = 30       # candidatures par filière
+
+
+def write_roster(path: Path, rows: list[dict]) -> str:
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return str(path)
+
+
+def write_quotas(path: Path, quotas: dict) -> str:
+    path.write_text(json.dumps(quotas, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def synthetic_roster(seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    rows = []
+    for niveau in NIVEAUX:
+        for filiere in FILIERES:
+            for _ in range(PER_FILIERE):
+                n = len(rows) + 1
+                rows.append({
+                    "id_demande": f"D{n:05d}", "name": f"Candidat {n}", "filiere": filiere,
+                    "niveau_etudes": niveau, "avis": "En attente",
+                    "moyenne": f"{rnd.uniform(10, 20):.2f}",
+                })
+    return rows
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Module database sur une base vide, propre au test."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "session.db"))
+    database.reset_db()
+    database.init_db()
+    yield database
+    database.reset_db()
+
+
+@pytest.fixture
+def loaded_db(db, tmp_path):
+    """Base chargée : 300 candidatures, 150 places réparties sur 10 filières."""
+    db.load_excel_to_db(write_roster(tmp_path / "roster.xlsx", synthetic_roster()))
+    quotas = {niveau: {filiere: PLACES for filiere in FILIERES} for niveau in NIVEAUX}
+    db.load_quotas(write_quotas(tmp_path / "quotas.json", quotas))
+    return db
+
+
+def write_cnabau_roster(path: Path, filieres: dict[str, dict[str, int]]) -> str:
+    """Tableau au format CNaBAU : {niveau: {filière telle qu'écrite: nombre de candidats}}."""
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["TABLEAU CNaBAU BOURSE RUSSIE"])
+    numero = 1
+    for niveau, counts in filieres.items():
+        ws.append([f"NIVEAU : {niveau.upper()}"])
+        for filiere, count in counts.items():
+            ws.append([f"Filière : {filiere}"])
+            for _ in range(count):
+                ws.append([numero, "M", f"BEN-{numero:05d}/26", f"Candidat {numero}",
+                           "01/01/2001 à Cotonou", "BAC D 2019", "12,50", "", None])
+                numero += 1
+    wb.save(path)
+    return str(path)
@@ -0,0 +1,60 @@
+"""Pré-remplissage des quotas (ALLOCATION_SQL, propose_allocation, apply_allocation)."""
+
+from conftest import FILIERES, NIVEAUX, PER_FILIERE, PLACES
+
+
+def _rows(db) -> list[dict]:
+    with db.connection() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT id_demande, niveau_etudes, filiere, avis, moyenne_num FROM candidatures"
+        )]
+
+
+def test_apply_allocation_fills_quotas_by_moyenne(loaded_db):
+    db = loaded_db
+    # Décisions déjà prises : 4 Favorables et 3 Défavorables en Licence/Agronomie.
+    first = [r for r in _rows(db) if (r["niveau_etudes"], r["filiere"]) == (NIVEAUX[0], FILIERES[0])]
+    first.sort(key=lambda r: r["moyenne_num"])
+    decided = {r["id_demande"]: "Favorable" for r in first[:4]}
+    decided.update({r["id_demande"]: "Défavorable" for r in first[-3:]})
+    assert db.bulk_update_avis(list(decided.items()))["success"]
+    pending = {r["id_demande"] for r in _rows(db) if r["avis"] == "En attente"}
+
+    preview = db.propose_allocation(n_suppleants=2)
+    result = db.apply_allocation(n_suppleants=2)
+    assert result["success"]
+    assert result["favorables"] == len(NIVEAUX) * len(FILIERES) * PLACES - 4
+    assert result["suppleants"] == len(NIVEAUX) * len(FILIERES) * 2
+    after = _rows(db)
+    assert {r["id_demande"]: r["avis"] for r in after if r["id_demande"] in set(preview["id_demande"])} == dict(
+        zip(preview["id_demande"], preview["avis_propose"]))
+
+    with db.connection() as conn:
+        quotas, favorables = db._read_quota_counts(conn)
+    assert all(favorables.get(key, 0) <= places for key, places in quotas.items())
+    assert db.check_quota_ledger() == {}
+
+    for key in quotas:
+        group = [r for r in after if (r["niveau_etudes"], r["filiere"]) == key and r["id_demande"] in pending]
+        assert len(group) == PER_FILIERE - (7 if key == (NIVEAUX[0], FILIERES[0]) else 0)
+        by_avis = {avis: [r["moyenne_num"] for r in group if r["avis"] == avis]
+                   for avis in ("Favorable", "Suppléant", "En attente")}
+        assert favorables[key] == quotas[key]
+        assert len(by_avis["Suppléant"]) <= 2
+        # Meilleures moyennes d'abord : Favorable, puis Suppléant, puis en attente.
+        assert min(by_avis["Favorable"]) >= max(by_avis["Suppléant"])
+        assert min(by_avis["Suppléant"]) >= max(by_avis["En attente"])
+
+
+def test_allocation_respects_a_full_quota(loaded_db):
+    db = loaded_db
+    key = (NIVEAUX[1], FILIERES[2])
+    assert db.transfer_quotas([(key, (NIVEAUX[1], FILIERES[3]), PLACES)])["success"]
+    preview = db.propose_allocation(n_suppleants=3)
+    mask = (preview["niveau_etudes"] == key[0]) & (preview["filiere"] == key[1])
+    assert list(preview.loc[mask, "avis_propose"]) == ["Suppléant"] * 3
+    assert db.apply_allocation(n_suppleants=3)["success"]
+    with db.connection() as conn:
+        quotas, favorables = db._read_quota_counts(conn)
+    assert quotas[key] == 0 and favorables.get(key, 0) == 0
+    assert favorables[NIVEAUX[1], FILIERES[3]] == 2 * PLACES
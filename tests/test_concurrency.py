@@ -0,0 +1,98 @@
+"""Mode WAL, busy_timeout et rejeu des écritures sous concurrence."""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+WRITERS = 8
+WRITES_PER_THREAD = 100
+READERS = 3
+
+
+def _avis_ids(db):
+    with db.connection() as conn:
+        return [r[0] for r in conn.execute("SELECT id_demande FROM candidatures ORDER BY id_demande")]
+
+
+def test_pragmas(db):
+    with db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db.SQLITE_PRAGMAS["busy_timeout"]
+
+
+def test_concurrent_writers_and_readers(loaded_db):
+    db = loaded_db
+    ids = _avis_ids(db)
+    errors = []
+
+    def writer(i):
+        try:
+            for k in range(WRITES_PER_THREAD):
+                db.update_avis(ids[(i * 37 + k) % len(ids)], ("Suppléant", "Défavorable")[k % 2])
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(20):
+                page, _ = db.get_candidatures_page(page_size=50)
+                assert len(page) == 50 and db.count_candidatures() == len(ids)
+                db.get_stats()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    threads += [threading.Thread(target=reader) for _ in range(READERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert db.check_quota_ledger() == {}
+    with db.connection() as conn:
+        changed = conn.execute("SELECT COUNT(*) FROM candidatures WHERE avis != 'En attente'").fetchone()[0]
+    assert changed > 0
+
+
+@pytest.fixture
+def write_lock(loaded_db):
+    """Autre connexion qui détient le verrou d'écriture (BEGIN IMMEDIATE)."""
+    other = sqlite3.connect(loaded_db.DB_PATH, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    yield other
+    other.rollback()
+    other.close()
+
+
+def test_reads_and_init_db_do_not_wait_for_a_writer(loaded_db, write_lock):
+    db = loaded_db
+    start = time.perf_counter()
+    db.init_db()
+    assert db.is_db_loaded()
+    page, _ = db.get_candidatures_page()
+    assert db.count_candidatures() == 300 and len(page) > 0
+    db.get_stats()
+    assert time.perf_counter() - start < 1.0
+
+
+def test_writer_retries_until_lock_released(loaded_db, write_lock, monkeypatch):
+    db = loaded_db
+    with db.connection() as conn:
+        conn.execute("PRAGMA busy_timeout = 50")
+    monkeypatch.setattr(db, "WRITE_RETRY_DELAY", 0.05)
+    target = _avis_ids(db)[0]
+    threading.Timer(0.2, write_lock.rollback).start()
+    db.update_avis(target, "Défavorable")
+    assert db.search_by_field("id_demande", target)["avis"] == "Défavorable"
+
+
+def test_busy_error_surfaces_after_retries(loaded_db, write_lock, monkeypatch):
+    db = loaded_db
+    with db.connection() as conn:
+        conn.execute("PRAGMA busy_timeout = 10")
+    monkeypatch.setattr(db, "WRITE_RETRY_DELAY", 0.001)
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        db.update_avis(_avis_ids(db)[0], "Défavorable")
@@ -0,0 +1,47 @@
+"""Classement des groupes de doublons (duplicates.find_duplicates)."""
+
+from duplicates import DIFFERENT_PEOPLE, IDENTICAL, SAME_PERSON_DIFF_FILIERE, find_duplicates
+
+
+def _row(id_demande, filiere, name="KOFFI Jean Marie", id_russe="BEN-0001/26", niveau="Licence",
+         naissance="01/02/2001 à Cotonou"):
+    return {"id_demande": id_demande, "id_russe": id_russe, "name": name,
+            "date_lieu_naissance": naissance, "filiere": filiere, "niveau_etudes": niveau}
+
+
+def _clusters(members) -> dict[str, list[tuple[str, bool]]]:
+    out = {}
+    for m in members:
+        out.setdefault(m.cluster, (m.categorie, []))[1].append((m.id_demande, m.garde))
+    return sorted(out.values())
+
+
+def test_identical_copies_and_other_filiere_are_labeled_separately():
+    rows = [_row("D1", "Chimie"), _row("D2", "Chimie"), _row("D3", "Mathématiques"),
+            _row("D4", "Chimie", name="HOUNKPATIN Aïcha", id_russe="BEN-0002/26")]
+    assert _clusters(find_duplicates(rows)) == [
+        (IDENTICAL, [("D1", True), ("D2", False)]),
+        (SAME_PERSON_DIFF_FILIERE, [("D1", True), ("D3", False)]),
+    ]
+
+
+def test_same_filiere_other_niveau():
+    rows = [_row("D1", "Chimie"), _row("D2", "Chimie", niveau="Master")]
+    assert _clusters(find_duplicates(rows)) == [(SAME_PERSON_DIFF_FILIERE, [("D1", True), ("D2", False)])]
+
+
+def test_shared_id_with_unrelated_names():
+    rows = [_row("D1", "Chimie"), _row("D2", "Chimie", name="ZINSOU Rachidatou")]
+    assert _clusters(find_duplicates(rows)) == [(DIFFERENT_PEOPLE, [("D1", True), ("D2", False)])]
+
+
+def test_missing_ids_do_not_override_birth_dates():
+    rows = [_row("D1", "Chimie", name="ADJOVI Paul", id_russe="", naissance="01/01/2000"),
+            _row("D2", "Chimie", name="ADJOVI Paule", id_russe="", naissance="05/06/1990")]
+    assert find_duplicates(rows) == []
+
+
+def test_missing_ids_and_dates_need_close_names():
+    rows = [_row("D1", "Chimie", name="KOFFI Jean", id_russe="", naissance=""),
+            _row("D2", "Chimie", name="KOFFI Jean Marie", id_russe="", naissance="")]
+    assert find_duplicates(rows) == []
@@ -0,0 +1,76 @@
+"""Rapprochement des noms de filières au chargement (filiere_resolver, filiere_aliases)."""
+
+import pytest
+
+from conftest import write_cnabau_roster, write_quotas
+
+QUOTAS = {
+    "Licence": {"Chimie": 5, "Génie civil": 5},
+    "Master": {"Chimie": 5, "Génie civile": 5},
+}
+
+
+@pytest.fixture
+def quotas_path(db, tmp_path, monkeypatch):
+    path = write_quotas(tmp_path / "quotas.json", QUOTAS)
+    monkeypatch.setattr(db, "QUOTAS_PATH", tmp_path / "quotas.json")
+    return path
+
+
+def _quota_keys(db) -> set[tuple[str, str]]:
+    with db.connection() as conn:
+        return {(r["niveau_etudes"], r["filiere"]) for r in conn.execute("SELECT * FROM quotas")}
+
+
+def _candidature_keys(db) -> set[tuple[str, str]]:
+    with db.connection() as conn:
+        return {tuple(r) for r in conn.execute("SELECT DISTINCT niveau_etudes, filiere FROM candidatures")}
+
+
+def test_quota_names_survive_reloads(db, tmp_path, quotas_path):
+    expected = {(niveau, filiere) for niveau, filieres in QUOTAS.items() for filiere in filieres}
+    db.load_quotas(quotas_path)
+    assert _quota_keys(db) == expected
+
+    # Aucune candidature en Génie civil de Licence : le quota ne doit pas
+    # prendre l'orthographe du Master.
+    db.load_excel_to_db(write_cnabau_roster(tmp_path / "roster.xlsx", {
+        "Licence": {"chimie": 3},
+        "Master": {"Génie civile": 3, "CHIMIE": 2},
+    }))
+    assert _candidature_keys(db) == {("Licence", "Chimie"), ("Master", "Chimie"), ("Master", "Génie civile")}
+
+    db.load_quotas(quotas_path)
+    assert _quota_keys(db) == expected
+    assert sum(db.get_quota_ledger().quotas().values()) == 20
+
+
+def test_manual_alias_applies_to_its_niveau_only(db, tmp_path, quotas_path):
+    db.set_filiere_alias("Licence", "Chimie gén", "Chimie")
+    db.load_excel_to_db(write_cnabau_roster(tmp_path / "roster.xlsx", {
+        "Licence": {"Chimie gén": 1},
+        "Master": {"Chimie gén": 1},
+    }))
+    assert _candidature_keys(db) == {("Licence", "Chimie"), ("Master", "Chimie gén")}
+    aliases = db.get_filiere_aliases()
+    assert set(zip(aliases["niveau_etudes"], aliases["alias"], aliases["methode"])) == {
+        ("Licence", "Chimie gén", "manuel"), ("Master", "Chimie gén", "inconnu"),
+    }
+
+
+def test_alias_migration_keys_rows_by_niveau(db):
+    with db.transaction() as conn:
+        conn.execute("DROP TABLE filiere_aliases")
+        db._create_filiere_aliases_table(conn)
+        conn.executemany("INSERT INTO filiere_aliases VALUES (?, ?, ?, ?)", [
+            ("Chimie gén", "Chimie", "manuel", 0),
+            ("Genie civile", "Génie civile", "normalise", 0),
+        ])
+        conn.execute("INSERT INTO quotas VALUES ('Master', 'Génie civile', 5)")
+        conn.execute(f"PRAGMA user_version = {len(db.SCHEMA_MIGRATIONS) - 1}")
+        db._migrate_schema(conn)
+    aliases = db.get_filiere_aliases()
+    rows = set(zip(aliases["niveau_etudes"], aliases["alias"], aliases["filiere"]))
+    assert rows == {(niveau, "Chimie gén", "Chimie") for niveau in db.NIVEAU_ORDER} | {
+        ("Master", "Genie civile", "Génie civile"),
+    }
@@ -0,0 +1,77 @@
+"""Journal des décisions : un horodatage par lot, état à un instant donné, rejeu."""
+
+import time
+from datetime import datetime, timedelta
+
+from conftest import FILIERES, NIVEAUX
+
+
+def _lots(db) -> dict[int, set[str]]:
+    lots = {}
+    with db.connection() as conn:
+        for r in conn.execute("SELECT lot, horodatage FROM journal"):
+            lots.setdefault(r["lot"], set()).add(r["horodatage"])
+    return lots
+
+
+def test_one_timestamp_per_lot(loaded_db):
+    db = loaded_db
+    with db.connection() as conn:
+        ids = [r[0] for r in conn.execute("SELECT id_demande FROM candidatures WHERE niveau_etudes = ? LIMIT 150",
+                                          (NIVEAUX[0],))]
+    result = db.bulk_update_avis([(i, "Défavorable") for i in ids])
+    assert result == {"success": True, "updated": 150}
+    transfers = [((NIVEAUX[0], FILIERES[0]), (NIVEAUX[1], f), 1) for f in FILIERES]
+    assert db.transfer_quotas(transfers)["success"]
+    assert all(len(stamps) == 1 for stamps in _lots(db).values())
+
+
+def test_state_at_includes_or_excludes_whole_lots(loaded_db):
+    db = loaded_db
+    with db.connection() as conn:
+        before = dict(conn.execute("SELECT id_demande, avis FROM candidatures").fetchall())
+    ids = list(before)[:100]
+    db.bulk_update_avis([(i, "Défavorable") for i in ids])
+    with db.connection() as conn:
+        stamp = conn.execute("SELECT MAX(horodatage) FROM journal WHERE type = 'avis'").fetchone()[0]
+    at = datetime.fromisoformat(stamp.replace("Z", "+00:00"))
+
+    assert db.state_at(at)["avis"] == {**before, **dict.fromkeys(ids, "Défavorable")}
+    assert db.state_at(at - timedelta(milliseconds=1))["avis"] == before
+
+
+def test_replay_until_a_lot_rebuilds_state_at(loaded_db, tmp_path):
+    db = loaded_db
+    with db.connection() as conn:
+        ids = [r[0] for r in conn.execute("SELECT id_demande FROM candidatures ORDER BY id_demande")]
+    lots = [
+        lambda: db.bulk_update_avis([(i, "Favorable") for i in ids[:10]]),
+        lambda: db.transfer_quotas([((NIVEAUX[0], FILIERES[1]), (NIVEAUX[0], FILIERES[0]), 3),
+                                    ((NIVEAUX[1], FILIERES[2]), (NIVEAUX[0], FILIERES[0]), 2)]),
+        lambda: db.update_avis(ids[200], "Suppléant"),
+        lambda: db.bulk_update_avis([(i, "Défavorable") for i in ids[5:15]]),
+        lambda: db.transfer_quotas([((NIVEAUX[0], FILIERES[0]), (NIVEAUX[1], FILIERES[4]), 4)]),
+    ]
+    for apply in lots:
+        time.sleep(0.002)  # lots à des millisecondes distinctes
+        result = apply()  # update_avis ne retourne rien
+        assert result is None or result["success"]
+    stamps = _lots(db)
+    assert all(len(s) == 1 for s in stamps.values())
+    # Jusqu'au troisième lot de décisions inclus ; les deux suivants sont exclus.
+    until = sorted(min(s) for s in stamps.values())[-3]
+    expected = db.state_at(until)
+
+    events = db.read_journal(db.DB_PATH, until=until)
+    assert len({e["horodatage"] for e in events}) == 3
+    db.reset_db()
+    db.init_db()
+    db.load_excel_to_db(str(tmp_path / "roster.xlsx"))
+    db.load_quotas(str(tmp_path / "quotas.json"))
+    assert db.replay_journal(events) == {"success": True, "avis": 11, "transferts": 2, "ignores": 0}
+
+    with db.connection() as conn:
+        assert dict(conn.execute("SELECT id_demande, avis FROM candidatures").fetchall()) == expected["avis"]
+        assert db._read_quota_counts(conn)[0] == expected["quotas"]
+    assert db.check_quota_ledger() == {}
+    assert all(len(s) == 1 for s in _lots(db).values())  # le rejeu est lui-même un seul lot
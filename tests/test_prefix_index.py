@@ -0,0 +1,27 @@
+"""Recherche à la frappe de l'onglet Examen individuel (prefix_index)."""
+
+import pytest
+
+from prefix_index import PrefixIndex
+
+
+@pytest.fixture
+def index():
+    rows = [
+        {"id_demande": f"D{n:05d}", "numero": n, "id_russe": None, "name": f"CANDIDAT {n}",
+         "filiere": "Chimie", "niveau_etudes": "Licence"}
+        for n in (1, 12, 120, 121, 1200)
+    ]
+    return PrefixIndex(rows, roster_version=1)
+
+
+@pytest.mark.parametrize("query", ["12", "012", "0012", " 012 "])
+def test_numero_ignores_leading_zeros(index, query):
+    matches = index.search("numero", query)
+    assert matches.exact == 1
+    assert [e.numero for e in matches.entries] == [12, 120, 121, 1200]
+
+
+def test_numero_zero_and_non_digits(index):
+    assert index.search("numero", "000").entries == ()
+    assert index.search("numero", "12a").entries == ()
@@ -0,0 +1,75 @@
+"""Plans d'exécution des requêtes chaudes : aucune ne doit repasser en
+parcours complet de candidatures (EXPLAIN QUERY PLAN)."""
+
+import pytest
+
+HOT_QUERIES = {
+    "numero": ("SELECT * FROM candidatures WHERE numero = ?", (12,), "idx_candidatures_numero"),
+    "id_russe": ("SELECT * FROM candidatures WHERE id_russe = ?", ("BEN-1/26",), "idx_candidatures_id_russe"),
+    "id_demande": ("SELECT * FROM candidatures WHERE id_demande = ?", ("D00001",),
+                   "sqlite_autoindex_candidatures_1"),
+    "name_nocase": ("SELECT * FROM candidatures WHERE name = ? COLLATE NOCASE", ("Candidat 1",),
+                    "idx_candidatures_name"),
+    "favorables_filiere": (
+        """SELECT COUNT(*) FROM candidatures
+           WHERE avis = 'Favorable' AND niveau_etudes = ? AND filiere = ?""",
+        ("Licence", "Chimie"), "COVERING INDEX idx_candidatures_avis",
+    ),
+    "favorables_count": (
+        """SELECT niveau_etudes, filiere, COUNT(*) as n
+           FROM candidatures WHERE avis = 'Favorable'
+           GROUP BY niveau_etudes, filiere""",
+        (), "COVERING INDEX idx_candidatures_avis",
+    ),
+    "candidats_filiere": (
+        "SELECT id_demande FROM candidatures WHERE niveau_etudes = ? AND filiere = ?",
+        ("Licence", "Chimie"), "idx_candidatures_",
+    ),
+}
+
+
+def _plan(conn, sql, params) -> str:
+    return "\n".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(loaded_db, name):
+    sql, params, index = HOT_QUERIES[name]
+    with loaded_db.connection() as conn:
+        plan = _plan(conn, sql, params)
+    assert "SCAN candidatures" not in plan, plan
+    assert "USING" in plan and index in plan, plan
+
+
+def test_transfer_debit_counts_through_index(loaded_db):
+    with loaded_db.connection() as conn:
+        plan = _plan(conn, loaded_db._DEBIT_SQL, {"n": 1, "niveau": "Licence", "filiere": "Chimie"})
+    assert "SEARCH quotas USING INDEX sqlite_autoindex_quotas_1" in plan, plan
+    assert "SEARCH c USING COVERING INDEX idx_candidatures_avis" in plan, plan
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"avis": ("En attente",)}, {"niveaux": ("Master",)}, {"filieres": ("Chimie",)},
+])
+def test_list_page_reads_index_in_order(loaded_db, filters):
+    """Page suivante de la liste : recherche dans l'index à partir de la clé,
+    sans tri temporaire ni OFFSET."""
+    db = loaded_db
+    _, after = db.get_candidatures_page(**filters)
+    filters = {"niveaux": (), "filieres": (), "avis": (), **filters}
+    sql, params = db._list_page_query(**filters, after=after, limit=16)
+    with db.connection() as conn:
+        plan = _plan(conn, sql, params)
+    assert "SEARCH candidatures USING INDEX idx_candidatures_liste" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
+
+
+def test_list_pages_follow_each_other(loaded_db):
+    db = loaded_db
+    seen, after = [], None
+    while True:
+        page, after = db.get_candidatures_page(page_size=40, after=after)
+        seen += page["id_demande"].tolist()
+        if after is None:
+            break
+    assert len(seen) == len(set(seen)) == db.count_candidatures()
@@ -0,0 +1,44 @@
+"""Registre des quotas partagé entre sessions (threads)."""
+
+import threading
+
+from quota_ledger import QuotaLedger
+
+KEYS = [("Licence", f"Filière {i}") for i in range(200)]
+
+
+def test_readers_see_consistent_copies_during_updates():
+    ledger = QuotaLedger({k: 10 for k in KEYS}, {}, version=0)
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        try:
+            while not stop.is_set():
+                with ledger.lock:  # lot : tous les favorables d'un coup, puis retirés
+                    for key in KEYS:
+                        ledger.apply_avis_change(key, "En attente", "Favorable")
+                with ledger.lock:
+                    for key in KEYS:
+                        ledger.apply_avis_change(key, "Favorable", "En attente")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(2000):
+                counts = ledger.favorables_counts()
+                assert len(counts) in (0, len(KEYS))
+                assert ledger.total_places() == 10 * len(KEYS)
+                assert len(ledger.quotas()) == len(KEYS)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads[1:]:
+        t.join()
+    stop.set()
+    threads[0].join()
+    assert errors == []
@@ -0,0 +1,53 @@
+"""Recherche par nom sur l'index FTS5 en trigrammes (search_names, search_by_field)."""
+
+import pytest
+
+from conftest import write_roster
+
+NAMES = ["KONÉ Aïcha", "KONE Moussa", "HOUNKPATIN Élodie", "AGOSSOU Li", "DOSSOU Jean Marie", "Jean DOSSOU",
+         "ZINSOU Paul Marc", "Marc ZINSOU Paul"]
+
+
+@pytest.fixture
+def names_db(db, tmp_path):
+    rows = [{"id_demande": f"D{n:05d}", "name": name, "filiere": "Chimie", "niveau_etudes": "Licence",
+             "avis": "En attente", "moyenne": "12.00"}
+            for n, name in enumerate(NAMES, 1)]
+    db.load_excel_to_db(write_roster(tmp_path / "roster.xlsx", rows))
+    with db.connection() as conn:
+        assert db._has_name_index(conn), "SQLite sans FTS5 trigram : l'index n'est pas testé"
+    return db
+
+
+def _names(rows) -> list[str]:
+    return [r["name"] for r in rows]
+
+
+def test_accents_and_case_are_ignored(names_db):
+    assert _names(names_db.search_names("kone")) == ["KONÉ Aïcha", "KONE Moussa"]
+    assert _names(names_db.search_names("KONÉ")) == ["KONÉ Aïcha", "KONE Moussa"]
+    assert _names(names_db.search_names("aicha kone")) == ["KONÉ Aïcha"]
+    assert _names(names_db.search_names("elodie")) == ["HOUNKPATIN Élodie"]
+
+
+def test_typo_tolerance(names_db):
+    assert _names(names_db.search_names("HOUNKPATN"))[0] == "HOUNKPATIN Élodie"
+
+
+def test_exact_lookup_ignores_word_order_and_accents(names_db):
+    assert names_db.search_by_field("name", "Aicha KONE")["id_demande"] == "D00001"
+    assert names_db.search_by_field("name", "élodie hounkpatin")["id_demande"] == "D00003"
+    assert names_db.search_by_field("name", "Marie Jean DOSSOU")["id_demande"] == "D00005"
+    assert names_db.search_by_field("name", "dossou jean")["id_demande"] == "D00006"
+    assert names_db.search_by_field("name", "Jean KONE") is None
+    # Deux candidats portent les mêmes mots : pas de correspondance unique.
+    assert names_db.search_by_field("name", "Paul Marc Zinsou") is None
+
+
+def test_queries_shorter_than_a_trigram(names_db):
+    with names_db.connection() as conn:
+        indexed = conn.execute(f"SELECT COUNT(*) FROM {names_db.NAME_INDEX} WHERE nom MATCH ?", ('"li"',))
+        assert indexed.fetchone()[0] == 0
+    assert _names(names_db.search_names("Li")) == ["AGOSSOU Li"]
+    assert _names(names_db.search_names("Ko")) == ["KONÉ Aïcha", "KONE Moussa"]
+    assert names_db.search_names("  ") == []
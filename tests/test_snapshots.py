@@ -0,0 +1,81 @@
+"""Instantanés de session : restauration et journal, rétention."""
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from conftest import synthetic_roster, write_roster
+
+
+def _now():
+    time.sleep(0.002)  # instants distincts à la milliseconde près
+    moment = datetime.now(timezone.utc)
+    time.sleep(0.002)
+    return moment
+
+
+def _avis(db) -> dict:
+    with db.connection() as conn:
+        return dict(conn.execute("SELECT id_demande, avis FROM candidatures").fetchall())
+
+
+def _journal(db) -> list[tuple]:
+    with db.connection() as conn:
+        return [tuple(r) for r in conn.execute("SELECT id, type, id_demande, apres FROM journal ORDER BY id")]
+
+
+@pytest.fixture
+def ids(loaded_db):
+    return sorted(_avis(loaded_db))
+
+
+def test_restore_keeps_later_journal_rows(loaded_db, ids):
+    db = loaded_db
+    start = _now()
+    db.update_avis(ids[0], "Favorable")
+    kept = _now()
+    assert db.take_snapshot("Étape 1")["success"]
+    snapshot_avis = _avis(db)
+    db.update_avis(ids[1], "Favorable")
+    db.update_avis(ids[0], "Défavorable")
+    before_restore = _journal(db)
+
+    snapshot = db.list_snapshots()[0]
+    assert db.restore_snapshot(snapshot["id"])["success"]
+    journal = _journal(db)
+    assert journal[:len(before_restore)] == before_restore
+    assert journal[-1][1] == db.JOURNAL_RESTAURATION
+    assert _avis(db) == snapshot_avis
+
+    # Les décisions annulées restent au journal mais ne sont ni défaites ni rejouées.
+    assert db.state_at(kept)["avis"] == snapshot_avis
+    assert db.state_at(start)["avis"] == {**snapshot_avis, ids[0]: "En attente"}
+    replayed = db.read_journal(db.DB_PATH)
+    assert [(e["id_demande"], e["apres"]) for e in replayed] == [(ids[0], "Favorable")]
+
+
+def test_restore_after_reset_appends_the_new_journal(loaded_db, ids, tmp_path):
+    db = loaded_db
+    db.update_avis(ids[0], "Favorable")
+    assert db.take_snapshot("Avant réinitialisation")["success"]
+    snapshot_journal = _journal(db)
+    db.reset_db()
+    db.init_db()
+    db.load_excel_to_db(write_roster(tmp_path / "roster2.xlsx", synthetic_roster(seed=1)))
+    db.update_avis(ids[1], "Défavorable")
+    new_session = [row[1:] for row in _journal(db)]
+
+    assert db.restore_snapshot(db.list_snapshots()[0]["id"])["success"]
+    journal = _journal(db)
+    assert journal[:len(snapshot_journal)] == snapshot_journal
+    assert [row[1:] for row in journal[len(snapshot_journal):-1]] == new_session
+    assert db.state_at(_now())["avis"][ids[0]] == "Favorable"
+
+
+def test_snapshot_retention_by_name(db):
+    for _ in range(4):
+        assert db.take_snapshot("Avant réinitialisation", keep=2)["success"]
+    assert db.take_snapshot("Manuel")["success"]
+    names = [s["nom"] for s in db.list_snapshots()]
+    assert sorted(names) == ["Avant réinitialisation", "Avant réinitialisation", "Manuel"]
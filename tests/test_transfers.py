@@ -0,0 +1,96 @@
+"""Transferts de places concurrents (transfer_quotas) et changements d'avis."""
+
+import random
+import threading
+
+from conftest import FILIERES, NIVEAUX, PLACES
+
+KEYS = [(niveau, filiere) for niveau in NIVEAUX for filiere in FILIERES]
+TRANSFER_THREADS = 6
+AVIS_THREADS = 2
+ROUNDS = 60
+
+
+def _sql_counts(db) -> tuple[dict, dict]:
+    with db.connection() as conn:
+        return db._read_quota_counts(conn)
+
+
+def test_concurrent_transfers_keep_quotas_consistent(loaded_db):
+    db = loaded_db
+    ids = {key: [] for key in KEYS}
+    with db.connection() as conn:
+        for r in conn.execute("SELECT id_demande, niveau_etudes, filiere FROM candidatures"):
+            ids[r["niveau_etudes"], r["filiere"]].append(r["id_demande"])
+
+    errors, applied = [], []
+
+    def transfers(seed):
+        rnd = random.Random(seed)
+        try:
+            for _ in range(ROUNDS):
+                legs = []
+                for _ in range(rnd.randint(1, 3)):
+                    source, dest = rnd.sample(KEYS, 2)
+                    legs.append((source, dest, rnd.randint(1, 4)))
+                result = db.transfer_quotas(legs)
+                if result["success"]:
+                    applied.append(legs)
+                elif "insuffisantes" not in result["error"]:
+                    errors.append(result["error"])
+        except Exception as e:
+            errors.append(repr(e))
+
+    def avis(seed):
+        rnd = random.Random(seed)
+        try:
+            for _ in range(ROUNDS):
+                key = rnd.choice(KEYS)
+                decisions = [(i, rnd.choice(("Favorable", "Favorable", "En attente", "Défavorable")))
+                             for i in rnd.sample(ids[key], 5)]
+                result = db.bulk_update_avis(decisions)
+                if not result["success"] and "Quota dépassé" not in result["error"]:
+                    errors.append(result["error"])
+        except Exception as e:
+            errors.append(repr(e))
+
+    # Lecteur : aucun état intermédiaire (débit sans crédit, quota sous ses
+    # favorables) ne doit être visible pendant les écritures.
+    done = threading.Event()
+    reads = []
+
+    def reader():
+        try:
+            while not done.is_set():
+                with db.read_snapshot() as conn:
+                    quotas, favorables = db._read_quota_counts(conn)
+                reads.append(None)
+                if sum(quotas.values()) != PLACES * len(KEYS):
+                    errors.append(f"total lu : {sum(quotas.values())}")
+                errors.extend(f"{key} : {places} places, {favorables[key]} favorables"
+                              for key, places in quotas.items() if places < favorables.get(key, 0))
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=transfers, args=(i,)) for i in range(TRANSFER_THREADS)]
+    threads += [threading.Thread(target=avis, args=(100 + i,)) for i in range(AVIS_THREADS)]
+    observer = threading.Thread(target=reader)
+    observer.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.set()
+    observer.join()
+
+    assert errors == []
+    assert applied, "aucun transfert appliqué : le test ne vérifie rien"
+    assert len(reads) > 1, "le lecteur n'a rien lu pendant les écritures"
+    quotas, favorables = _sql_counts(db)
+    assert sum(quotas.values()) == PLACES * len(KEYS)
+    assert db.check_quota_ledger() == {}
+    ledger = db.get_quota_ledger()
+    assert ledger.quotas() == quotas
+    below = {key: (places, favorables.get(key, 0))
+             for key, places in quotas.items() if places < favorables.get(key, 0)}
+    assert below == {}
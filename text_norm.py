@@ -0,0 +1,57 @@
+"""Normalisation de texte pour la recherche et les rapprochements de noms.
+
+`fold` ramène un texte à une forme comparable : minuscules, sans accents,
+apostrophes retirées, autre ponctuation remplacée par des espaces.
+« N'GUESSAN Aïcha-Marie » → « nguessan aicha marie ».
+"""
+
+import re
+import unicodedata
+
+_APOSTROPHES = re.compile(r"['’`´]")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_DIGITS = re.compile(r"\d+")
+_DATE = re.compile(r"(\d{1,2})\s*[/.-]\s*(\d{1,2})\s*[/.-]\s*(\d{4})")
+
+
+def fold(text) -> str:
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _APOSTROPHES.sub("", text.lower())
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def token_trigrams(folded: str) -> set[str]:
+    """Trigrammes de chaque mot (les mots de moins de 3 lettres comptent entiers).
+    Indépendants de l'ordre des mots : « koffi jean » ≡ « jean koffi »."""
+    grams = set()
+    for token in folded.split():
+        if len(token) < 3:
+            grams.add(token)
+        else:
+            grams.update(token[i:i + 3] for i in range(len(token) - 2))
+    return grams
+
+
+def similarity(a: set[str], b: set[str]) -> float:
+    """Indice de Jaccard entre deux ensembles de trigrammes."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def id_russe_key(text) -> str:
+    """Numéro d'un ID russe : « BEN-13256/26 » → « 13256 »."""
+    match = _DIGITS.search(str(text or ""))
+    return match.group() if match else ""
+
+
+def birth_date_key(text) -> str:
+    """Date (AAAA-MM-JJ) en tête de « date et lieu de naissance », "" si absente."""
+    match = _DATE.search(str(text or ""))
+    if not match:
+        return ""
+    day, month, year = match.groups()
+    return f"{year}-{int(month):02d}-{int(day):02d}"